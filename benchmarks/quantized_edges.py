@@ -0,0 +1,63 @@
+"""
+benchmarks/quantized_edges.py
+
+Pixels per second of the float and fixed-point edge detection engines, and how far apart they are
+
+    python benchmarks/quantized_edges.py [image_path] [threshold]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from main import (create_edge_detection_engine, create_quantized_edge_engine,
+                  detect_edges_in_array, detect_edges_quantized)
+from utils.image import intensityDifferenceMap, neighborhoodVarianceMap
+
+
+def best_time(function, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    image_path = sys.argv[1] if len(sys.argv) > 1 else "pictures/pic1.jpg"
+    threshold = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise SystemExit(f"Could not read image at {image_path}")
+
+    engine = create_edge_detection_engine()
+    start = time.perf_counter()
+    quantized = create_quantized_edge_engine()
+    build_time = time.perf_counter() - start
+
+    float_time = best_time(lambda: detect_edges_in_array(img, threshold, engine))
+    quantized_time = best_time(lambda: detect_edges_quantized(img, threshold, quantized))
+    pixels = img.size
+
+    features = {
+        "intensity_diff": intensityDifferenceMap(img).ravel(),
+        "neighborhood_variance": neighborhoodVarianceMap(img).ravel(),
+    }
+    report = quantized.compare(features)
+    reference = detect_edges_in_array(img, threshold, engine)
+    edges = detect_edges_quantized(img, threshold, quantized)
+
+    print(f"image {img.shape[1]}x{img.shape[0]}, threshold {threshold}, table build {build_time:.2f} s")
+    print(f"float      {pixels / float_time:14,.0f} px/s")
+    print(f"quantized  {pixels / quantized_time:14,.0f} px/s  ({float_time / quantized_time:.1f}x)")
+    print(f"edge_strength deviation: max {report.max_deviation:.3f}, mean {report.mean_deviation:.4f}, "
+          f"bound {report.error_bound:.3f} ({'ok' if report.within_bound else 'EXCEEDED'})")
+    print(f"edge map agreement: {np.mean(edges == reference):.4%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+benchmarks/shared_model.py
+
+Worker startup time and private memory with a model rebuilt in every worker and with one published in shared memory
+
+    python benchmarks/shared_model.py [labels per input: Default 46 (97336 rules)] [workers: Default 2]
+"""
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.fis import FuzzyInferenceSystem
+from src.jit import JitInferenceEngine
+from src.linguisticVariable import LinguisticVariable
+from src.membershipFunction import MembershipFunctionFactory
+from src.rule import FuzzyRule
+from src.serialization import load_fis, save_fis
+from src.shared import SharedModel
+
+INPUTS = ("x", "y", "z")
+SAMPLE = {"x": 31.0, "y": 47.0, "z": 68.0}
+
+
+def grid_system(labels: int) -> FuzzyInferenceSystem:
+    """Three inputs with `labels` triangles each and one rule per label combination"""
+    fis = FuzzyInferenceSystem()
+    step = 100 / (labels - 1)
+    for name in INPUTS:
+        variable = LinguisticVariable(name, [0, 100])
+        for i in range(labels):
+            center = i * step
+            variable.add_membership_function(
+                MembershipFunctionFactory.create_triangular(f"l{i}", [center - step, center, center + step]))
+        fis.add_input_variable(variable)
+    output = LinguisticVariable("out", [0, 100])
+    for i, label in enumerate(("low", "mid", "high")):
+        output.add_membership_function(
+            MembershipFunctionFactory.create_triangular(label, [i * 50 - 50, i * 50, i * 50 + 50]))
+    fis.add_output_variable(output)
+    for i in range(labels):
+        for j in range(labels):
+            for k in range(labels):
+                level = ("low", "mid", "high")[min(2, 3 * (i + j + k) // (3 * labels - 2))]
+                fis.add_rule(FuzzyRule([("x", f"l{i}", "is", "AND"), ("y", f"l{j}", "is", "AND"),
+                                        ("z", f"l{k}", "is", None)], [("out", level, "is")]))
+    return fis
+
+
+def private_bytes() -> int:
+    """Memory of this process not shared with any other, from /proc"""
+    with open("/proc/self/smaps_rollup") as f:
+        return sum(int(line.split()[1]) * 1024 for line in f if line.startswith(("Private_Clean", "Private_Dirty")))
+
+
+def build_worker(model_path):
+    before, start = private_bytes(), time.perf_counter()
+    engine = JitInferenceEngine(load_fis(model_path), backend="python")
+    result = engine.infer(SAMPLE)["out"]
+    return time.perf_counter() - start, private_bytes() - before, result
+
+
+def attach_worker(handle):
+    before, start = private_bytes(), time.perf_counter()
+    result = handle.engine().infer(SAMPLE)["out"]
+    return time.perf_counter() - start, private_bytes() - before, result
+
+
+def main():
+    labels = int(sys.argv[1]) if len(sys.argv) > 1 else 46
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    fis = grid_system(labels)
+
+    # Spawned workers start from an empty interpreter, as they would on every platform
+    context = get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, "model.json")
+        save_fis(fis, model_path)
+        with context.Pool(workers) as pool:
+            built = pool.map(build_worker, [model_path] * workers)
+
+    start = time.perf_counter()
+    with SharedModel(fis) as model:
+        publish_time = time.perf_counter() - start
+        with context.Pool(workers) as pool:
+            attached = pool.map(attach_worker, [model.handle] * workers)
+        size = model.nbytes
+
+    print(f"{len(fis.rules)} rules, {workers} workers, shared segment {size / 2 ** 20:.1f} MiB "
+          f"published in {publish_time:.2f} s")
+    for name, results in (("rebuilt per worker", built), ("attached", attached)):
+        seconds = max(result[0] for result in results)
+        memory = sum(result[1] for result in results)
+        print(f"{name:20s} startup {seconds:8.3f} s   private memory {memory / 2 ** 20:8.1f} MiB total")
+    same = len({result[2] for result in built + attached}) == 1
+    print(f"outputs {'identical' if same else 'DIFFER'}: {built[0][2]:.6f}")
+
+
+if __name__ == "__main__":
+    main()
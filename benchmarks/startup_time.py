@@ -0,0 +1,96 @@
+"""
+benchmarks/startup_time.py
+
+Guards the import cost of the core package. Each module is imported in a fresh
+interpreter; the run fails if NumPy, OpenCV or matplotlib get loaded eagerly or
+if importing takes longer than the budget.
+
+    python benchmarks/startup_time.py [budget_ms: Default: 50] [runs: Default: 5]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "src.fis",
+    "src.rule",
+    "src.linguisticVariable",
+    "src.membershipFunction",
+    "src.controller",
+    "src.batch",
+    "src.tuning",
+    "src.jit",
+    "src.quantized",
+    "src.cache",
+    "src.shared",
+    "src.sensitivity",
+    "src.anfis",
+    "src.generation",
+    "utils.line",
+    "utils.polygon",
+    "utils.centroid",
+    "utils.image",
+    "utils.visualize",
+    "main",
+    "camera_edges",
+]
+
+HEAVY_MODULES = ["numpy", "cv2", "matplotlib", "numba"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(module: str, runs: int):
+    """Return the fastest import time in seconds and the heavy modules it pulled in"""
+    best = None
+    loaded = ""
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        elapsed = float(output[0])
+        loaded = output[1] if len(output) > 1 else ""
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, loaded
+
+
+def main():
+    budget_ms = 50.0
+    runs = 5
+
+    if len(sys.argv) >= 2:
+        budget_ms = float(sys.argv[1])
+    if len(sys.argv) >= 3:
+        runs = int(sys.argv[2])
+
+    failures = []
+    for module in MODULES:
+        elapsed, loaded = measure(module, runs)
+        status = "ok"
+        if loaded:
+            status = f"FAIL eager import of {loaded}"
+            failures.append(module)
+        elif elapsed * 1000 > budget_ms:
+            status = "FAIL over budget"
+            failures.append(module)
+        print(f"{module:28s} {elapsed * 1000:7.1f} ms  {status}")
+
+    if failures:
+        print(f"{len(failures)} module(s) failed the startup check")
+        sys.exit(1)
+    print(f"All modules import within {budget_ms:.0f} ms without heavy dependencies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+camera_edges.py
+
+Real-time fuzzy edge detection on a camera or a file-backed fake camera. Frames are
+captured on one thread and processed by a pool of worker threads; frames that cannot
+be processed within the latency budget are dropped instead of queueing up.
+"""
+import os
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from utils.lazy import lazy_import
+from main import create_edge_detection_engine, detect_edges_in_array
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+class CameraSource:
+    def __init__(self, index: int = 0):
+        """Live camera through cv2.VideoCapture, paced by the device itself"""
+        self.capture = cv2.VideoCapture(index)
+        if not self.capture.isOpened():
+            raise ValueError(f"Could not open camera {index}")
+
+    def read(self):
+        ok, frame = self.capture.read()
+        return frame if ok else None
+
+    def close(self):
+        self.capture.release()
+
+
+class FileCamera:
+    def __init__(self, path: str, fps: float = 30.0, loop: bool = True):
+        """
+        Fake camera replaying a video file, a directory of images, a single image or a
+        `.npy` stack of frames at `fps`. read() blocks until the next frame is due, as a
+        real device would, and returns None at the end unless `loop` is set.
+        """
+        if fps <= 0:
+            raise ValueError(f"Frame rate must be positive, got {fps}")
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self._capture = None
+        self._frames = None
+
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            if not files:
+                raise ValueError(f"No images found in {path}")
+            self._frames = [self._read_image(f) for f in files]
+        elif path.endswith(".npy"):
+            self._frames = np.load(path, mmap_mode="r")
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            self._frames = [self._read_image(path)]
+        else:
+            self._capture = cv2.VideoCapture(path)
+            if not self._capture.isOpened():
+                raise ValueError(f"Could not open video {path}")
+
+        self._position = 0
+        self._next_time = None
+
+    @staticmethod
+    def _read_image(path: str):
+        img = cv2.imread(path)
+        if img is None:
+            raise ValueError(f"Could not read image at {path}")
+        return img
+
+    def _next_frame(self):
+        if self._capture is not None:
+            ok, frame = self._capture.read()
+            if not ok and self.loop:
+                self._capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = self._capture.read()
+            return frame if ok else None
+
+        if self._position >= len(self._frames):
+            if not self.loop:
+                return None
+            self._position = 0
+        frame = np.asarray(self._frames[self._position])
+        self._position += 1
+        return frame
+
+    def read(self):
+        now = time.perf_counter()
+        if self._next_time is None:
+            self._next_time = now
+        elif now < self._next_time:
+            time.sleep(self._next_time - now)
+        frame = self._next_frame()
+        # Keep the schedule, a late reader gets the next frames back to back
+        self._next_time += 1.0 / self.fps
+        return frame
+
+    def close(self):
+        if self._capture is not None:
+            self._capture.release()
+
+
+@dataclass
+class RealtimeStats:
+    frames_captured: int = 0
+    frames_processed: int = 0
+    dropped_queue: int = 0  # replaced in the queue by a newer frame before a worker was free
+    dropped_stale: int = 0  # too old to finish within the latency budget when a worker picked them up
+    late: int = 0  # processed, but finished after the latency budget
+    errors: int = 0  # process() or on_result raised, the worker moved on to the next frame
+    last_error: Optional[BaseException] = None
+    duration: float = 0.0
+    latencies: List[float] = field(default_factory=list)  # capture to result, seconds
+
+    @property
+    def dropped(self) -> int:
+        return self.dropped_queue + self.dropped_stale
+
+    @property
+    def fps(self) -> float:
+        return self.frames_processed / self.duration if self.duration > 0 else 0.0
+
+    def latency_percentile(self, percentile: float) -> float:
+        if not self.latencies:
+            return 0.0
+        return float(np.percentile(self.latencies, percentile))
+
+    def summary(self) -> str:
+        return (f"{self.frames_processed}/{self.frames_captured} frames in {self.duration:.2f}s "
+                f"({self.fps:.1f} fps), dropped {self.dropped} "
+                f"({self.dropped_queue} queue, {self.dropped_stale} stale), late {self.late}, "
+                f"errors {self.errors}, latency "
+                f"p50 {1000 * self.latency_percentile(50):.1f} ms, "
+                f"p90 {1000 * self.latency_percentile(90):.1f} ms, "
+                f"p99 {1000 * self.latency_percentile(99):.1f} ms")
+
+
+def edge_processor(threshold: float = 25, engine=None) -> Callable:
+    """
+    Frame -> edge map with detect_edges_in_array, color frames converted to gray. The
+    batch engine it uses approximates detect_edges, so maps can differ from it.
+    """
+    if engine is None:
+        engine = create_edge_detection_engine()
+
+    def process(frame):
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return detect_edges_in_array(frame, threshold, engine)
+    return process
+
+
+class RealtimeEdgeRunner:
+    def __init__(self, source, process: Optional[Callable] = None, workers: int = 2,
+                 latency_budget: float = 0.1, on_result: Optional[Callable] = None):
+        """
+        Capture frames from `source` (anything with read() and close()) on one thread and
+        run `process(frame)` on `workers` threads. The queue holds at most one frame per
+        worker; when it is full the oldest frame is dropped. Frames a worker picks up
+        too late to finish within `latency_budget` seconds are dropped unprocessed.
+        `on_result(index, result, latency)` is called from the worker threads.
+        Exceptions from either are counted in stats.errors, with the latest kept in
+        stats.last_error, and do not stop the workers.
+        """
+        if workers < 1:
+            raise ValueError(f"At least one worker is required, got {workers}")
+        self.source = source
+        self.process = process or edge_processor()
+        self.workers = workers
+        self.latency_budget = latency_budget
+        self.on_result = on_result
+        self.latest = None  # (frame index, result) of the newest frame processed
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=workers)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._workers: List[threading.Thread] = []
+        # Moving average of process() durations, seconds
+        self._processing_time = 0.0
+        self.stats = RealtimeStats()
+
+    def _capture_loop(self, max_frames: Optional[int]):
+        index = 0
+        while not self._stop.is_set() and (max_frames is None or index < max_frames):
+            frame = self.source.read()
+            if frame is None:
+                break
+            item = (index, time.perf_counter(), frame)
+            index += 1
+            with self._lock:
+                self.stats.frames_captured += 1
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    # Stale frame out, newest frame in
+                    try:
+                        self._queue.get_nowait()
+                        with self._lock:
+                            self.stats.dropped_queue += 1
+                    except queue.Empty:
+                        pass
+        # One end marker per worker, without blocking forever if the workers are gone
+        remaining = self.workers
+        while remaining and any(worker.is_alive() for worker in self._workers):
+            try:
+                self._queue.put(None, timeout=0.1)
+                remaining -= 1
+            except queue.Full:
+                pass
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            index, captured, frame = item
+            started = time.perf_counter()
+            # A frame that cannot finish within the budget at the recent processing time is
+            # dropped, unless processing alone exceeds the budget and no frame could
+            expected = self._processing_time if self._processing_time < self.latency_budget else 0.0
+            if started - captured + expected > self.latency_budget:
+                with self._lock:
+                    self.stats.dropped_stale += 1
+                continue
+
+            try:
+                result = self.process(frame)
+            except Exception as error:
+                self._record_error(error)
+                continue
+            finished = time.perf_counter()
+            latency = finished - captured
+            with self._lock:
+                self._processing_time += 0.2 * (finished - started - self._processing_time)
+                self.stats.frames_processed += 1
+                self.stats.latencies.append(latency)
+                if latency > self.latency_budget:
+                    self.stats.late += 1
+                if self.latest is None or index > self.latest[0]:
+                    self.latest = (index, result)
+            if self.on_result is not None:
+                try:
+                    self.on_result(index, result, latency)
+                except Exception as error:
+                    self._record_error(error)
+
+    def _record_error(self, error: Exception):
+        with self._lock:
+            self.stats.errors += 1
+            self.stats.last_error = error
+
+    def run(self, duration: Optional[float] = None, max_frames: Optional[int] = None) -> RealtimeStats:
+        """Run until the source ends, `duration` seconds pass or `max_frames` are captured"""
+        self.stats = RealtimeStats()
+        self._stop.clear()
+        start = time.perf_counter()
+
+        workers = self._workers = [threading.Thread(target=self._worker_loop, daemon=True)
+                                   for _ in range(self.workers)]
+        for worker in workers:
+            worker.start()
+        capture = threading.Thread(target=self._capture_loop, args=(max_frames,), daemon=True)
+        capture.start()
+
+        try:
+            if duration is not None:
+                capture.join(duration)
+                self._stop.set()
+            capture.join()
+            for worker in workers:
+                worker.join()
+        finally:
+            self._stop.set()
+            self.source.close()
+
+        self.stats.duration = time.perf_counter() - start
+        return self.stats
+
+
+def main():
+    """Run on a camera index or a file-backed fake camera and print real-time statistics"""
+    if len(sys.argv) < 2:
+        print("Usage: python camera_edges.py <camera index | video | image dir | .npy> "
+              "[fps: Default 30] [seconds: Default 10] [workers: Default 2] [budget ms: Default 100]")
+        sys.exit(1)
+
+    source_arg = sys.argv[1]
+    fps = float(sys.argv[2]) if len(sys.argv) >= 3 else 30.0
+    seconds = float(sys.argv[3]) if len(sys.argv) >= 4 else 10.0
+    workers = int(sys.argv[4]) if len(sys.argv) >= 5 else 2
+    budget = float(sys.argv[5]) / 1000 if len(sys.argv) >= 6 else 0.1
+
+    source = CameraSource(int(source_arg)) if source_arg.isdigit() else FileCamera(source_arg, fps)
+    runner = RealtimeEdgeRunner(source, workers=workers, latency_budget=budget)
+    stats = runner.run(duration=seconds)
+    print(stats.summary())
+
+
+if __name__ == "__main__":
+    main()
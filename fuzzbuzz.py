@@ -0,0 +1,260 @@
+"""
+fuzzbuzz.py
+
+Command-line batch inference: stream a CSV / .npy / .npz file through a saved model
+in fixed-size chunks and write the defuzzified outputs to a matching file.
+
+    python fuzzbuzz.py model.json sensors.csv scores.csv --chunk-size 65536 --workers 4
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from src.batch import BatchInferenceEngine
+from src.cache import ResultCache, model_fingerprint
+from src.serialization import load_fis
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Engine of the current process, built once per worker
+_engine = None
+
+
+def _init_engine(model_path, resolution):
+    global _engine
+    _engine = BatchInferenceEngine(load_fis(model_path), resolution)
+
+
+def _run_chunk(chunk):
+    """Infer one chunk, parsing CSV text inside the worker so parsing runs in parallel"""
+    kind, payload, columns = chunk
+    if kind == "csv":
+        # Only the input columns are parsed, other columns may hold anything
+        table = np.loadtxt(payload, delimiter=",", ndmin=2, usecols=list(columns.values()))
+        inputs = {name: table[:, position] for position, name in enumerate(columns)}
+    else:
+        inputs = payload
+    return _engine.infer(inputs)
+
+
+class _NpzColumn:
+    def __init__(self, archive, name):
+        """One array of an .npz archive read sequentially, without loading it whole"""
+        self.stream = archive.open(f"{name}.npy")
+        fmt = np.lib.format
+        version = fmt.read_magic(self.stream)
+        read_header = fmt.read_array_header_1_0 if version == (1, 0) else fmt.read_array_header_2_0
+        shape, _, self.dtype = read_header(self.stream)
+        if len(shape) != 1 or self.dtype.hasobject:
+            self.stream.close()
+            raise ValueError(f"Array '{name}' must be one-dimensional and numeric, got shape {shape}")
+        self.rows = shape[0]
+
+    def read(self, count):
+        size = count * self.dtype.itemsize
+        data = self.stream.read(size)
+        if len(data) != size:
+            raise ValueError(f"Array data ends early in {self.stream.name}")
+        return np.frombuffer(data, dtype=self.dtype)
+
+
+def read_chunks(path, input_names, chunk_size):
+    """Yield (kind, payload, columns) chunks and the total row count if known up front"""
+    if path.endswith(".csv"):
+        f = open(path)
+        header = [name.strip() for name in f.readline().strip().split(",")]
+        missing = [name for name in input_names if name not in header]
+        if missing:
+            f.close()
+            raise ValueError(f"Input columns missing from {path}: {', '.join(missing)}")
+        columns = {name: header.index(name) for name in input_names}
+
+        def chunks():
+            with f:
+                while True:
+                    lines = list(itertools.islice(f, chunk_size))
+                    if not lines:
+                        break
+                    yield "csv", lines, columns
+        return chunks(), None
+
+    if path.endswith(".npy"):
+        table = np.load(path, mmap_mode="r")
+        if table.dtype.names is None:
+            raise ValueError(f"{path} must hold a structured array with fields named after the inputs")
+        source = {name: table[name] for name in input_names if name in table.dtype.names}
+    elif path.endswith(".npz"):
+        return _npz_chunks(path, input_names, chunk_size)
+    else:
+        raise ValueError(f"Unsupported input format: {path}")
+
+    missing = [name for name in input_names if name not in source]
+    if missing:
+        raise ValueError(f"Input columns missing from {path}: {', '.join(missing)}")
+    rows = len(next(iter(source.values())))
+
+    def chunks():
+        for start in range(0, rows, chunk_size):
+            stop = min(start + chunk_size, rows)
+            yield "arrays", {name: np.asarray(array[start:stop]) for name, array in source.items()}, None
+    return chunks(), rows
+
+
+def _npz_chunks(path, input_names, chunk_size):
+    """Chunks of an .npz archive, each input array streamed from its (possibly compressed) member"""
+    import zipfile
+    archive = zipfile.ZipFile(path)
+    names = {member[:-4] for member in archive.namelist() if member.endswith(".npy")}
+    missing = [name for name in input_names if name not in names]
+    if missing:
+        archive.close()
+        raise ValueError(f"Input columns missing from {path}: {', '.join(missing)}")
+    try:
+        source = {name: _NpzColumn(archive, name) for name in input_names}
+    except ValueError:
+        archive.close()
+        raise
+    rows = {column.rows for column in source.values()}
+    if len(rows) > 1:
+        archive.close()
+        raise ValueError(f"Input arrays in {path} have different lengths")
+    rows = rows.pop()
+
+    def chunks():
+        with archive:
+            for start in range(0, rows, chunk_size):
+                size = min(chunk_size, rows - start)
+                yield "arrays", {name: column.read(size) for name, column in source.items()}, None
+    return chunks(), rows
+
+
+class CsvWriter:
+    def __init__(self, path, output_names):
+        self.output_names = output_names
+        self.file = open(path, "w")
+        self.file.write(",".join(output_names) + "\n")
+
+    def write(self, outputs):
+        table = np.column_stack([outputs[name] for name in self.output_names])
+        np.savetxt(self.file, table, delimiter=",", fmt="%.6g")
+
+    def close(self):
+        self.file.close()
+
+
+class NpyWriter:
+    def __init__(self, path, output_names, rows):
+        if rows is None:
+            raise ValueError(".npy output needs a .npy or .npz input with a known row count")
+        self.output_names = output_names
+        dtype = [(name, "f8") for name in output_names]
+        self.table = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(rows,))
+        self.position = 0
+
+    def write(self, outputs):
+        size = len(outputs[self.output_names[0]])
+        for name in self.output_names:
+            self.table[name][self.position:self.position + size] = outputs[name]
+        self.position += size
+
+    def close(self):
+        self.table.flush()
+
+
+def run(model_path, input_path, output_path, chunk_size=65536, workers=1, resolution=201, cache=None):
+    """
+    Score `input_path` chunk by chunk and return (rows, seconds). With a ResultCache,
+    an input file already scored by the same model and resolution into the same output
+    format is copied from the cache, and rows is None.
+    """
+    fis = load_fis(model_path)
+
+    key = None
+    if cache is not None:
+        start = time.perf_counter()
+        output_format = os.path.splitext(output_path)[1]
+        key = ResultCache.key(input_path, model_fingerprint(fis, resolution=resolution, output_format=output_format))
+        if cache.get_file(key, output_path):
+            return None, time.perf_counter() - start
+
+    processed, seconds = _score(fis, model_path, input_path, output_path, chunk_size, workers, resolution)
+    if key is not None:
+        cache.put_file(key, output_path)
+    return processed, seconds
+
+
+def _score(fis, model_path, input_path, output_path, chunk_size, workers, resolution):
+    input_names = list(fis.input_variables)
+    output_names = list(fis.output_variables)
+
+    chunks, rows = read_chunks(input_path, input_names, chunk_size)
+    if output_path.endswith(".csv"):
+        writer = CsvWriter(output_path, output_names)
+    elif output_path.endswith(".npy"):
+        writer = NpyWriter(output_path, output_names, rows)
+    else:
+        raise ValueError(f"Unsupported output format: {output_path}")
+
+    start = time.perf_counter()
+    processed = 0
+    try:
+        if workers <= 1:
+            _init_engine(model_path, resolution)
+            for chunk in chunks:
+                outputs = _run_chunk(chunk)
+                writer.write(outputs)
+                processed += len(outputs[output_names[0]])
+        else:
+            with Pool(workers, initializer=_init_engine, initargs=(model_path, resolution)) as pool:
+                # Bounded number of chunks in flight keeps memory independent of file size
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(_run_chunk, (chunk,)))
+                    if len(pending) >= 2 * workers:
+                        outputs = pending.popleft().get()
+                        writer.write(outputs)
+                        processed += len(outputs[output_names[0]])
+                while pending:
+                    outputs = pending.popleft().get()
+                    writer.write(outputs)
+                    processed += len(outputs[output_names[0]])
+    finally:
+        writer.close()
+
+    return processed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="fuzzbuzz", description="Batch fuzzy inference over columnar files")
+    parser.add_argument("model", help="JSON model written by src.serialization.save_fis")
+    parser.add_argument("input", help="CSV with a header row, structured .npy, or .npz with one array per input")
+    parser.add_argument("output", help=".csv or .npy file for the outputs")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="rows per chunk (default: 65536)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--resolution", type=int, default=201, help="output grid points (default: 201)")
+    parser.add_argument("--cache", help="directory of cached results, reused when input, model and options match")
+    parser.add_argument("--cache-size", type=int, default=1024, help="cache size limit in MiB (default: 1024)")
+    args = parser.parse_args()
+
+    try:
+        cache = ResultCache(args.cache, args.cache_size << 20) if args.cache else None
+        rows, seconds = run(args.model, args.input, args.output, args.chunk_size, args.workers,
+                            args.resolution, cache)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if rows is None:
+        print(f"Cache hit, copied result in {seconds:.3f}s", file=sys.stderr)
+        return
+    rate = rows / seconds if seconds > 0 else float("inf")
+    print(f"Processed {rows} rows in {seconds:.2f}s ({rate:.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,21 @@ fuzzy_edge_detection.py
 This script implements edge detection using a Fuzzy Inference System.
 It uses the existing FIS implementation to create rules for detecting edges in images.
 """
-import numpy as np
-import cv2
-import matplotlib.pyplot as plt
+from dataclasses import dataclass
+from typing import Optional
+from utils.lazy import lazy_import
 from src.fis import FuzzyInferenceSystem
 from src.linguisticVariable import LinguisticVariable
 from src.membershipFunction import MembershipFunctionFactory
-from utils.image import resizeImgWidth
+from src.batch import BatchInferenceEngine
+from src.quantized import QuantizedInferenceEngine
+from utils.image import resizeImgWidth, intensityDifferenceMap, neighborhoodVarianceMap, downsampleMean, \
+    sobelGradients, nonMaximumSuppression, hysteresisThreshold
+
+# Heavy dependencies are imported on first use to keep startup fast
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+plt = lazy_import("matplotlib.pyplot")
 
 def create_edge_detection_fis():
     """Create and configure a fuzzy inference system for edge detection"""
@@ -104,11 +112,25 @@ def calculate_neighborhood_variance(img, i, j, window_size=3):
     window = img[i-half:i+half+1, j-half:j+half+1]
     return np.var(window)
 
-def detect_edges(image_path, threshold=50):
-    """Detect edges in an image using fuzzy inference"""
+def detect_edges(image_path, threshold=50, return_strength=False, cache=None):
+    """
+    Detect edges in an image using fuzzy inference
+    With `return_strength`, also return the float edge_strength map (0 where skipped)
+    With a ResultCache, an image already processed with the same model and threshold
+    is read back instead of recomputed
+    """
     # Create fuzzy inference system
     fis = create_edge_detection_fis()
     
+    if cache is not None:
+        from src.cache import ResultCache, model_fingerprint
+        key = ResultCache.key(image_path, model_fingerprint(fis, function="detect_edges", threshold=threshold))
+        arrays = cache.cached_arrays(key, lambda: dict(zip(
+            ("image", "edge_map", "strength"), detect_edges(image_path, threshold, return_strength=True))))
+        if return_strength:
+            return arrays["image"], arrays["edge_map"], arrays["strength"]
+        return arrays["image"], arrays["edge_map"]
+    
     # Read and preprocess image
     img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     if img is None:
@@ -118,6 +140,7 @@ def detect_edges(image_path, threshold=50):
     # Create edge map (same size as input image)
     h, w = img.shape
     edge_map = np.zeros((h, w), dtype=np.uint8)
+    strength_map = np.zeros((h, w), dtype=np.float64)
     
     # Process each pixel (excluding borders)
     for i in range(1, h-1):
@@ -138,13 +161,320 @@ def detect_edges(image_path, threshold=50):
             
             result = fis.infer(inputs)
             edge_strength = result["edge_strength"]
+            strength_map[i, j] = edge_strength
             
             # Apply threshold to determine edge
             if edge_strength > threshold:
                 edge_map[i, j] = 255
     
+    if return_strength:
+        return img, edge_map, strength_map
     return img, edge_map
 
+def create_edge_detection_engine(resolution=201):
+    """Create a batched inference engine for the edge detection FIS"""
+    return BatchInferenceEngine(create_edge_detection_fis(), resolution)
+
+def edge_strength_map(img, engine=None):
+    """
+    Float edge_strength of every pixel with batched inference, 0 where the
+    detect_edges skip rule applies
+    """
+    if engine is None:
+        engine = create_edge_detection_engine()
+
+    intensity_diff = intensityDifferenceMap(img)
+    neighborhood_var = neighborhoodVarianceMap(img)
+    strength = np.zeros(img.shape, dtype=np.float64)
+
+    # Skip processing if the inputs are very low (optimization)
+    active = ~((intensity_diff < 5) & (neighborhood_var < 100))
+    if not active.any():
+        return strength
+
+    result = engine.infer({
+        "intensity_diff": intensity_diff[active],
+        "neighborhood_variance": neighborhood_var[active]
+    })
+    strength[active] = result["edge_strength"]
+    return strength
+
+def detect_edges_in_array(img, threshold=50, engine=None, return_strength=False):
+    """
+    Vectorized edge detection on a grayscale array, without resizing.
+    Same features and skip rule as detect_edges, but inferred with the batch engine,
+    which only approximates fis.infer for the edge detection operators (see
+    BatchInferenceEngine), so the edge map can differ from detect_edges.
+    With `return_strength`, return (edge_map, edge_strength map).
+    """
+    strength = edge_strength_map(img, engine)
+    edge_map = np.where(strength > threshold, 255, 0).astype(np.uint8)
+    if return_strength:
+        return edge_map, strength
+    return edge_map
+
+# Channel fusion rules for color edge detection, reducing a (channels, h, w) stack
+FUSION_RULES = {
+    "max": lambda strengths: strengths.max(axis=0),
+    "mean": lambda strengths: strengths.mean(axis=0),
+    "rms": lambda strengths: np.sqrt((strengths ** 2).mean(axis=0)),
+}
+
+COLOR_CONVERSIONS = {
+    "bgr": None,
+    "rgb": "COLOR_BGR2RGB",
+    "lab": "COLOR_BGR2LAB",
+    "hsv": "COLOR_BGR2HSV",
+    "ycrcb": "COLOR_BGR2YCrCb",
+}
+
+def channel_edge_strengths(channels, engine=None):
+    """
+    edge_strength of every pixel of a (channels, h, w) stack in a single batched
+    inference call. The feature maps of all channels are computed in one pass over
+    the stack, and only the distinct (intensity_diff, neighborhood_variance) pairs are
+    inferred, so the cost grows with the number of distinct pairs rather than pixels.
+    """
+    if engine is None:
+        engine = create_edge_detection_engine()
+
+    channels = np.asarray(channels)
+    intensity_diff = intensityDifferenceMap(channels)
+    neighborhood_var = neighborhoodVarianceMap(channels)
+    strength = np.zeros(intensity_diff.shape, dtype=np.float64)
+
+    # Skip processing if the inputs are very low (optimization)
+    active = ~((intensity_diff < 5) & (neighborhood_var < 100))
+    if not active.any():
+        return strength
+
+    diff = intensity_diff[active].astype(np.int64)
+    variance = neighborhood_var[active]
+    if np.issubdtype(channels.dtype, np.integer) and channels.dtype.itemsize <= 2:
+        # 81 * variance of a 3x3 integer window is an integer, below 2 ** 37 for 16-bit
+        # channels, so it packs with the difference into one key
+        variance_key = np.rint(variance * 81).astype(np.int64)
+        keys = diff * (int(variance_key.max()) + 1) + variance_key
+    else:
+        # Other channels (float, wider integers) number their distinct variances exactly
+        variances, variance_id = np.unique(variance, return_inverse=True)
+        keys = diff * variances.size + variance_id.ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    result = engine.infer({
+        "intensity_diff": diff[first],
+        "neighborhood_variance": variance[first]
+    })
+    strength[active] = result["edge_strength"][inverse.ravel()]
+    return strength
+
+def detect_color_edges(img, threshold=50, color_space="lab", fusion="max", engine=None,
+                       return_strength=False):
+    """
+    Edge detection on a BGR image (as read by cv2.imread). Features are computed per
+    channel of `color_space`, inferred together and the per-channel edge strengths are
+    combined by `fusion`, a name in FUSION_RULES or a function of the channel stack.
+    Channels are inferred with the batch engine, so a single-channel result follows
+    detect_edges_in_array rather than detect_edges.
+    With `return_strength`, return (edge_map, fused edge_strength map).
+    """
+    if img.ndim != 3:
+        raise ValueError(f"Expected an image with channels, got shape {img.shape}")
+    if color_space not in COLOR_CONVERSIONS:
+        raise ValueError(f"Unknown color space '{color_space}', expected one of: {', '.join(COLOR_CONVERSIONS)}")
+    if isinstance(fusion, str):
+        if fusion not in FUSION_RULES:
+            raise ValueError(f"Unknown fusion rule '{fusion}', expected one of: {', '.join(FUSION_RULES)}")
+        fusion = FUSION_RULES[fusion]
+
+    conversion = COLOR_CONVERSIONS[color_space]
+    if conversion is not None:
+        img = cv2.cvtColor(img, getattr(cv2, conversion))
+
+    strengths = channel_edge_strengths(np.moveaxis(img, -1, 0), engine)
+    strength = fusion(strengths)
+    edge_map = np.where(strength > threshold, 255, 0).astype(np.uint8)
+    if return_strength:
+        return edge_map, strength
+    return edge_map
+
+def detect_thin_edges(img, low=25, high=50, engine=None, strength=None):
+    """
+    One-pixel-wide edges: the edge_strength map is thinned by non-maximum suppression
+    along the image gradient, then pixels above `low` are kept when they connect to a
+    pixel above `high` (hysteresis). Pass `strength` to reuse a computed map.
+    """
+    if strength is None:
+        strength = edge_strength_map(img, engine)
+    gx, gy = sobelGradients(img)
+    thinned = nonMaximumSuppression(strength, gx, gy)
+    return np.where(hysteresisThreshold(thinned, low, high), 255, 0).astype(np.uint8)
+
+def create_quantized_edge_engine(resolution=201):
+    """
+    Create a fixed-point engine for the edge detection FIS. Integer intensity
+    differences map one-to-one onto input codes.
+    """
+    return QuantizedInferenceEngine(
+        create_edge_detection_fis(),
+        input_levels={"intensity_diff": 256, "neighborhood_variance": 4096},
+        resolution=resolution,
+    )
+
+def detect_edges_quantized(img, threshold=50, engine=None):
+    """
+    Edge detection with the fixed-point engine. The feature maps are the ones of
+    detect_edges_in_array (int32 intensity differences, float64 variances), quantized
+    to uint16 input codes; from there on degrees and activations are uint8, edge_strength
+    is a table lookup per pixel and the threshold an integer comparison.
+    """
+    if engine is None:
+        engine = create_quantized_edge_engine()
+
+    intensity_diff = intensityDifferenceMap(img)
+    neighborhood_var = neighborhoodVarianceMap(img)
+
+    codes = engine.infer_codes({
+        "intensity_diff": engine.quantize("intensity_diff", intensity_diff),
+        "neighborhood_variance": engine.quantize("neighborhood_variance", neighborhood_var)
+    })["edge_strength"]
+    edges = codes > engine.threshold_code("edge_strength", threshold)
+
+    # Same skip rule as the float path
+    edges &= ~((intensity_diff < 5) & (neighborhood_var < 100))
+    return edges.view(np.uint8) * np.uint8(255)
+
+def open_image_memmap(path, shape=None, dtype="uint8"):
+    """
+    Open a 2D image or 3D image stack without loading it.
+    `.npy` files carry their own shape and dtype, raw files need `shape`.
+    """
+    if path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    if shape is None:
+        raise ValueError("Raw input requires a shape")
+    return np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape))
+
+def detect_edges_chunked(input_path, output_path, threshold=50, shape=None, dtype="uint8",
+                         tile_size=1024, engine=None):
+    """
+    Detect edges tile by tile from a memory-mapped image or stack into a memory-mapped
+    edge map, so peak memory depends on `tile_size` and not on the image size.
+    Each tile is read with a 1-pixel halo so the result matches detect_edges_in_array on
+    the whole image, including its batch-engine differences from detect_edges.
+    """
+    if engine is None:
+        engine = create_edge_detection_engine()
+
+    source = open_image_memmap(input_path, shape, dtype)
+    if source.ndim not in (2, 3):
+        raise ValueError(f"Expected a 2D image or 3D stack, got shape {source.shape}")
+
+    if output_path.endswith(".npy"):
+        edge_map = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.uint8, shape=source.shape)
+    else:
+        edge_map = np.memmap(output_path, dtype=np.uint8, mode="w+", shape=source.shape)
+
+    slices = source if source.ndim == 3 else source[None]
+    targets = edge_map if edge_map.ndim == 3 else edge_map[None]
+    h, w = slices.shape[1:]
+
+    for img, target in zip(slices, targets):
+        for top in range(0, h, tile_size):
+            for left in range(0, w, tile_size):
+                bottom = min(top + tile_size, h)
+                right = min(left + tile_size, w)
+
+                # Halo rows/columns, clamped at the real image border
+                halo_top, halo_left = max(top - 1, 0), max(left - 1, 0)
+                tile = np.asarray(img[halo_top:min(bottom + 1, h), halo_left:min(right + 1, w)])
+
+                edges = detect_edges_in_array(tile, threshold, engine)
+                target[top:bottom, left:right] = edges[top - halo_top:top - halo_top + bottom - top,
+                                                       left - halo_left:left - halo_left + right - left]
+        edge_map.flush()
+
+    return edge_map
+
+@dataclass
+class PyramidStats:
+    tiles_total: int
+    tiles_processed: int
+    skipped_fraction: float  # fraction of pixels never evaluated at full resolution
+    recall: Optional[float] = None  # edges kept relative to detect_edges_in_array, if measured
+
+def detect_edges_pyramid(img, threshold=50, engine=None, levels=2, tile_size=32,
+                         coarse_diff=2, coarse_variance=20, measure_recall=False):
+    """
+    Coarse-to-fine edge detection. Features are computed on a mean pyramid level
+    downsampled by 2**levels; only tiles near coarse pixels that exceed the (lowered)
+    coarse thresholds get full-resolution features and inference.
+    Inference uses the batch engine like detect_edges_in_array, which recall is measured
+    against; neither is identical to detect_edges.
+    Returns the edge map and PyramidStats.
+    """
+    if engine is None:
+        engine = create_edge_detection_engine()
+
+    factor = 2 ** levels
+    if tile_size % factor != 0:
+        raise ValueError(f"tile_size must be a multiple of {factor}")
+
+    h, w = img.shape
+    coarse = downsampleMean(img, factor)
+    candidates = (intensityDifferenceMap(coarse) >= coarse_diff) | \
+                 (neighborhoodVarianceMap(coarse) >= coarse_variance)
+
+    # Grow by one coarse pixel so edges on block boundaries keep their neighbours
+    grown = candidates.copy()
+    grown[1:, :] |= candidates[:-1, :]
+    grown[:-1, :] |= candidates[1:, :]
+    grown[:, 1:] |= candidates[:, :-1]
+    grown[:, :-1] |= candidates[:, 1:]
+
+    # Reduce coarse candidates to one flag per tile
+    cells = tile_size // factor
+    tiles_y, tiles_x = -(-h // tile_size), -(-w // tile_size)
+    padded = np.zeros((tiles_y * cells, tiles_x * cells), dtype=bool)
+    padded[:grown.shape[0], :grown.shape[1]] = grown[:tiles_y * cells, :tiles_x * cells]
+    marked = padded.reshape(tiles_y, cells, tiles_x, cells).any(axis=(1, 3))
+
+    edge_map = np.zeros((h, w), dtype=np.uint8)
+    processed_pixels = 0
+    for ty in range(tiles_y):
+        tx = 0
+        while tx < tiles_x:
+            if not marked[ty, tx]:
+                tx += 1
+                continue
+
+            # Run of consecutive marked tiles handled as one span
+            start = tx
+            while tx < tiles_x and marked[ty, tx]:
+                tx += 1
+            top, bottom = ty * tile_size, min((ty + 1) * tile_size, h)
+            left, right = start * tile_size, min(tx * tile_size, w)
+
+            halo_top, halo_left = max(top - 1, 0), max(left - 1, 0)
+            span = img[halo_top:min(bottom + 1, h), halo_left:min(right + 1, w)]
+            edges = detect_edges_in_array(span, threshold, engine)
+            edge_map[top:bottom, left:right] = edges[top - halo_top:bottom - halo_top,
+                                                     left - halo_left:right - halo_left]
+            processed_pixels += (bottom - top) * (right - left)
+
+    stats = PyramidStats(
+        tiles_total=int(marked.size),
+        tiles_processed=int(marked.sum()),
+        skipped_fraction=1.0 - processed_pixels / float(h * w),
+    )
+
+    if measure_recall:
+        reference = detect_edges_in_array(img, threshold, engine)
+        found = np.count_nonzero(reference)
+        stats.recall = float(np.count_nonzero(edge_map & reference) / found) if found else 1.0
+
+    return edge_map, stats
+
 def main():
     """Main function to run edge detection"""
     import sys
@@ -0,0 +1,357 @@
+"""
+pendulum_sim.py
+
+Headless inverted pendulum simulation for batch evaluation of fuzzy controllers.
+The same world setup and control law are used by the interactive pendulum.py demo.
+"""
+import math
+import sys
+import time
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+
+from Box2D import (b2World, b2EdgeShape, b2FixtureDef, b2PolygonShape, b2CircleShape)
+
+from src.fis import FuzzyInferenceSystem
+from src.linguisticVariable import LinguisticVariable
+from src.membershipFunction import MembershipFunctionFactory
+from src.controller import RealTimeController
+
+# Default membership breakpoints, 3 points -> triangular, 4 points -> trapezoidal
+ANGLE_MEMBERSHIP: Dict[str, List[float]] = {
+    "neg_large": [-1.0, -1.0, -0.6, -0.4],
+    "neg_medium": [-0.6, -0.4, -0.2],
+    "neg_small": [-0.3, -0.1, 0.0],
+    "zero": [-0.1, 0.0, 0.1],
+    "pos_small": [0.0, 0.1, 0.3],
+    "pos_medium": [0.2, 0.4, 0.6],
+    "pos_large": [0.4, 0.6, 1.0, 1.0],
+}
+
+MOTOR_MEMBERSHIP: Dict[str, List[float]] = {
+    "neg_large": [-300, -300, -200, -100],
+    "neg_medium": [-150, -100, -50],
+    "neg_small": [-75, -25, 0],
+    "zero": [-25, 0, 25],
+    "pos_small": [0, 25, 75],
+    "pos_medium": [50, 100, 150],
+    "pos_large": [100, 200, 300, 300],
+}
+
+# Inverse relationship between angle and motor speed
+PENDULUM_RULES = """
+IF join1 is neg_large THEN motor is pos_large;
+IF join1 is neg_medium THEN motor is pos_medium;
+IF join1 is neg_small THEN motor is pos_small;
+IF join1 is zero THEN motor is zero;
+IF join1 is pos_small THEN motor is neg_small;
+IF join1 is pos_medium THEN motor is neg_medium;
+IF join1 is pos_large THEN motor is neg_large
+"""
+
+PENDULUM_ANCHOR = (0, 3)
+PENDULUM_HALF_LENGTH = 10
+
+
+def _add_membership_functions(variable: LinguisticVariable, breakpoints: Dict[str, List[float]]):
+    for label, points in breakpoints.items():
+        if len(points) == 3:
+            mem_fn = MembershipFunctionFactory.create_triangular(label, list(points))
+        else:
+            mem_fn = MembershipFunctionFactory.create_trapezoidal(label, list(points))
+        variable.add_membership_function(mem_fn)
+
+
+def create_pendulum_fis(angle_membership: Optional[Dict[str, List[float]]] = None,
+                        motor_membership: Optional[Dict[str, List[float]]] = None,
+                        rules_str: Optional[str] = None) -> FuzzyInferenceSystem:
+    """Create the pendulum FIS, optionally overriding breakpoints or the rule base"""
+    fis = FuzzyInferenceSystem()
+
+    pendulum_angle = LinguisticVariable("join1", [-1, 1])
+    _add_membership_functions(pendulum_angle, angle_membership or ANGLE_MEMBERSHIP)
+
+    motor_speed = LinguisticVariable("motor", [-300, 300])
+    _add_membership_functions(motor_speed, motor_membership or MOTOR_MEMBERSHIP)
+
+    fis.add_input_variable(pendulum_angle)
+    fis.add_output_variable(motor_speed)
+    fis.add_rules_from_string(rules_str or PENDULUM_RULES)
+    return fis
+
+
+class PendulumModel:
+    """
+    Bodies, joints and fuzzy controller of the inverted pendulum.
+    Subclasses provide `self.world`, either a rendering Framework or a bare b2World.
+    """
+
+    def createFuzzy(self, angle_membership=None, motor_membership=None, rules_str=None,
+                    resolution: int = 2001):
+        self.fis = create_pendulum_fis(angle_membership, motor_membership, rules_str)
+        self.pendulum_angle = self.fis.input_variables["join1"]
+        self.motor_speed = self.fis.output_variables["motor"]
+
+        # Compile the FIS into a lookup table so every physics tick has a fixed cost
+        self.controller = RealTimeController(self.fis, "join1", "motor", resolution)
+
+    def createWorld(self, initial_angle: float = 0.0):
+        self._isLiving = True
+        self._auto = False  # Start with auto mode off
+
+        self.ground = self.world.CreateBody(
+            shapes=b2EdgeShape(vertices=[(-25, 0), (25, 0)])
+        )
+
+        self.carBody = self.world.CreateDynamicBody(
+            position=(0, 3),
+            fixtures=b2FixtureDef(
+                shape=b2PolygonShape(box=(5, 1)), density=1)
+        )
+
+        self.carLwheel = self.world.CreateDynamicBody(
+            position=(-3, 1),
+            fixtures=b2FixtureDef(
+                shape=b2CircleShape(radius=1), density=2, friction=1)
+        )
+
+        self.carRwheel = self.world.CreateDynamicBody(
+            position=(3, 1),
+            fixtures=b2FixtureDef(
+                shape=b2CircleShape(radius=1), density=2, friction=1)
+        )
+
+        # Rotate the pendulum about its anchor, counter-clockwise for positive angles
+        anchor_x, anchor_y = PENDULUM_ANCHOR
+        self.pendulum = self.world.CreateDynamicBody(
+            position=(anchor_x - PENDULUM_HALF_LENGTH * math.sin(initial_angle),
+                      anchor_y + PENDULUM_HALF_LENGTH * math.cos(initial_angle)),
+            angle=initial_angle,
+            fixtures=b2FixtureDef(
+                shape=b2PolygonShape(box=(0.5, PENDULUM_HALF_LENGTH)), density=1),
+        )
+
+        self.pendelumJoin = self.world.CreateRevoluteJoint(
+            bodyA=self.carBody,
+            bodyB=self.pendulum,
+            anchor=PENDULUM_ANCHOR,
+            maxMotorTorque=1,
+            enableMotor=True
+        )
+
+        self.pendelumRJoin = self.world.CreateRevoluteJoint(
+            bodyA=self.carBody,
+            bodyB=self.carRwheel,
+            anchor=(3, 1),
+            maxMotorTorque=1,
+            enableMotor=True,
+        )
+
+        self.pendelumLJoin = self.world.CreateRevoluteJoint(
+            bodyA=self.carBody,
+            bodyB=self.carLwheel,
+            anchor=(-3, 1),
+            maxMotorTorque=1,
+            enableMotor=True,
+        )
+
+    def destroyWorld(self):
+        self.world.DestroyBody(self.carBody)
+        self.world.DestroyBody(self.carLwheel)
+        self.world.DestroyBody(self.carRwheel)
+        self.world.DestroyBody(self.pendulum)
+        self._isLiving = False
+
+    def enableAuto(self):
+        self.pendelumLJoin.motorSpeed = 0
+        self.pendelumLJoin.maxMotorTorque = 1000
+        self.pendelumRJoin.motorSpeed = 0
+        self.pendelumRJoin.maxMotorTorque = 1000
+        self._auto = True
+
+    def applyControl(self) -> float:
+        """Drive the wheels from the current pendulum angle and return the motor speed"""
+        self.pendelumLJoin.maxMotorTorque = 1000
+        self.pendelumRJoin.maxMotorTorque = 1000
+
+        # Get the current angle, ensuring it's within the defined range
+        angle = max(min(self.pendulum.angle, 1.0), -1.0)
+
+        # Only apply control if angle is outside a small deadzone
+        if abs(angle) < 0.01:
+            motor_speed = 0
+        else:
+            motor_speed = self.controller.evaluate(angle)
+
+        # Apply the inferred motor speed
+        self.pendelumLJoin.motorSpeed = motor_speed
+        self.pendelumRJoin.motorSpeed = motor_speed
+        return motor_speed
+
+
+@dataclass
+class EpisodeConfig:
+    initial_angle: float = 0.1
+    duration: float = 10.0
+    hz: float = 60.0
+    velocity_iterations: int = 8
+    position_iterations: int = 3
+    settle_tolerance: float = 0.02
+    fall_angle: float = 1.0
+    angle_membership: Optional[Dict[str, List[float]]] = None
+    motor_membership: Optional[Dict[str, List[float]]] = None
+    rules_str: Optional[str] = None
+    resolution: int = 501
+
+
+@dataclass
+class EpisodeResult:
+    config: EpisodeConfig
+    steps: int
+    settle_time: Optional[float]  # None if the angle never stayed inside the tolerance
+    overshoot: float  # largest angle reached on the opposite side of the initial tilt
+    control_effort: float  # integral of |motor speed| over the episode
+    max_angle: float
+    fell: bool
+
+
+@dataclass
+class SweepReport:
+    results: List[EpisodeResult] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    @property
+    def total_steps(self) -> int:
+        return sum(result.steps for result in self.results)
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.total_steps / self.wall_time if self.wall_time > 0 else 0.0
+
+    @property
+    def episodes_per_minute(self) -> float:
+        return 60.0 * len(self.results) / self.wall_time if self.wall_time > 0 else 0.0
+
+
+class HeadlessPendulum(PendulumModel):
+    def __init__(self, config: EpisodeConfig, controller: Optional[RealTimeController] = None):
+        self.config = config
+        self.world = b2World(gravity=(0, -10), doSleep=True)
+        self.createWorld(config.initial_angle)
+        if controller is None:
+            self.createFuzzy(config.angle_membership, config.motor_membership,
+                             config.rules_str, config.resolution)
+        else:
+            self.controller = controller
+        self.enableAuto()
+
+    def run(self) -> EpisodeResult:
+        config = self.config
+        time_step = 1.0 / config.hz
+        total_steps = int(round(config.duration * config.hz))
+        sign = 1.0 if config.initial_angle >= 0 else -1.0
+
+        settle_step = None
+        overshoot = 0.0
+        control_effort = 0.0
+        max_angle = abs(config.initial_angle)
+        steps = 0
+        fell = False
+
+        for step in range(total_steps):
+            motor_speed = self.applyControl()
+            self.world.Step(time_step, config.velocity_iterations, config.position_iterations)
+            self.world.ClearForces()
+            steps += 1
+
+            angle = self.pendulum.angle
+            control_effort += abs(motor_speed) * time_step
+            max_angle = max(max_angle, abs(angle))
+            overshoot = max(overshoot, -sign * angle)
+
+            # Settled from the first step after which the angle stays inside the tolerance
+            if abs(angle) <= config.settle_tolerance:
+                if settle_step is None:
+                    settle_step = step + 1
+            else:
+                settle_step = None
+
+            if abs(angle) > config.fall_angle:
+                fell = True
+                break
+
+        settle_time = None
+        if settle_step is not None and not fell:
+            settle_time = settle_step * time_step
+
+        return EpisodeResult(config, steps, settle_time, overshoot, control_effort, max_angle, fell)
+
+
+# Controllers compiled in this process, keyed by the parts of the config that define them
+_controller_cache: Dict[tuple, RealTimeController] = {}
+
+
+def _controller_key(config: EpisodeConfig) -> tuple:
+    def freeze(membership):
+        if membership is None:
+            return None
+        return tuple((label, tuple(points)) for label, points in membership.items())
+    return (freeze(config.angle_membership), freeze(config.motor_membership),
+            config.rules_str, config.resolution)
+
+
+def run_episode(config: EpisodeConfig) -> EpisodeResult:
+    """Simulate one episode without rendering, reusing compiled controllers when possible"""
+    key = _controller_key(config)
+    controller = _controller_cache.get(key)
+    if controller is None:
+        fis = create_pendulum_fis(config.angle_membership, config.motor_membership, config.rules_str)
+        controller = RealTimeController(fis, "join1", "motor", config.resolution)
+        _controller_cache[key] = controller
+    return HeadlessPendulum(config, controller).run()
+
+
+def run_sweep(configs: List[EpisodeConfig], processes: Optional[int] = None,
+              chunksize: int = 16) -> SweepReport:
+    """Run many episodes across worker processes, `processes=1` runs in this process"""
+    start = time.perf_counter()
+    if processes == 1:
+        results = [run_episode(config) for config in configs]
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(run_episode, configs, chunksize)
+    return SweepReport(results, time.perf_counter() - start)
+
+
+def main():
+    """Sweep initial angles and print per-episode metrics and throughput"""
+    episodes = 100
+    processes = None
+
+    if len(sys.argv) >= 2:
+        episodes = int(sys.argv[1])
+    if len(sys.argv) >= 3:
+        processes = int(sys.argv[2])
+
+    configs = []
+    for i in range(episodes):
+        angle = -0.5 + i / max(episodes - 1, 1)
+        configs.append(EpisodeConfig(initial_angle=angle))
+
+    report = run_sweep(configs, processes)
+
+    for result in report.results:
+        settle = f"{result.settle_time:.2f}s" if result.settle_time is not None else "never"
+        print(f"angle={result.config.initial_angle:+.3f} settle={settle} "
+              f"overshoot={result.overshoot:.3f} effort={result.control_effort:.1f} "
+              f"fell={result.fell}")
+
+    settled = sum(1 for result in report.results if result.settle_time is not None)
+    print(f"Episodes: {len(report.results)} ({settled} settled)")
+    print(f"Simulated steps/s: {report.steps_per_second:.0f}")
+    print(f"Episodes/min: {report.episodes_per_minute:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+src/analysis.py
+
+Rule-base analysis: duplicate, dominated and never-firing rules, coverage gaps and pruning
+"""
+from __future__ import annotations
+import copy
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from src.batch import BatchInferenceEngine
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+@dataclass
+class RuleIssue:
+    kind: str  # "duplicate", "dominated" or "never_fires"
+    rule: int
+    other: Optional[int] = None  # rule that makes `rule` redundant
+    detail: str = ""
+
+
+@dataclass
+class CoverageGap:
+    variable: str
+    interval: Tuple[float, float]  # part of the range where every label has degree 0
+
+
+@dataclass
+class RuleBaseReport:
+    issues: List[RuleIssue] = field(default_factory=list)
+    gaps: List[CoverageGap] = field(default_factory=list)
+    uncovered_fraction: float = 0.0  # sampled inputs where no rule fires
+    uncovered_examples: List[Dict[str, float]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        lines = []
+        for issue in self.issues:
+            other = f" (see rule {issue.other})" if issue.other is not None else ""
+            lines.append(f"rule {issue.rule}: {issue.kind}{other} {issue.detail}".rstrip())
+        for gap in self.gaps:
+            lines.append(f"{gap.variable}: no label covers [{gap.interval[0]:g}, {gap.interval[1]:g}]")
+        lines.append(f"{self.uncovered_fraction:.1%} of sampled inputs fire no rule")
+        return "\n".join(lines)
+
+
+@dataclass
+class PruningResult:
+    fis: object
+    removed: List[int]
+    rejected: List[int]  # candidates kept because removing them changed sampled outputs
+    max_deviation: float
+    time_before: float  # seconds per scalar inference on the check samples
+    time_after: float
+
+
+class RuleBaseAnalyzer:
+    def __init__(self, fis, samples: int = 4096, seed: Optional[int] = 0):
+        """
+        Analyze the rules of `fis` against its input variables. `samples` random inputs
+        drawn uniformly over the input ranges estimate coverage and check pruning.
+        """
+        self.fis = fis
+        self.samples = samples
+        self.seed = seed
+
+    def _sample_inputs(self, samples: int) -> Dict[str, np.ndarray]:
+        rng = np.random.default_rng(self.seed)
+        return {
+            name: rng.uniform(variable.range[0], variable.range[1], samples)
+            for name, variable in self.fis.input_variables.items()
+        }
+
+    def _positive_region(self, var_name: str, label: str) -> Optional[Tuple[float, float]]:
+        """Interval of the variable range where the label can have a positive degree"""
+        variable = self.fis.input_variables.get(var_name)
+        if variable is None or label not in variable.membership_functions:
+            return None
+        low, high = variable.membership_functions[label].support
+        low, high = max(low, variable.range[0]), min(high, variable.range[1])
+        return (low, high) if high > low else None
+
+    def _can_fire(self, antecedents) -> bool:
+        """
+        Conservative check that some input gives the antecedent a positive degree, using
+        boxes of support intervals. "is not" conditions are assumed to be satisfiable.
+        """
+        boxes = None
+        connector = None
+        for var_name, label, operator, next_connector in antecedents:
+            if operator == "is":
+                region = self._positive_region(var_name, label)
+                term = [{var_name: region}] if region is not None else []
+            else:
+                term = [{}]
+
+            if boxes is None:
+                boxes = term
+            elif connector == "AND":
+                combined = []
+                for left in boxes:
+                    for right in term:
+                        box = dict(left)
+                        for name, (low, high) in right.items():
+                            if name in box:
+                                low, high = max(low, box[name][0]), min(high, box[name][1])
+                            box[name] = (low, high)
+                        if all(high > low for low, high in box.values()):
+                            combined.append(box)
+                boxes = combined
+            else:
+                boxes = boxes + term
+            connector = next_connector
+        return boxes is None or bool(boxes)
+
+    @staticmethod
+    def _chain(rule) -> Tuple[Optional[str], frozenset]:
+        """Connector used throughout the antecedent (None if mixed) and its condition set"""
+        connectors = {connector for _, _, _, connector in rule.antecedents[:-1]}
+        conditions = frozenset((var_name, label, operator) for var_name, label, operator, _ in rule.antecedents)
+        if len(connectors) > 1:
+            return None, conditions
+        return (connectors.pop() if connectors else "AND"), conditions
+
+    def find_issues(self) -> List[RuleIssue]:
+        """Duplicate, dominated and never-firing rules, each rule reported at most once"""
+        issues = []
+        rules = self.fis.rules
+        flagged = set()
+
+        for index, rule in enumerate(rules):
+            if rule.weight == 0:
+                issues.append(RuleIssue("never_fires", index, detail="weight is 0"))
+                flagged.add(index)
+            elif not self._can_fire(rule.antecedents):
+                issues.append(RuleIssue("never_fires", index, detail="antecedent supports do not overlap within the input ranges"))
+                flagged.add(index)
+
+        # Identical antecedents and consequents: the later rule repeats the earlier one
+        seen: Dict[Tuple, int] = {}
+        for index, rule in enumerate(rules):
+            if index in flagged:
+                continue
+            key = (tuple(rule.antecedents), frozenset(rule.consequents), rule.weight)
+            if key in seen:
+                issues.append(RuleIssue("duplicate", index, seen[key]))
+                flagged.add(index)
+            else:
+                seen[key] = index
+
+        # With the same consequents, an AND chain over a superset of another AND chain's
+        # conditions (or an OR chain over a subset) never exceeds that rule's activation.
+        # Rules are indexed by consequents, so each rule is only compared with the rules
+        # that have the same condition set, a subset of it (AND) or one of its conditions (OR).
+        chains = [self._chain(rule) for rule in rules]
+        consequents = [frozenset(rule.consequents) for rule in rules]
+        by_conditions: Dict[Tuple, List[int]] = {}
+        and_by_size: Dict[Tuple, List[int]] = {}
+        and_sizes: Dict[frozenset, set] = {}
+        or_by_condition: Dict[Tuple, List[int]] = {}
+        for index, (connector, conditions) in enumerate(chains):
+            if connector is None:
+                continue
+            key = consequents[index]
+            by_conditions.setdefault((key, conditions), []).append(index)
+            if connector == "AND":
+                and_by_size.setdefault((key, len(conditions)), []).append(index)
+                and_sizes.setdefault(key, set()).add(len(conditions))
+            else:
+                for condition in conditions:
+                    or_by_condition.setdefault((key, condition), []).append(index)
+
+        for index, rule in enumerate(rules):
+            if index in flagged or chains[index][0] is None:
+                continue
+            connector, conditions = chains[index]
+            key = consequents[index]
+
+            candidates = list(by_conditions.get((key, conditions), []))
+            if connector == "AND":
+                for size in and_sizes.get(key, ()):
+                    if size >= len(conditions):
+                        continue
+                    rules_of_size = and_by_size[(key, size)]
+                    if math.comb(len(conditions), size) < len(rules_of_size):
+                        for subset in itertools.combinations(conditions, size):
+                            candidates.extend(by_conditions.get((key, frozenset(subset)), []))
+                    else:
+                        candidates.extend(rules_of_size)
+            if connector == "OR" or len(conditions) == 1:
+                containing = [or_by_condition.get((key, condition), []) for condition in conditions]
+                candidates.extend(min(containing, key=len))
+
+            for other in sorted(set(candidates)):
+                if other == index or other in flagged:
+                    continue
+                other_rule = rules[other]
+                if other_rule.weight < rule.weight:
+                    continue
+                other_connector, other_conditions = chains[other]
+                dominated = (
+                    (other_conditions == conditions and other_rule.weight > rule.weight)
+                    or (connector == "AND" and other_connector == "AND" and other_conditions < conditions)
+                    or (other_connector == "OR" and (connector == "OR" or len(conditions) == 1)
+                        and conditions < other_conditions)
+                )
+                if dominated:
+                    issues.append(RuleIssue("dominated", index, other))
+                    flagged.add(index)
+                    break
+        return sorted(issues, key=lambda issue: issue.rule)
+
+    def coverage_gaps(self) -> List[CoverageGap]:
+        """Parts of each input range where no membership function is positive"""
+        gaps = []
+        for name, variable in self.fis.input_variables.items():
+            low, high = variable.range
+            supports = sorted(mem_fn.support for mem_fn in variable.membership_functions.values())
+            position = low
+            for start, stop in supports:
+                if start > position:
+                    gaps.append(CoverageGap(name, (position, min(start, high))))
+                position = max(position, stop)
+                if position >= high:
+                    break
+            if position < high:
+                gaps.append(CoverageGap(name, (position, high)))
+        return [gap for gap in gaps if gap.interval[1] > gap.interval[0]]
+
+    def analyze(self, examples: int = 5) -> RuleBaseReport:
+        """Report rule issues, per-variable gaps and the sampled share of inputs firing no rule"""
+        report = RuleBaseReport(issues=self.find_issues(), gaps=self.coverage_gaps())
+        if not self.fis.rules or not self.fis.input_variables:
+            return report
+
+        inputs = self._sample_inputs(self.samples)
+        activations = BatchInferenceEngine(self.fis).rule_activations(inputs)
+        uncovered = np.flatnonzero(activations.max(axis=0) <= 0)
+        report.uncovered_fraction = uncovered.size / self.samples
+        report.uncovered_examples = [
+            {name: float(values[i]) for name, values in inputs.items()} for i in uncovered[:examples]
+        ]
+        return report
+
+    def _deviation(self, reference: Dict[str, np.ndarray], fis, inputs: Dict[str, np.ndarray]) -> float:
+        outputs = BatchInferenceEngine(fis).infer(inputs)
+        return max((float(np.max(np.abs(outputs[name] - reference[name]))) for name in reference), default=0.0)
+
+    def _scalar_deviation(self, reference: List[Dict[str, float]], fis, points: List[Dict[str, float]]) -> float:
+        deviation = 0.0
+        for point, expected in zip(points, reference):
+            outputs = fis.infer(point)
+            for name, value in expected.items():
+                deviation = max(deviation, abs(outputs[name] - value))
+        return deviation
+
+    def prune(self, tolerance: float = 1e-9, scalar_samples: int = 256) -> PruningResult:
+        """
+        Remove the rules reported by find_issues() when doing so leaves outputs unchanged
+        within `tolerance`, checked with the batch engine on the analyzer's samples and
+        with `infer` on `scalar_samples` of them. Candidates that change the output, for
+        example under sum aggregation, are kept and listed as rejected.
+        """
+        candidates = [issue.rule for issue in self.find_issues()]
+        inputs = self._sample_inputs(self.samples)
+        points = [
+            {name: float(values[i]) for name, values in inputs.items()}
+            for i in range(min(scalar_samples, self.samples))
+        ]
+
+        reference = BatchInferenceEngine(self.fis).infer(inputs)
+        start = time.perf_counter()
+        scalar_reference = [self.fis.infer(point) for point in points]
+        time_before = (time.perf_counter() - start) / max(len(points), 1)
+
+        def without(indices):
+            pruned = copy.deepcopy(self.fis)
+            for index in sorted(indices, reverse=True):
+                pruned.remove_rule(index)
+            return pruned
+
+        def equivalent(pruned):
+            return (self._deviation(reference, pruned, inputs) <= tolerance
+                    and self._scalar_deviation(scalar_reference, pruned, points) <= tolerance)
+
+        # Try everything at once, then halves of any batch that changes the outputs, so
+        # the system is copied and verified once per batch rather than once per candidate
+        removed: List[int] = []
+
+        def accept(batch):
+            if not batch:
+                return
+            if equivalent(without(removed + batch)):
+                removed.extend(batch)
+            elif len(batch) > 1:
+                middle = len(batch) // 2
+                accept(batch[:middle])
+                accept(batch[middle:])
+
+        accept(list(candidates))
+        pruned = without(removed)
+
+        start = time.perf_counter()
+        for point in points:
+            pruned.infer(point)
+        time_after = (time.perf_counter() - start) / max(len(points), 1)
+
+        return PruningResult(
+            fis=pruned,
+            removed=sorted(removed),
+            rejected=[index for index in candidates if index not in removed],
+            max_deviation=max(self._deviation(reference, pruned, inputs),
+                              self._scalar_deviation(scalar_reference, pruned, points)),
+            time_before=time_before,
+            time_after=time_after,
+        )
@@ -0,0 +1,452 @@
+"""
+src/anfis.py
+
+ANFIS-style hybrid training: output set positions by least squares, input breakpoints by gradient descent
+"""
+from __future__ import annotations
+import copy
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from src.piecewiseLinearMemFn import PiecewiseLinearMemFn
+from src.rule import CompiledRuleBase
+from src.tuning import MembershipParameters
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def _piecewise_gradients(x: np.ndarray, points: np.ndarray, heights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unrounded degrees of the outline through (points, heights) and their derivative
+    with respect to every point, shape (points, samples). Segments are selected as
+    PiecewiseLinearMemFn.degrees() does.
+    """
+    index = np.searchsorted(points, x, side="right") - 1
+    np.clip(index, 0, len(points) - 2, out=index)
+    start, end = points[index], points[index + 1]
+    rise = heights[index + 1] - heights[index]
+    run = end - start
+    flat = run == 0
+    safe_run = np.where(flat, 1.0, run)
+    t = (x - start) / safe_run
+
+    degrees = np.where(flat, heights[index], heights[index] + t * rise)
+    gradients = np.zeros((len(points), x.size))
+    samples = np.arange(x.size)
+    # d degree / d start = rise (t - 1) / run and d degree / d end = -rise t / run
+    gradients[index, samples] = np.where(flat, 0.0, rise * (t - 1) / safe_run)
+    gradients[index + 1, samples] = np.where(flat, 0.0, -rise * t / safe_run)
+
+    outside = (x < points[0]) | (x > points[-1])
+    degrees[outside] = 0.0
+    gradients[:, outside] = 0.0
+    return degrees, gradients
+
+
+def _partials(gradient: Callable, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """value, d value / d a and d value / d b from a forward-mode T-norm or S-norm gradient"""
+    value, partials = gradient(a, np.array([[1.0], [0.0]]), b, np.array([[0.0], [1.0]]))
+    partials = np.broadcast_to(partials, (2, a.size))
+    return value, partials[0], partials[1]
+
+
+@dataclass
+class EpochReport:
+    epoch: int
+    loss: float  # mean squared error over the epoch's mini-batches, averaged over outputs
+    gradient_norm: float  # of the mean breakpoint gradient over the epoch
+    seconds: float
+
+    @property
+    def rmse(self) -> float:
+        return float(self.loss ** 0.5)
+
+
+@dataclass
+class TrainingResult:
+    fis: object
+    loss: float
+    initial_loss: float
+    epochs: List[EpochReport] = field(default_factory=list)
+    converged: bool = False
+    samples: int = 0
+    wall_time: float = 0.0
+
+
+class AnfisTrainer:
+    def __init__(self, fis, variables: Optional[List[str]] = None, learning_rate: float = 0.01,
+                 batch_size: int = 65536, ridge: float = 1e-6):
+        """
+        Hybrid ANFIS training of a copy of `fis` with product implication and sum
+        aggregation, whose output is the weighted average sum(a * moment) / sum(a * area)
+        of the output sets, a zero-order Sugeno system with the set moments as consequents.
+
+        Each epoch first solves the moment of every output set by least squares over the
+        whole data set, accumulated batch by batch, and moves each triangle or trapezoid
+        to it. Then the breakpoints of the piecewise-linear input sets of `variables`
+        (all inputs by default) take one Adam step per shuffled mini-batch of
+        `batch_size`, with steps of `learning_rate` times the variable's range. After
+        every step the breakpoints are clipped to the range and sorted, so triangles and
+        trapezoids stay valid. Degrees are not rounded while training.
+        """
+        operators = fis.operators
+        if (operators.implication, operators.aggregation) != ("product", "sum"):
+            raise ValueError(f"ANFIS training needs product implication and sum aggregation, got {operators!r}")
+        if variables is None:
+            variables = list(fis.input_variables)
+        for var_name in variables:
+            if var_name not in fis.input_variables:
+                raise ValueError(f"Input variable '{var_name}' not defined")
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be positive, got {batch_size}")
+
+        self.fis = copy.deepcopy(fis)
+        self.learning_rate = learning_rate
+        self.batch_size = batch_size
+        self.ridge = ridge
+        self._and_gradient = operators.and_gradient
+        self._or_gradient = operators.or_gradient
+
+        self.premises = MembershipParameters(self.fis, variables)
+        self.vector = self.premises.initial.copy()
+        # (start, stop, heights) of each trained input set
+        self._trained = {
+            (var_name, label): (start, stop, np.asarray(
+                self.fis.input_variables[var_name].membership_functions[label].y_coordinates, dtype=float))
+            for var_name, label, start, stop in self.premises.groups
+        }
+
+        compiled = CompiledRuleBase(self.fis.rules)
+        self._compiled = compiled
+        self._clauses = sorted({(var_name, label) for var_name, label, _ in compiled.conditions})
+        for var_name, label, operator in compiled.conditions:
+            variable = self.fis.input_variables.get(var_name)
+            if variable is None:
+                raise ValueError(f"Linguistic variable '{var_name}' not found")
+            if label not in variable.membership_functions:
+                raise ValueError(f"Label '{label}' not found in linguistic variable '{var_name}'")
+            if operator not in ("is", "is not"):
+                raise ValueError(f"Unsupported operator: {operator}")
+        for _, _, consequents in compiled.rules:
+            for var_name, label, operator in consequents:
+                variable = self.fis.output_variables.get(var_name)
+                if variable is None:
+                    raise ValueError(f"Output variable '{var_name}' not defined")
+                if label not in variable.membership_functions:
+                    raise ValueError(f"Label '{label}' not found in linguistic variable '{var_name}'")
+
+        # Output labels in a fixed order per variable, with (area, moment) of each set
+        self._labels: Dict[str, List[str]] = {}
+        self._moments: Dict[str, np.ndarray] = {}
+        for var_name, variable in self.fis.output_variables.items():
+            self._labels[var_name] = list(variable.membership_functions)
+            self._moments[var_name] = self._set_moments(var_name)
+
+    def _set_moments(self, var_name: str) -> np.ndarray:
+        variable = self.fis.output_variables[var_name]
+        return np.array([variable.membership_functions[label].clippedMoments(1.0, *variable.range)
+                         for label in self._labels[var_name]]).reshape(-1, 2)
+
+    def _memberships(self, inputs: Dict[str, np.ndarray]):
+        """Degree of every clause, and d degree / d breakpoints for the trained ones"""
+        degrees, gradients = {}, {}
+        for var_name, label in self._clauses:
+            x = inputs[var_name]
+            trained = self._trained.get((var_name, label))
+            if trained is None:
+                mem_fn = self.fis.input_variables[var_name].membership_functions[label]
+                degrees[(var_name, label)] = mem_fn.degreesAndSlopes(x)[0]
+            else:
+                start, stop, heights = trained
+                degrees[(var_name, label)], gradients[(var_name, label)] = \
+                    _piecewise_gradients(x, self.vector[start:stop], heights)
+        return degrees, gradients
+
+    def _forward(self, inputs: Dict[str, np.ndarray], size: int, keep: bool):
+        """
+        Label activation sums per output, shape (labels, samples), and with `keep` the
+        intermediate values the backward pass needs
+        """
+        compiled = self._compiled
+        memberships, membership_gradients = self._memberships(inputs)
+        conditions = [
+            1.0 - memberships[(var_name, label)] if operator == "is not" else memberships[(var_name, label)]
+            for var_name, label, operator in compiled.conditions
+        ]
+
+        antecedents, steps = [], []
+        for antecedent in compiled.antecedents:
+            if not antecedent:
+                antecedents.append(np.ones(size))
+                steps.append([])
+                continue
+            current = conditions[antecedent[0][0]]
+            connector = antecedent[0][1]
+            partials = []
+            for condition, next_connector in antecedent[1:]:
+                if connector == "AND":
+                    gradient = self._and_gradient
+                elif connector == "OR":
+                    gradient = self._or_gradient
+                else:
+                    raise ValueError(f"Unsupported connector: {connector}")
+                current, left, right = _partials(gradient, current, conditions[condition])
+                if keep:
+                    partials.append((condition, left, right))
+                connector = next_connector
+            antecedents.append(current)
+            steps.append(partials)
+
+        sums = {name: np.zeros((len(labels), size)) for name, labels in self._labels.items()}
+        positions = {name: {label: i for i, label in enumerate(labels)} for name, labels in self._labels.items()}
+        for antecedent, weight, consequents in compiled.rules:
+            activation = antecedents[antecedent] if weight == 1.0 else antecedents[antecedent] * weight
+            for var_name, label, _ in consequents:
+                sums[var_name][positions[var_name][label]] += activation
+        return sums, (memberships, membership_gradients, steps) if keep else None
+
+    def _outputs(self, sums: Dict[str, np.ndarray], targets: Dict[str, np.ndarray]):
+        """Weighted average output, total weight and area-normalized activations per target output"""
+        results = {}
+        for var_name in targets:
+            moments = self._moments[var_name]
+            weights = sums[var_name]
+            total = moments[:, 0] @ weights
+            fired = total > 0
+            features = np.divide(weights, total, out=np.zeros_like(weights), where=fired)
+            results[var_name] = (moments[:, 1] @ features, total, features)
+        return results
+
+    def _backward(self, sums, outputs, targets, cache, size: int) -> Tuple[float, np.ndarray]:
+        """Mean squared error of the batch and its gradient with respect to the breakpoints"""
+        compiled = self._compiled
+        memberships, membership_gradients, steps = cache
+
+        loss = 0.0
+        label_gradients = {}
+        for var_name, target in targets.items():
+            output, total, _ = outputs[var_name]
+            error = output - target
+            loss += float(np.mean(error ** 2)) / len(targets)
+            d_output = 2 * error / (size * len(targets))
+            moments = self._moments[var_name]
+            # d output / d activation sum of label l = (moment_l - output * area_l) / total
+            label_gradients[var_name] = np.divide(
+                moments[:, 1][:, None] - output[None, :] * moments[:, 0][:, None], total[None, :],
+                out=np.zeros((len(moments), size)), where=total[None, :] > 0) * d_output[None, :]
+
+        positions = {name: {label: i for i, label in enumerate(labels)} for name, labels in self._labels.items()}
+        antecedent_gradients = [None] * len(compiled.antecedents)
+        for antecedent, weight, consequents in compiled.rules:
+            gradient = None
+            for var_name, label, _ in consequents:
+                if var_name in label_gradients:
+                    term = label_gradients[var_name][positions[var_name][label]]
+                    gradient = term if gradient is None else gradient + term
+            if gradient is None:
+                continue
+            if weight != 1.0:
+                gradient = gradient * weight
+            current = antecedent_gradients[antecedent]
+            antecedent_gradients[antecedent] = gradient if current is None else current + gradient
+
+        condition_gradients = [None] * len(compiled.conditions)
+
+        def add(condition, gradient):
+            current = condition_gradients[condition]
+            condition_gradients[condition] = gradient if current is None else current + gradient
+
+        for antecedent, gradient, partials in zip(compiled.antecedents, antecedent_gradients, steps):
+            if gradient is None or not antecedent:
+                continue
+            # Fold backwards through the left-to-right combination
+            for condition, left, right in reversed(partials):
+                add(condition, gradient * right)
+                gradient = gradient * left
+            add(antecedent[0][0], gradient)
+
+        vector_gradient = np.zeros_like(self.vector)
+        for (var_name, label, operator), gradient in zip(compiled.conditions, condition_gradients):
+            key = (var_name, label)
+            if gradient is None or key not in membership_gradients:
+                continue
+            if operator == "is not":
+                gradient = -gradient
+            start, stop, _ = self._trained[key]
+            vector_gradient[start:stop] += membership_gradients[key] @ gradient
+        return loss, vector_gradient
+
+    def _batches(self, inputs: Dict[str, np.ndarray], targets: Dict[str, np.ndarray], size: int,
+                 order: Optional[np.ndarray] = None):
+        """(inputs, targets, size) per mini-batch, in `order` when given"""
+        for start in range(0, size, self.batch_size):
+            if order is None:
+                index = slice(start, min(start + self.batch_size, size))
+            else:
+                # Sorted so memory-mapped arrays are read front to back
+                index = np.sort(order[start:start + self.batch_size])
+            batch_inputs = {name: np.asarray(values[index], dtype=float) for name, values in inputs.items()}
+            batch_targets = {name: np.asarray(values[index], dtype=float) for name, values in targets.items()}
+            yield batch_inputs, batch_targets, len(next(iter(batch_targets.values())))
+
+    def _solve_consequents(self, inputs, targets, size: int):
+        """Least-squares moments of the output sets from normal equations accumulated per batch"""
+        normal = {name: np.zeros((len(self._labels[name]),) * 2) for name in targets}
+        right = {name: np.zeros(len(self._labels[name])) for name in targets}
+        for batch_inputs, batch_targets, batch_size in self._batches(inputs, targets, size):
+            sums, _ = self._forward(batch_inputs, batch_size, keep=False)
+            for var_name, (_, _, features) in self._outputs(sums, batch_targets).items():
+                normal[var_name] += features @ features.T
+                right[var_name] += features @ batch_targets[var_name]
+
+        for var_name in targets:
+            moments = self._moments[var_name]
+            # Ridge towards the current moments keeps sets no rule reaches in place
+            penalty = self.ridge * max(np.trace(normal[var_name]) / len(moments), 1e-12)
+            solved = np.linalg.solve(normal[var_name] + penalty * np.eye(len(moments)),
+                                     right[var_name] + penalty * moments[:, 1])
+            self._move_output_sets(var_name, solved)
+
+    def _move_output_sets(self, var_name: str, solved: np.ndarray):
+        """Shift each output set so its moment becomes `solved`, keeping it inside the range"""
+        variable = self.fis.output_variables[var_name]
+        low, high = variable.range
+        for label, (area, moment), target in zip(self._labels[var_name], self._moments[var_name], solved):
+            mem_fn = variable.membership_functions[label]
+            if area <= 0 or not isinstance(mem_fn, PiecewiseLinearMemFn):
+                continue
+            points = mem_fn.x_coordinates
+            shift = (target - moment) / area
+            shift = min(max(shift, min(0.0, low - points[0])), max(0.0, high - points[-1]))
+            if shift:
+                variable.add_membership_function(mem_fn.withXCoordinates([float(x + shift) for x in points]))
+        self._moments[var_name] = self._set_moments(var_name)
+
+    def _evaluate(self, inputs, targets, size: int) -> float:
+        total = 0.0
+        for batch_inputs, batch_targets, batch_size in self._batches(inputs, targets, size):
+            sums, _ = self._forward(batch_inputs, batch_size, keep=False)
+            for var_name, (output, _, _) in self._outputs(sums, batch_targets).items():
+                total += float(np.sum((output - batch_targets[var_name]) ** 2)) / len(targets)
+        return total / size if size else 0.0
+
+    def _trained_fis(self):
+        return self.premises.apply(self.fis, self.vector)
+
+    def _state(self):
+        """Breakpoints and output sets, to come back to with _restore"""
+        sets = {name: dict(self.fis.output_variables[name].membership_functions) for name in self._labels}
+        return self.vector.copy(), sets, {name: moments.copy() for name, moments in self._moments.items()}
+
+    def _restore(self, state):
+        vector, sets, moments = state
+        self.vector = vector.copy()
+        for name, functions in sets.items():
+            self.fis.output_variables[name].membership_functions = dict(functions)
+        self._moments = {name: values.copy() for name, values in moments.items()}
+
+    def fit(self, inputs: Dict[str, np.ndarray], targets: Dict[str, np.ndarray], epochs: int = 20,
+            tol: float = 1e-6, seed: Optional[int] = None,
+            on_epoch: Optional[Callable[[EpochReport], None]] = None) -> TrainingResult:
+        """
+        Train on equally sized arrays (NumPy arrays or memory maps) keyed by input and
+        output variable name. Stops after `epochs` or once an epoch improves the best loss
+        by less than `tol` relative to it. An epoch whose loss is above the best goes back
+        to the breakpoints and output sets of the best epoch and halves the step, which
+        matters when the data fits in one batch and every step is a full-batch step.
+        The returned system is the better of the best and the final state, scored on
+        the whole data set. `on_epoch` is called with each EpochReport as it completes.
+        """
+        start_time = time.perf_counter()
+        for var_name in targets:
+            if var_name not in self.fis.output_variables:
+                raise ValueError(f"Output variable '{var_name}' not defined")
+            for label, mem_fn in self.fis.output_variables[var_name].membership_functions.items():
+                if not isinstance(mem_fn, PiecewiseLinearMemFn):
+                    raise ValueError(f"Output set '{label}' of '{var_name}' is not piecewise-linear")
+        for var_name, _ in self._clauses:
+            if var_name not in inputs:
+                raise ValueError(f"Input value for '{var_name}' not provided")
+        sizes = {len(values) for values in {**inputs, **targets}.values()}
+        if len(sizes) > 1:
+            raise ValueError("Input and target arrays must have the same length")
+        size = sizes.pop() if sizes else 0
+
+        rng = np.random.default_rng(seed)
+        initial_loss = self._evaluate(inputs, targets, size)
+        span = self.premises.upper - self.premises.lower
+        first_moment = np.zeros_like(self.vector)
+        second_moment = np.zeros_like(self.vector)
+        beta1, beta2, step = 0.9, 0.999, 0
+        rate = self.learning_rate
+
+        reports: List[EpochReport] = []
+        converged = False
+        best_loss, best_state = initial_loss, self._state()
+        restarted = False
+        for epoch in range(1, epochs + 1):
+            epoch_start = time.perf_counter()
+            self._solve_consequents(inputs, targets, size)
+            # The epoch loss is measured from this state (exactly so with a single batch)
+            state = self._state()
+
+            loss_sum = 0.0
+            gradient_sum = np.zeros_like(self.vector)
+            for batch_inputs, batch_targets, batch_size in self._batches(inputs, targets, size,
+                                                                         rng.permutation(size)):
+                sums, cache = self._forward(batch_inputs, batch_size, keep=True)
+                outputs = self._outputs(sums, batch_targets)
+                loss, gradient = self._backward(sums, outputs, batch_targets, cache, batch_size)
+                loss_sum += loss * batch_size
+                gradient_sum += gradient * batch_size
+                if not self.vector.size:
+                    continue
+
+                step += 1
+                first_moment = beta1 * first_moment + (1 - beta1) * gradient
+                second_moment = beta2 * second_moment + (1 - beta2) * gradient ** 2
+                update = (first_moment / (1 - beta1 ** step)) / (np.sqrt(second_moment / (1 - beta2 ** step)) + 1e-12)
+                self.vector = self.premises.repair(self.vector - rate * span * update, grid=False)
+
+            loss = loss_sum / size if size else 0.0
+            report = EpochReport(epoch, loss, float(np.linalg.norm(gradient_sum / max(size, 1))),
+                                 time.perf_counter() - epoch_start)
+            reports.append(report)
+            if on_epoch is not None:
+                on_epoch(report)
+            if restarted:
+                # This epoch's loss is the best state's again, only its steps are new
+                restarted = False
+            elif loss <= best_loss:
+                converged = best_loss - loss <= tol * best_loss
+                best_loss, best_state = loss, state
+                if converged:
+                    break
+            else:
+                # Overshot: go back to the best state and continue with half the step
+                self._restore(best_state)
+                rate *= 0.5
+                restarted = True
+
+        # Consequents fitted to the final breakpoints, kept if they beat the best state
+        if epochs > 0:
+            self._solve_consequents(inputs, targets, size)
+        final_loss = self._evaluate(inputs, targets, size)
+        if epochs > 0:
+            final_state = self._state()
+            self._restore(best_state)
+            restored_loss = self._evaluate(inputs, targets, size)
+            if restored_loss < final_loss:
+                final_loss = restored_loss
+            else:
+                self._restore(final_state)
+        return TrainingResult(
+            fis=self._trained_fis(),
+            loss=final_loss,
+            initial_loss=initial_loss,
+            epochs=reports,
+            converged=converged,
+            samples=size,
+            wall_time=time.perf_counter() - start_time,
+        )
@@ -0,0 +1,276 @@
+"""
+src/batch.py
+
+Vectorized fuzzy inference over arrays of inputs
+"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from src.rule import CompiledRuleBase
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+class BatchInferenceEngine:
+    def __init__(self, fis, resolution: int = 201, chunk_size: int = 8192):
+        """
+        Compile `fis` for array inputs with its operator family. Output sets are sampled
+        on `resolution` points across each output range and defuzzified by the centroid
+        of the aggregated sets, except for product implication with sum aggregation,
+        which needs only the precomputed area and moment of each output set.
+
+        Results agree with fis.infer up to the sampling of the output sets (about 1e-13
+        for the non-default families on the edge detection system) except for the
+        default min/max/min family, where infer keeps the original pairwise polygon
+        merge. That merge is not the max envelope this engine integrates, so for the
+        default family the engine is an approximation of infer, not a vectorized copy:
+        on the edge detection system they differ by up to 68 points (19.9 on average)
+        and 14% of random inputs land on opposite sides of a threshold of 25.
+        """
+        self.fis = fis
+        self.input_variables = fis.input_variables
+        self.output_variables = fis.output_variables
+        self.resolution = resolution
+        self.chunk_size = chunk_size
+
+        operators = fis.operators
+        self._and = operators.and_array
+        self._or = operators.or_array
+        self._implication = operators.implication_array
+        self._closed_form = operators.aggregation == "sum" and operators.implication == "product"
+        if self._closed_form:
+            self._infer_chunk = self._infer_chunk_closed_form
+        elif operators.aggregation == "sum":
+            self._infer_chunk = self._infer_chunk_summed
+
+        self._build()
+
+    def _build(self):
+        """Compile the whole system, used at construction and when the change log is not enough"""
+        self.version = self.fis.version
+        self._compiled = self.fis.compiled_rules()
+
+        # Each distinct (variable, label) membership lookup is evaluated once per call
+        self._clauses: List[Tuple[str, str]] = []
+        self._clause_functions = []
+        self._clause_index: Dict[Tuple[str, str], int] = {}
+        # (clause, negate) per condition of the compiled rule base
+        self._conditions: List[Tuple[int, bool]] = []
+        self._map_conditions()
+        for rule in self._compiled.source:
+            self._check_consequents(rule)
+
+        # Output membership functions sampled on a fixed grid
+        self._grids: Dict[str, np.ndarray] = {}
+        self._output_sets: Dict[str, Dict[str, np.ndarray]] = {}
+        # (area, moment) of each output set, for the closed-form path
+        self._set_moments: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        for var_name, variable in self.output_variables.items():
+            if not self._closed_form:
+                x_min, x_max = variable.range
+                self._grids[var_name] = np.linspace(x_min, x_max, self.resolution)
+            self._output_sets[var_name] = {}
+            self._set_moments[var_name] = {}
+            for label in variable.membership_functions:
+                self._compile_output_set(var_name, label)
+
+    def _compile_output_set(self, var_name: str, label: str):
+        variable = self.output_variables[var_name]
+        mem_fn = variable.membership_functions.get(label)
+        if mem_fn is None:
+            self._output_sets[var_name].pop(label, None)
+            self._set_moments[var_name].pop(label, None)
+        elif self._closed_form:
+            self._set_moments[var_name][label] = mem_fn.clippedMoments(1.0, *variable.range)
+        else:
+            self._output_sets[var_name][label] = mem_fn.degrees(self._grids[var_name])
+
+    def _map_conditions(self):
+        """Resolve conditions added to the compiled rule base since the last call"""
+        for var_name, label, operator in self._compiled.conditions[len(self._conditions):]:
+            key = (var_name, label)
+            if key not in self._clause_index:
+                self._clause_index[key] = len(self._clauses)
+                self._clauses.append(key)
+                variable = self.input_variables.get(var_name)
+                self._clause_functions.append(None if variable is None else variable.membership_functions.get(label))
+            self._conditions.append((self._clause_index[key], operator == "is not"))
+
+        # Only conditions some rule still uses have to resolve and be evaluated
+        self._live_clauses = [False] * len(self._clauses)
+        for (var_name, label, operator), refs in zip(self._compiled.conditions, self._compiled.condition_refs):
+            if not refs:
+                continue
+            self._live_clauses[self._clause_index[(var_name, label)]] = True
+            if var_name not in self.input_variables:
+                raise ValueError(f"Linguistic variable '{var_name}' not found")
+            if self._clause_functions[self._clause_index[(var_name, label)]] is None:
+                raise ValueError(f"Label '{label}' not found in linguistic variable '{var_name}'")
+            if operator not in ("is", "is not"):
+                raise ValueError(f"Unsupported operator: {operator}")
+
+    def _check_consequents(self, rule):
+        for var_name, label, operator in rule.consequents:
+            if var_name not in self.output_variables:
+                raise ValueError(f"Output variable '{var_name}' not defined")
+            if operator != "is":
+                raise ValueError("Negation in consequent not supported")
+            if label not in self.output_variables[var_name].membership_functions:
+                raise ValueError(f"Label '{label}' not found in linguistic variable '{var_name}'")
+
+    def sync(self):
+        """
+        Bring the engine up to date with changes made through the FuzzyInferenceSystem
+        change methods, recompiling only the rules and membership functions they touched
+        """
+        compiled = self.fis.compiled_rules()
+        if compiled is self._compiled and self.fis.version == self.version:
+            return
+        changes = self.fis.changes_since(self.version)
+        if changes is None or compiled is not self._compiled or any(c[0] == "variable" for c in changes):
+            self._build()
+            return
+
+        removed_outputs = False
+        rules = []
+        for change in changes:
+            if change[0] == "output":
+                _, var_name, label, _ = change
+                self._compile_output_set(var_name, label)
+                removed_outputs |= label not in self.output_variables[var_name].membership_functions
+            elif change[0] == "input":
+                _, var_name, label, _ = change
+                index = self._clause_index.get((var_name, label))
+                if index is not None:
+                    self._clause_functions[index] = self.input_variables[var_name].membership_functions.get(label)
+            else:
+                rules.append(change[1])
+        self._map_conditions()
+
+        if removed_outputs:
+            rules = compiled.source
+        elif rules:
+            live = {id(rule) for rule in compiled.source}
+            rules = [rule for rule in rules if id(rule) in live]
+        for rule in rules:
+            self._check_consequents(rule)
+        self.version = self.fis.version
+
+    def _rule_activations(self, inputs: Dict[str, np.ndarray], size: int) -> List[np.ndarray]:
+        """Activation of every compiled rule, sharing conditions and antecedents"""
+        compiled = self._compiled
+        memberships = [
+            mem_fn.degrees(inputs[var_name]) if live else None
+            for (var_name, _), mem_fn, live in zip(self._clauses, self._clause_functions, self._live_clauses)
+        ]
+        degrees = [
+            None if not refs else 1.0 - memberships[clause] if negate else memberships[clause]
+            for (clause, negate), refs in zip(self._conditions, compiled.condition_refs)
+        ]
+
+        antecedent_activations = [
+            None if not refs else
+            CompiledRuleBase.combine(antecedent, degrees, self._and, self._or) if antecedent else np.ones(size)
+            for antecedent, refs in zip(compiled.antecedents, compiled.antecedent_refs)
+        ]
+
+        return [
+            antecedent_activations[antecedent] if weight == 1.0 else antecedent_activations[antecedent] * weight
+            for antecedent, weight, _ in compiled.rules
+        ]
+
+    def _implied(self, activations: List[np.ndarray]):
+        """(output variable, label, activation) for every consequent of every rule"""
+        for (_, _, consequents), activation in zip(self._compiled.rules, activations):
+            for var_name, label, _ in consequents:
+                yield var_name, label, activation
+
+    def _infer_chunk(self, inputs: Dict[str, np.ndarray], size: int) -> Dict[str, np.ndarray]:
+        activations = self._rule_activations(inputs, size)
+
+        # Clipping or scaling then max over rules equals implying the largest activation per label
+        label_activations: Dict[str, Dict[str, np.ndarray]] = {name: {} for name in self.output_variables}
+        for var_name, label, activation in self._implied(activations):
+            current = label_activations[var_name].get(label)
+            label_activations[var_name][label] = activation if current is None else np.maximum(current, activation)
+
+        outputs = {}
+        for var_name, grid in self._grids.items():
+            envelope = np.zeros((size, grid.size))
+            for label, activation in label_activations[var_name].items():
+                implied = self._implication(activation[:, None], self._output_sets[var_name][label][None, :])
+                np.maximum(envelope, implied, out=envelope)
+            outputs[var_name] = self._centroid(envelope, grid, size)
+        return outputs
+
+    def _infer_chunk_summed(self, inputs: Dict[str, np.ndarray], size: int) -> Dict[str, np.ndarray]:
+        activations = self._rule_activations(inputs, size)
+
+        envelopes = {name: np.zeros((size, grid.size)) for name, grid in self._grids.items()}
+        for var_name, label, activation in self._implied(activations):
+            envelopes[var_name] += self._implication(activation[:, None], self._output_sets[var_name][label][None, :])
+        return {name: self._centroid(envelopes[name], grid, size) for name, grid in self._grids.items()}
+
+    def _infer_chunk_closed_form(self, inputs: Dict[str, np.ndarray], size: int) -> Dict[str, np.ndarray]:
+        activations = self._rule_activations(inputs, size)
+
+        # Scaled sets integrate to activation times the set's own area and moment
+        areas = {name: np.zeros(size) for name in self.output_variables}
+        moments = {name: np.zeros(size) for name in self.output_variables}
+        for var_name, label, activation in self._implied(activations):
+            set_area, set_moment = self._set_moments[var_name][label]
+            areas[var_name] += activation * set_area
+            moments[var_name] += activation * set_moment
+        return {
+            name: np.divide(moments[name], areas[name], out=np.zeros(size), where=areas[name] > 0)
+            for name in self.output_variables
+        }
+
+    @staticmethod
+    def _centroid(envelope: np.ndarray, grid: np.ndarray, size: int) -> np.ndarray:
+        area = envelope.sum(axis=1)
+        moment = envelope @ grid
+        # No rules fired for this sample
+        return np.divide(moment, area, out=np.zeros(size), where=area > 0)
+
+    def _prepare(self, inputs: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], int]:
+        """Sync with the system, validate `inputs` and return them as flat float arrays"""
+        for var_name in inputs:
+            if var_name not in self.input_variables:
+                raise ValueError(f"Input variable '{var_name}' not defined")
+        self.sync()
+        for (var_name, _), live in zip(self._clauses, self._live_clauses):
+            if live and var_name not in inputs:
+                raise ValueError(f"Input value for '{var_name}' not provided")
+
+        arrays = {name: np.asarray(values, dtype=float).ravel() for name, values in inputs.items()}
+        sizes = {array.size for array in arrays.values()}
+        if len(sizes) > 1:
+            raise ValueError("Input arrays must have the same length")
+        return arrays, sizes.pop() if sizes else 0
+
+    def infer(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Perform fuzzy inference on equally sized arrays keyed by input variable name
+        and return an array of defuzzified values per output variable
+        """
+        arrays, size = self._prepare(inputs)
+
+        outputs = {name: np.empty(size) for name in self.output_variables}
+        for start in range(0, size, self.chunk_size):
+            stop = min(start + self.chunk_size, size)
+            chunk = {name: array[start:stop] for name, array in arrays.items()}
+            for name, values in self._infer_chunk(chunk, stop - start).items():
+                outputs[name][start:stop] = values
+        return outputs
+
+    def rule_activations(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """Weighted activation of every rule of the system, shape (rules, samples)"""
+        arrays, size = self._prepare(inputs)
+
+        activations = np.empty((len(self._compiled.rules), size))
+        for start in range(0, size, self.chunk_size):
+            stop = min(start + self.chunk_size, size)
+            chunk = {name: array[start:stop] for name, array in arrays.items()}
+            for row, activation in enumerate(self._rule_activations(chunk, stop - start)):
+                activations[row, start:stop] = activation
+        return activations
@@ -0,0 +1,35 @@
+"""
+src/bellMemFn.py
+
+Generalized Bell Membership Function: 1 / (1 + |(x - center) / width|^(2 * slope))
+"""
+from __future__ import annotations
+from src.parametricMemFn import ParametricMemFn, SUPPORT_EPSILON
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+class BellMemFn(ParametricMemFn):
+    def __init__(self, label: str, center: float, width: float, slope: float):
+        assert width > 0
+        assert slope > 0
+
+        self.center = center
+        self.width = width
+        self.slope = slope
+        half_width = width * (1 / SUPPORT_EPSILON - 1) ** (1 / (2 * slope))
+        super().__init__(label, [center, width, slope], (center - half_width, center + half_width))
+
+    def _scalar(self, x: float) -> float:
+        return 1 / (1 + abs((x - self.center) / self.width) ** (2 * self.slope))
+
+    def _evaluate(self, x: np.ndarray) -> np.ndarray:
+        return 1 / (1 + np.abs((x - self.center) / self.width) ** (2 * self.slope))
+
+    def _derivative(self, x: np.ndarray) -> np.ndarray:
+        offset = x - self.center
+        power = np.abs(offset / self.width) ** (2 * self.slope)
+        # d/dx of |u|^(2s) is 2s |u|^(2s) / (x - center), taken as 0 at the center
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = -2 * self.slope * power / offset / (1 + power) ** 2
+        return np.where(offset == 0, 0.0, slopes)
@@ -0,0 +1,193 @@
+"""
+src/cache.py
+
+Content-addressed on-disk result cache keyed by input bytes and a model fingerprint
+"""
+from __future__ import annotations
+import hashlib
+import io
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Union
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Bytes read at a time when hashing and copying files
+BLOCK_SIZE = 1 << 20
+
+
+def model_fingerprint(fis, **options) -> str:
+    """
+    Hash of the variables, breakpoints, rules and operators of `fis` together with any
+    engine options (resolution, threshold, ...) that change results
+    """
+    import json
+    from src.serialization import fis_to_dict
+    description = json.dumps({"model": fis_to_dict(fis), "options": options}, sort_keys=True, default=str)
+    return hashlib.blake2b(description.encode(), digest_size=32).hexdigest()
+
+
+def content_hash(data: Union[bytes, str]) -> str:
+    """Hash of a byte string, or of the contents of the file at path `data`"""
+    digest = hashlib.blake2b(digest_size=32)
+    if isinstance(data, str):
+        with open(data, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                digest.update(block)
+    else:
+        digest.update(data)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache:
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        """
+        Results stored as files named by their key under `directory`, shared safely by
+        concurrent processes: entries are written to a temporary file and renamed into
+        place, and the modification time records the last use for LRU eviction once the
+        directory holds more than `max_bytes`. Every write rescans the directory, so
+        entries added by other processes count towards the limit; that costs one stat
+        per entry, small next to computing a result worth caching.
+        """
+        if max_bytes <= 0:
+            raise ValueError(f"Cache size must be positive, got {max_bytes}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(data: Union[bytes, str], fingerprint: str) -> str:
+        """Cache key of input bytes (or a file path) under a model fingerprint"""
+        return hashlib.blake2b((content_hash(data) + fingerprint).encode(), digest_size=32).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        """(path, size, last use) of every entry, skipping files removed meanwhile"""
+        for shard in os.listdir(self.directory):
+            shard_path = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if name.startswith("."):
+                    continue  # temporary file of a write in progress
+                path = os.path.join(shard_path, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, info.st_size, info.st_mtime
+
+    def _read(self, key: str, read: Callable):
+        """read(open entry file) for `key`, or None on a miss"""
+        path = self._path(key)
+        try:
+            # An open entry stays readable even if another process evicts it meanwhile
+            with open(path, "rb") as f:
+                result = read(f)
+        except FileNotFoundError:
+            self.stats.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process after the read
+        self.stats.hits += 1
+        return result
+
+    def _write(self, key: str, write: Callable):
+        """write(temporary file) then rename into place under `key`, then evict"""
+        import tempfile  # only needed on writes, kept off the import path
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                write(f)
+            os.replace(temporary, path)
+        except BaseException:
+            try:
+                os.remove(temporary)
+            except FileNotFoundError:
+                pass
+            raise
+        self.stats.writes += 1
+        self.evict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Stored bytes for `key`, or None"""
+        return self._read(key, lambda f: f.read())
+
+    def put(self, key: str, payload: bytes):
+        """Store `payload` under `key` atomically, then evict least recently used entries"""
+        self._write(key, lambda f: f.write(payload))
+
+    def get_file(self, key: str, path: str) -> bool:
+        """Copy the entry for `key` to the file at `path` in blocks; False on a miss"""
+        import shutil
+
+        def copy(source):
+            with open(path, "wb") as destination:
+                shutil.copyfileobj(source, destination, BLOCK_SIZE)
+            return True
+        return bool(self._read(key, copy))
+
+    def put_file(self, key: str, path: str):
+        """Store a copy of the file at `path` under `key`, in blocks, like put()"""
+        import shutil
+
+        def copy(destination):
+            with open(path, "rb") as source:
+                shutil.copyfileobj(source, destination, BLOCK_SIZE)
+        self._write(key, copy)
+
+    def evict(self):
+        """Remove least recently used entries until the directory fits in max_bytes"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.stats.evictions += 1
+            except FileNotFoundError:
+                pass  # already evicted by another process
+            total -= size
+
+    def get_arrays(self, key: str) -> Optional[Dict[str, np.ndarray]]:
+        payload = self.get(key)
+        if payload is None:
+            return None
+        with np.load(io.BytesIO(payload)) as archive:
+            return {name: archive[name] for name in archive.files}
+
+    def put_arrays(self, key: str, arrays: Dict[str, np.ndarray]):
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        self.put(key, buffer.getvalue())
+
+    def cached_arrays(self, key: str, compute: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """Stored arrays for `key`, computed and stored on a miss"""
+        arrays = self.get_arrays(key)
+        if arrays is None:
+            arrays = compute()
+            self.put_arrays(key, arrays)
+        return arrays
@@ -0,0 +1,181 @@
+"""
+src/controller.py
+
+Real-time controller compiled from a single-input fuzzy inference system
+"""
+import math
+import time
+from typing import List, Optional, Tuple
+
+class RealTimeController:
+    def __init__(self, fis, input_name: str, output_name: str, resolution: int = 2001):
+        """
+        Precompute the response of `fis` for one input/output pair into a lookup table.
+        Evaluation is a clamp, one index computation and one linear interpolation, so the
+        cost per call does not depend on how many rules fire.
+        """
+        if input_name not in fis.input_variables:
+            raise ValueError(f"Input variable '{input_name}' not defined")
+        if output_name not in fis.output_variables:
+            raise ValueError(f"Output variable '{output_name}' not defined")
+        if len(fis.input_variables) != 1:
+            raise ValueError("RealTimeController requires a single-input fuzzy inference system")
+        if resolution < 2:
+            raise ValueError("Resolution must be at least 2")
+        x_min, x_max = fis.input_variables[input_name].range
+        if not x_min < x_max:
+            raise ValueError(f"Input variable '{input_name}' needs a range with min < max, got [{x_min}, {x_max}]")
+
+        self.fis = fis
+        self.version = fis.version
+        self.input_name = input_name
+        self.output_name = output_name
+        self.resolution = resolution
+        self.x_min, self.x_max = fis.input_variables[input_name].range
+        self._step = (self.x_max - self.x_min) / (resolution - 1)
+        self._inv_step = 1.0 / self._step
+        self._last_index = resolution - 2
+
+        self._values: List[float] = [0.0] * resolution
+        # Slope of every cell so evaluate() needs a single multiply-add
+        self._slopes: List[float] = [0.0] * (resolution - 1)
+        self._fill(0, resolution - 1)
+
+        self.worst_case_latency: float = None
+        # Slowest point when each point keeps its fastest run: the cost of the code path alone
+        self.code_path_latency: float = None
+        self.max_table_error: float = None
+
+    def _fill(self, first: int, last: int):
+        """Recompute table entries first..last and the slopes of the cells touching them"""
+        for i in range(first, last + 1):
+            x = self.x_min + i * self._step
+            self._values[i] = self.fis.infer({self.input_name: x})[self.output_name]
+        for i in range(max(first - 1, 0), min(last, self.resolution - 2) + 1):
+            self._slopes[i] = self._values[i+1] - self._values[i]
+
+    def _affected_interval(self, change: Tuple) -> Optional[Tuple[float, float]]:
+        """Input interval whose outputs `change` can alter, None if it cannot alter any"""
+        everything = (self.x_min, self.x_max)
+        kind = change[0]
+        if kind == "variable":
+            return everything
+        if kind == "output":
+            return everything if change[1] == self.output_name else None
+        if kind == "input":
+            _, _, label, previous = change
+            current = self.fis.input_variables[self.input_name].membership_functions.get(label)
+            supports = [mem_fn.support for mem_fn in (previous, current) if mem_fn is not None]
+            return (min(low for low, _ in supports), max(high for _, high in supports))
+
+        rule = change[1]
+        if all(var_name != self.output_name for var_name, _, _ in rule.consequents):
+            return None
+        # A rule is inactive outside the supports of its conditions unless one is negated
+        if (not self.fis.ignores_inactive_rules(self.output_name) or not rule.antecedents
+                or any(operator != "is" for _, _, operator, _ in rule.antecedents)):
+            return everything
+        mem_fns = self.fis.input_variables[self.input_name].membership_functions
+        if any(label not in mem_fns for _, label, _, _ in rule.antecedents):
+            return everything
+        supports = [mem_fns[label].support for _, label, _, _ in rule.antecedents]
+        return (min(low for low, _ in supports), max(high for _, high in supports))
+
+    def refresh(self) -> int:
+        """
+        Apply changes made through the fuzzy inference system's change methods since the
+        table was built. Only entries inside the input interval a change can affect are
+        recomputed. Returns the number of entries recomputed.
+        """
+        changes = self.fis.changes_since(self.version)
+        self.version = self.fis.version
+        intervals = [(self.x_min, self.x_max)] if changes is None else [
+            interval for interval in map(self._affected_interval, changes) if interval is not None
+        ]
+
+        # Mark affected entries, merging overlapping intervals
+        dirty = [False] * self.resolution
+        for low, high in intervals:
+            low, high = max(low, self.x_min), min(high, self.x_max)
+            if low > high:
+                continue
+            first = max(0, math.floor((low - self.x_min) * self._inv_step))
+            last = min(self.resolution - 1, math.ceil((high - self.x_min) * self._inv_step))
+            for i in range(first, last + 1):
+                dirty[i] = True
+
+        recomputed = 0
+        i = 0
+        while i < self.resolution:
+            if not dirty[i]:
+                i += 1
+                continue
+            first = i
+            while i < self.resolution and dirty[i]:
+                i += 1
+            self._fill(first, i - 1)
+            recomputed += i - first
+        return recomputed
+
+    def evaluate(self, value: float) -> float:
+        """Return the controller output for `value`, clamped to the input range"""
+        if value <= self.x_min:
+            return self._values[0]
+        if value >= self.x_max:
+            return self._values[-1]
+
+        position = (value - self.x_min) * self._inv_step
+        i = int(position)
+        if i > self._last_index:
+            i = self._last_index
+        return self._values[i] + self._slopes[i] * (position - i)
+
+    def measure_worst_case_latency(self, samples: int = 10001, repeats: int = 5) -> float:
+        """
+        Sweep the input range (including both ends and values outside it) `repeats`
+        times and return the slowest evaluate() call in seconds, scheduler and GC pauses
+        included. The slowest point by its fastest run is kept in `code_path_latency`;
+        the difference between the two is the jitter a control loop has to absorb.
+        """
+        span = self.x_max - self.x_min
+        sweep = [self.x_min - span, self.x_max + span]
+        for i in range(samples):
+            sweep.append(self.x_min + span * i / (samples - 1))
+
+        clock = time.perf_counter_ns
+        evaluate = self.evaluate
+        worst = 0
+        code_path = 0
+        for x in sweep:
+            best = None
+            for _ in range(repeats):
+                start = clock()
+                evaluate(x)
+                elapsed = clock() - start
+                if best is None or elapsed < best:
+                    best = elapsed
+                if elapsed > worst:
+                    worst = elapsed
+            if best > code_path:
+                code_path = best
+
+        self.worst_case_latency = worst * 1e-9
+        self.code_path_latency = code_path * 1e-9
+        return self.worst_case_latency
+
+    def measure_table_error(self, fis, samples: int = 1000) -> float:
+        """Return the largest deviation from `fis.infer` at points between table entries"""
+        error = 0.0
+        for i in range(samples):
+            x = self.x_min + (self.x_max - self.x_min) * (i + 0.5) / samples
+            expected = fis.infer({self.input_name: x})[self.output_name]
+            error = max(error, abs(self.evaluate(x) - expected))
+
+        self.max_table_error = error
+        return error
+
+    def supports_rate(self, rate_hz: float) -> bool:
+        """Check whether the measured worst-case latency fits in one tick at `rate_hz`"""
+        if self.worst_case_latency is None:
+            self.measure_worst_case_latency()
+        return self.worst_case_latency < 1.0 / rate_hz
@@ -3,96 +3,409 @@ src/fis.py
 
 Main fuzzy inference system implementation
 """
-from typing import Dict, List
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from utils.line import Point
 from utils.polygon import Polygon, combinePolygons
 from utils.centroid import get_centroid
-from src.rule import FuzzyRule, RuleParser
+from src.rule import CompiledRuleBase, FuzzyRule, RuleParser
+from src.operators import FuzzyOperators
+from src.parametricMemFn import ParametricMemFn
+from src.trace import ImpliedSet, InferenceTrace, OutputTrace, RuleTrace
+from src.triMemFn import TriMemFn
+from src.trapMemFn import TrapMemFn
+
+# Grid points used to defuzzify outputs whose sets are not triangles or trapezoids
+SAMPLED_RESOLUTION = 201
+# Changes kept for changes_since(), older readers rebuild their caches
+CHANGE_LOG_LIMIT = 4096
 
 class FuzzyInferenceSystem:
-    def __init__(self):
+    def __init__(self, t_norm: str = "min", s_norm: str = None, implication: str = "min",
+                 aggregation: str = "max"):
+        """
+        `t_norm` ("min", "product", "lukasiewicz") combines AND-ed antecedents and
+        `s_norm` ("max", "probabilistic_sum", "lukasiewicz", dual of `t_norm` by default)
+        OR-ed ones. `implication` clips ("min") or scales ("product") the consequent set
+        and `aggregation` ("max", "sum") merges the implied sets of one output.
+        """
         self.input_variables: Dict[str, object] = {}
         self.output_variables: Dict[str, object] = {}
         self.rules: List[FuzzyRule] = []
         self.rule_parser = RuleParser()
+        self.operators = FuzzyOperators(t_norm, s_norm, implication, aggregation)
+
+        # Defuzzification specialised once for the operator family
+        if aggregation == "sum" and implication == "product":
+            self._defuzzify = self._scaled_sum_centroid
+        elif aggregation == "sum":
+            self._defuzzify = self._clipped_sum_centroid
+        elif (t_norm, self.operators.s_norm, implication) == ("min", "max", "min"):
+            # The original polygon merge, kept for the default operators only
+            self._defuzzify = self._max_min_centroid
+        else:
+            self._defuzzify = self._sampled_centroid
+
+        # Incremented by every change made through the methods below. The log holds
+        # ("variable", name), ("rule", rule) for an added or removed rule and
+        # ("input" | "output", variable name, label, previous membership function or None)
+        self.version = 0
+        self._changes: List[Tuple] = []
+        self._changes_start = 0
+
+        # Sampled tracing: every `_trace_every`-th call of infer() keeps its trace in `traces`
+        self._trace_every = 0
+        self._trace_countdown = 0
+        self.traces: deque = deque(maxlen=100)
+
+        # Rule base with shared conditions and antecedents, updated in place by rule changes
+        self._compiled: CompiledRuleBase = None
+        # Output variable name -> (range, grid, {label: (membership function, degrees)})
+        self._sampled_outputs: Dict[str, Tuple] = {}
+        # Output variable name -> {label: (membership function, (area, moment))}
+        self._output_moments: Dict[str, Dict[str, Tuple]] = {}
     
+    def _record(self, *change):
+        self.version += 1
+        self._changes.append(change)
+        if len(self._changes) > CHANGE_LOG_LIMIT:
+            dropped = len(self._changes) // 2
+            del self._changes[:dropped]
+            self._changes_start += dropped
+
+    def changes_since(self, version: int) -> Optional[List[Tuple]]:
+        """Changes made after `version`, None if they are no longer all in the log"""
+        if version < self._changes_start:
+            return None
+        return self._changes[version - self._changes_start:]
+
     def add_input_variable(self, variable):
         """Add an input linguistic variable"""
         self.input_variables[variable.name] = variable
+        self._record("variable", variable.name)
     
     def add_output_variable(self, variable):
         """Add an output linguistic variable"""
         self.output_variables[variable.name] = variable
+        self._record("variable", variable.name)
     
     def add_rule(self, rule: FuzzyRule):
         """Add a single rule"""
         self.rules.append(rule)
+        if self._compiled is not None:
+            self._compiled.add(rule)
+        self._record("rule", rule)
     
     def add_rules_from_string(self, rules_str: str):
         """Parse and add multiple rules from a string"""
-        parsed_rules = self.rule_parser.parse_rules(rules_str)
-        self.rules.extend(parsed_rules)
+        for rule in self.rule_parser.parse_rules(rules_str):
+            self.add_rule(rule)
+
+    def remove_rule(self, index: int) -> FuzzyRule:
+        """Remove and return the rule at `index`"""
+        if not -len(self.rules) <= index < len(self.rules):
+            raise ValueError(f"Rule index {index} out of range")
+        rule = self.rules.pop(index)
+        if self._compiled is not None:
+            self._compiled.remove(index)
+        self._record("rule", rule)
+        return rule
+
+    def replace_rule(self, index: int, rule: FuzzyRule) -> FuzzyRule:
+        """Put `rule` at `index` and return the rule it replaces"""
+        if not -len(self.rules) <= index < len(self.rules):
+            raise ValueError(f"Rule index {index} out of range")
+        previous, self.rules[index] = self.rules[index], rule
+        if self._compiled is not None:
+            self._compiled.replace(index, rule)
+        self._record("rule", previous)
+        self._record("rule", rule)
+        return previous
+
+    def _variable_kind(self, var_name: str) -> Tuple[str, object]:
+        if var_name in self.input_variables:
+            return "input", self.input_variables[var_name]
+        if var_name in self.output_variables:
+            return "output", self.output_variables[var_name]
+        raise ValueError(f"Linguistic variable '{var_name}' not found")
+
+    def add_membership_function(self, var_name: str, mem_fn):
+        """Add `mem_fn` to a variable, replacing the set with the same label"""
+        kind, variable = self._variable_kind(var_name)
+        previous = variable.membership_functions.get(mem_fn.label)
+        variable.add_membership_function(mem_fn)
+        self._record(kind, var_name, mem_fn.label, previous)
+
+    def remove_membership_function(self, var_name: str, label: str):
+        """Remove the set `label` from a variable"""
+        kind, variable = self._variable_kind(var_name)
+        if label not in variable.membership_functions:
+            raise ValueError(f"Label '{label}' not found in linguistic variable '{var_name}'")
+        previous = variable.membership_functions.pop(label)
+        self._record(kind, var_name, label, previous)
     
-    def infer(self, inputs: Dict[str, float]) -> Dict[str, float]:
+    def enable_tracing(self, every: int = 100, keep: int = 100):
+        """Keep the trace of every `every`-th inference in `traces`, the last `keep` of them"""
+        if every < 1:
+            raise ValueError(f"Tracing interval must be at least 1, got {every}")
+        self._trace_every = every
+        self._trace_countdown = every
+        self.traces = deque(self.traces, maxlen=keep)
+
+    def disable_tracing(self):
+        self._trace_every = 0
+
+    def infer(self, inputs: Dict[str, float], trace: bool = False):
         """
         Perform fuzzy inference and return defuzzified outputs
+        With `trace`, return (outputs, InferenceTrace) describing this pass
         """
+        record = None
+        if trace:
+            record = InferenceTrace(dict(inputs))
+        elif self._trace_every:
+            self._trace_countdown -= 1
+            if self._trace_countdown == 0:
+                self._trace_countdown = self._trace_every
+                record = InferenceTrace(dict(inputs))
+                self.traces.append(record)
+
+        outputs = self._infer(inputs, record)
+        return (outputs, record) if trace else outputs
+
+    def _infer(self, inputs: Dict[str, float], record: Optional[InferenceTrace]) -> Dict[str, float]:
         # Validate inputs
         for var_name in inputs:
             if var_name not in self.input_variables:
                 raise ValueError(f"Input variable '{var_name}' not defined")
         
-        # Initialize output aggregation
-        output_aggregations = {}
-        for var_name, variable in self.output_variables.items():
-            output_aggregations[var_name] = {}
+        compiled = self.compiled_rules()
         
-        # Evaluate rules
-        for rule in self.rules:
-            # Calculate rule activation
-            activation = rule.evaluate(inputs, self.input_variables)
-            
-            # Apply activation to consequent
-            var_name, label, operator = rule.consequent
-            
-            if var_name not in self.output_variables:
-                raise ValueError(f"Output variable '{var_name}' not defined")
-            
+        # Each distinct condition in use once
+        degrees = []
+        for (var_name, label, operator), refs in zip(compiled.conditions, compiled.condition_refs):
+            if not refs:
+                degrees.append(None)
+                continue
+            if var_name not in inputs:
+                raise ValueError(f"Input value for '{var_name}' not provided")
+            if var_name not in self.input_variables:
+                raise ValueError(f"Linguistic variable '{var_name}' not found")
+            membership = self.input_variables[var_name].get_membership_degree(inputs[var_name], label)
             if operator == "is":
-                mem_fn = self.output_variables[var_name].membership_functions[label]
-                portion_points = mem_fn.generatePortionPoints(activation)
-                
-                # Store points for aggregation
-                if label not in output_aggregations[var_name]:
-                    output_aggregations[var_name][label] = portion_points
-                else:
-                    # Aggregate using max (already implemented in combinePolygons)
-                    current_polygon = Polygon(output_aggregations[var_name][label])
-                    new_polygon = Polygon(portion_points)
-                    combined = combinePolygons(current_polygon, new_polygon)
-                    output_aggregations[var_name][label] = combined.points
+                degrees.append(membership)
             elif operator == "is not":
-                # Handling negation is more complex and not implemented here
-                raise ValueError("Negation in consequent not supported")
+                degrees.append(1.0 - membership)
+            else:
+                raise ValueError(f"Unsupported operator: {operator}")
+        
+        # Each distinct antecedent once
+        t_norm, s_norm = self.operators.and_scalar, self.operators.or_scalar
+        antecedent_activations = [
+            CompiledRuleBase.combine(antecedent, degrees, t_norm, s_norm) if refs else None
+            for antecedent, refs in zip(compiled.antecedents, compiled.antecedent_refs)
+        ]
+        
+        # (label, activation) of every rule, per output variable
+        fired = {var_name: [] for var_name in self.output_variables}
+        for index, (antecedent, weight, consequents) in enumerate(compiled.rules):
+            activation = antecedent_activations[antecedent] * weight
+            if record is not None:
+                record.rules.append(RuleTrace(index, activation, consequents))
+            for var_name, label, operator in consequents:
+                if var_name not in self.output_variables:
+                    raise ValueError(f"Output variable '{var_name}' not defined")
+                if operator == "is":
+                    fired[var_name].append((label, activation))
+                elif operator == "is not":
+                    # Handling negation is more complex and not implemented here
+                    raise ValueError("Negation in consequent not supported")
+        
+        if record is not None:
+            self._trace_rules(record, compiled, degrees)
         
-        # Defuzzify using centroid method
         defuzzified = {}
-        for var_name, aggregation in output_aggregations.items():
-            if not aggregation:
+        for var_name, activations in fired.items():
+            output_trace = None if record is None else record.outputs[var_name]
+            if not activations:
                 # No rules fired for this variable
                 defuzzified[var_name] = 0.0
                 continue
+            defuzzified[var_name] = self._defuzzify(var_name, activations, output_trace)
+            if output_trace is not None:
+                output_trace.centroid = defuzzified[var_name]
+        
+        return defuzzified
+
+    def _trace_rules(self, record: InferenceTrace, compiled: CompiledRuleBase, degrees: List[float]):
+        """Condition degrees and implied sets of a traced pass"""
+        for condition, degree, refs in zip(compiled.conditions, degrees, compiled.condition_refs):
+            if refs:
+                record.memberships[condition] = degree
+        record.outputs = {var_name: OutputTrace(var_name) for var_name in self.output_variables}
+        for rule in record.rules:
+            for var_name, label, _ in rule.consequents:
+                points = self._implied_points(var_name, label, rule.activation)
+                record.outputs[var_name].implied.append(ImpliedSet(rule.index, label, rule.activation, points))
+
+    def _implied_points(self, var_name: str, label: str, activation: float) -> List[Point]:
+        """Outline of the consequent set after implication"""
+        variable = self.output_variables[var_name]
+        mem_fn = variable.membership_functions[label]
+        fraction = activation if self.operators.implication == "min" else 1.0
+        if isinstance(mem_fn, ParametricMemFn):
+            points = mem_fn.generatePortionPoints(fraction, *variable.range)
+        else:
+            points = mem_fn.generatePortionPoints(fraction)
+        if self.operators.implication == "min":
+            return list(points)
+        return [Point(point.x, point.y * activation) for point in points]
+
+    def compiled_rules(self) -> CompiledRuleBase:
+        """Current rules with shared conditions and antecedents factored out"""
+        compiled = self._compiled
+        # Rebuilt when `rules` was edited directly or unused antecedents pile up
+        if (compiled is None or compiled.source != self.rules
+                or compiled.unused_antecedents > max(16, len(compiled.antecedents) // 2)):
+            self._compiled = CompiledRuleBase(self.rules)
+        return self._compiled
+
+    def _max_min_centroid(self, var_name: str, activations: List[Tuple[str, float]],
+                          trace: Optional[OutputTrace] = None) -> float:
+        """Clipping and max aggregation: polygons for triangles and trapezoids, else sampled"""
+        if not self._is_polygonal(var_name):
+            return self._sampled_centroid(var_name, activations, trace)
+
+        aggregation = {}
+        for label, activation in activations:
+            mem_fn = self.output_variables[var_name].membership_functions[label]
+            portion_points = mem_fn.generatePortionPoints(activation)
             
-            # Combine all labels for the variable
-            combined_polygon = None
-            for label, points in aggregation.items():
-                polygon = Polygon(points)
-                if combined_polygon is None:
-                    combined_polygon = polygon
-                else:
-                    combined_polygon = combinePolygons(combined_polygon, polygon)
-            
-            # Calculate centroid
-            centroid = get_centroid(combined_polygon)
-            defuzzified[var_name] = centroid.x
+            # Store points for aggregation
+            if label not in aggregation:
+                aggregation[label] = portion_points
+            else:
+                # Aggregate using max (already implemented in combinePolygons)
+                current_polygon = Polygon(aggregation[label])
+                new_polygon = Polygon(portion_points)
+                combined = combinePolygons(current_polygon, new_polygon)
+                aggregation[label] = combined.points
+        
+        # Combine all labels for the variable
+        combined_polygon = None
+        for label, points in aggregation.items():
+            polygon = Polygon(points)
+            if combined_polygon is None:
+                combined_polygon = polygon
+            else:
+                combined_polygon = combinePolygons(combined_polygon, polygon)
         
-        return defuzzified
\ No newline at end of file
+        if trace is not None:
+            trace.envelope = list(combined_polygon.points)
+        
+        # Calculate centroid
+        return get_centroid(combined_polygon).x
+
+    def ignores_inactive_rules(self, var_name: str) -> bool:
+        """
+        Whether rules with zero activation leave the output unchanged. The polygon merge
+        of the default operators also merges their empty sets, which can move the centroid.
+        """
+        return self._defuzzify != self._max_min_centroid or not self._is_polygonal(var_name)
+
+    def _is_polygonal(self, var_name: str) -> bool:
+        """Whether every set of the output variable can go through the polygon path"""
+        return all(isinstance(mem_fn, (TriMemFn, TrapMemFn))
+                   for mem_fn in self.output_variables[var_name].membership_functions.values())
+
+    def _sampled_output(self, var_name: str, labels) -> Tuple[List[float], Dict[str, List[float]]]:
+        """Output grid and the degrees of `labels` on it, resampling only sets that changed"""
+        variable = self.output_variables[var_name]
+        value_range = tuple(variable.range)
+        cached = self._sampled_outputs.get(var_name)
+        if cached is None or cached[0] != value_range:
+            low, high = value_range
+            step = (high - low) / (SAMPLED_RESOLUTION - 1)
+            cached = (value_range, [low + i * step for i in range(SAMPLED_RESOLUTION)], {})
+            self._sampled_outputs[var_name] = cached
+        _, grid, sets = cached
+
+        degrees = {}
+        for label in labels:
+            mem_fn = variable.membership_functions[label]
+            entry = sets.get(label)
+            if entry is None or entry[0] is not mem_fn:
+                entry = sets[label] = (mem_fn, [mem_fn.calculateMembershipDegree(x) for x in grid])
+            degrees[label] = entry[1]
+        return grid, degrees
+
+    def _sampled_centroid(self, var_name: str, activations: List[Tuple[str, float]],
+                          trace: Optional[OutputTrace] = None) -> float:
+        """Centroid of the max of the implied sets, evaluated on the output grid"""
+        implication = self.operators.implication_scalar
+
+        # Clipping and scaling grow with the activation, so the strongest rule per label decides
+        strongest = {}
+        for label, activation in activations:
+            strongest[label] = max(strongest.get(label, 0.0), activation)
+        grid, degrees = self._sampled_output(var_name, strongest)
+
+        envelope = [0.0] * len(grid)
+        for label, activation in strongest.items():
+            for i, degree in enumerate(degrees[label]):
+                implied = implication(activation, degree)
+                if implied > envelope[i]:
+                    envelope[i] = implied
+
+        if trace is not None:
+            trace.envelope = [Point(x, e) for x, e in zip(grid, envelope)]
+        area = sum(envelope)
+        if area == 0:
+            return 0.0
+        return sum(x * e for x, e in zip(grid, envelope)) / area
+
+    def _output_set_moments(self, var_name: str, label: str) -> Tuple[float, float]:
+        """Area and first moment of an unscaled output set over the variable range"""
+        mem_fn = self.output_variables[var_name].membership_functions[label]
+        sets = self._output_moments.setdefault(var_name, {})
+        entry = sets.get(label)
+        if entry is None or entry[0] is not mem_fn:
+            entry = sets[label] = (mem_fn, mem_fn.clippedMoments(1.0, *self.output_variables[var_name].range))
+        return entry[1]
+
+    def _summed_envelope(self, var_name: str, activations: List[Tuple[str, float]]) -> List[Point]:
+        """Sum of the implied sets on the output grid, only built for traces"""
+        grid, degrees = self._sampled_output(var_name, {label for label, _ in activations})
+        implication = self.operators.implication_scalar
+        envelope = [0.0] * len(grid)
+        for label, activation in activations:
+            for i, degree in enumerate(degrees[label]):
+                envelope[i] += implication(activation, degree)
+        return [Point(x, e) for x, e in zip(grid, envelope)]
+
+    def _scaled_sum_centroid(self, var_name: str, activations: List[Tuple[str, float]],
+                             trace: Optional[OutputTrace] = None) -> float:
+        """Product implication with sum aggregation: a weighted mean of precomputed set centroids"""
+        if trace is not None:
+            trace.envelope = self._summed_envelope(var_name, activations)
+        area = 0.0
+        moment = 0.0
+        for label, activation in activations:
+            set_area, set_moment = self._output_set_moments(var_name, label)
+            area += activation * set_area
+            moment += activation * set_moment
+        return moment / area if area > 0 else 0.0
+
+    def _clipped_sum_centroid(self, var_name: str, activations: List[Tuple[str, float]],
+                              trace: Optional[OutputTrace] = None) -> float:
+        """Clipping with sum aggregation: closed-form moments of each clipped set"""
+        if trace is not None:
+            trace.envelope = self._summed_envelope(var_name, activations)
+        variable = self.output_variables[var_name]
+        area = 0.0
+        moment = 0.0
+        for label, activation in activations:
+            set_area, set_moment = variable.membership_functions[label].clippedMoments(activation, *variable.range)
+            area += set_area
+            moment += set_moment
+        return moment / area if area > 0 else 0.0
@@ -0,0 +1,63 @@
+"""
+src/gaussianMemFn.py
+
+Gaussian Membership Function
+"""
+from __future__ import annotations
+import math
+from typing import Optional, Tuple
+from src.parametricMemFn import ParametricMemFn, SUPPORT_EPSILON
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+class GaussianMemFn(ParametricMemFn):
+    def __init__(self, label: str, mean: float, sigma: float):
+        assert sigma > 0
+
+        self.mean = mean
+        self.sigma = sigma
+        half_width = sigma * math.sqrt(2 * math.log(1 / SUPPORT_EPSILON))
+        super().__init__(label, [mean, sigma], (mean - half_width, mean + half_width))
+
+    def _scalar(self, x: float) -> float:
+        z = (x - self.mean) / self.sigma
+        return math.exp(-0.5 * z * z)
+
+    def _evaluate(self, x: np.ndarray) -> np.ndarray:
+        z = (x - self.mean) / self.sigma
+        return np.exp(-0.5 * z * z)
+
+    def _derivative(self, x: np.ndarray) -> np.ndarray:
+        z = (x - self.mean) / self.sigma
+        return -z / self.sigma * np.exp(-0.5 * z * z)
+
+    def _integrals(self, a: float, b: float) -> Tuple[float, float]:
+        """Area and first moment of the unclipped curve over [a, b]"""
+        scale = self.sigma * math.sqrt(2)
+        area = self.sigma * math.sqrt(math.pi / 2) * (math.erf((b - self.mean) / scale) - math.erf((a - self.mean) / scale))
+        moment = self.mean * area + self.sigma ** 2 * (self._scalar(a) - self._scalar(b))
+        return area, moment
+
+    def clippedMoments(self, height: float, lower: Optional[float] = None,
+                       upper: Optional[float] = None) -> Tuple[float, float]:
+        """Closed form with erf: flat top where the curve exceeds `height`, Gaussian tails elsewhere"""
+        lower, upper = self._window(lower, upper)
+        if lower >= upper or height <= 0:
+            return 0.0, 0.0
+
+        # Curve is above the clipping height on (mean - w, mean + w)
+        w = self.sigma * math.sqrt(2 * math.log(1 / height)) if height < 1 else 0.0
+        cuts = sorted({lower, upper, min(max(self.mean - w, lower), upper), min(max(self.mean + w, lower), upper)})
+
+        area = 0.0
+        moment = 0.0
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            if self.mean - w <= a and b <= self.mean + w and w > 0:
+                area += height * (b - a)
+                moment += height * (b * b - a * a) / 2
+            else:
+                piece_area, piece_moment = self._integrals(a, b)
+                area += piece_area
+                moment += piece_moment
+        return area, moment
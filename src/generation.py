@@ -0,0 +1,283 @@
+"""
+src/generation.py
+
+Data-driven systems: fuzzy c-means partitions and Wang-Mendel rule generation over streamed data
+"""
+from __future__ import annotations
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from src.fis import FuzzyInferenceSystem
+from src.linguisticVariable import LinguisticVariable
+from src.membershipFunction import MembershipFunctionFactory
+from src.rule import FuzzyRule
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Rows processed at a time, which bounds memory independently of the data size
+CHUNK_SIZE = 1 << 18
+
+# Label names by partition size, other sizes use level_0, level_1, ...
+DEFAULT_LABELS = {
+    2: ["low", "high"],
+    3: ["low", "medium", "high"],
+    5: ["very_low", "low", "medium", "high", "very_high"],
+    7: ["very_low", "low", "somewhat_low", "medium", "somewhat_high", "high", "very_high"],
+}
+
+
+def default_labels(count: int) -> List[str]:
+    return list(DEFAULT_LABELS.get(count, [f"level_{i}" for i in range(count)]))
+
+
+def _fcm_passes(chunks, centers: np.ndarray, fuzziness: float, iterations: int, tol: float,
+                span: float) -> np.ndarray:
+    """Center updates over the chunks yielded by chunks() until they move by at most tol"""
+    exponent = -2 / (fuzziness - 1)
+    for _ in range(iterations):
+        weighted_sum = np.zeros(centers.size)
+        weight_total = np.zeros(centers.size)
+        for x in chunks():
+            distance = np.abs(x[None, :] - centers[:, None]) + 1e-12 * span
+            # u_ij = d_ij^(-2/(m-1)) / sum_k d_kj^(-2/(m-1)), weighted by u_ij^m
+            inverse = 1 / (distance * distance) if fuzziness == 2 else distance ** exponent
+            weights = inverse / inverse.sum(axis=0)
+            weights = weights * weights if fuzziness == 2 else weights ** fuzziness
+            weighted_sum += weights @ x
+            weight_total += weights.sum(axis=1)
+        updated = weighted_sum / weight_total
+        moved = float(np.max(np.abs(updated - centers)))
+        centers = updated
+        if moved <= tol:
+            break
+    return centers
+
+
+def fuzzy_c_means(values, clusters: int, fuzziness: float = 2.0, iterations: int = 100,
+                  tol: float = 1e-4, chunk_size: int = CHUNK_SIZE) -> np.ndarray:
+    """
+    Sorted cluster centers of 1-D `values` (an array or memory map) by fuzzy c-means.
+    Each pass streams the values in chunks, computing the memberships of a chunk for
+    all clusters at once, so memory does not grow with the data. Iteration stops when
+    no center moves by more than `tol` times the data range.
+    """
+    if clusters < 2:
+        raise ValueError(f"At least 2 clusters are required, got {clusters}")
+    if fuzziness <= 1:
+        raise ValueError(f"Fuzziness must be greater than 1, got {fuzziness}")
+    size = len(values)
+    if size < clusters:
+        raise ValueError(f"{clusters} clusters need at least as many values, got {size}")
+
+    # Converge on an evenly strided sample of at most one chunk, starting from its
+    # quantiles, then refine over all values, which usually takes a few passes
+    sample = np.asarray(values[::max(1, size // chunk_size)], dtype=float)
+    centers = np.quantile(sample, (np.arange(clusters) + 0.5) / clusters)
+    span = max(float(sample.max() - sample.min()), 1e-12)
+    centers = _fcm_passes(lambda: [sample], centers, fuzziness, iterations, tol * span, span)
+    if sample.size < size:
+        chunks = lambda: (np.asarray(values[start:start + chunk_size], dtype=float)
+                          for start in range(0, size, chunk_size))
+        centers = _fcm_passes(chunks, centers, fuzziness, iterations, tol * span, span)
+    return np.sort(centers)
+
+
+def partition_from_centers(name: str, centers: Sequence[float], value_range: Sequence[float],
+                           labels: Optional[List[str]] = None) -> LinguisticVariable:
+    """
+    Linguistic variable with a triangle peaking at each center between its neighbours,
+    and shoulder trapezoids reaching the ends of `value_range` on both sides.
+    Breakpoints are snapped to the 0.01 grid that utils/line.py rounds to, which the
+    polygon arithmetic of FuzzyInferenceSystem.infer relies on; the range is widened
+    outwards to the grid and centers closer than 0.01 are pushed apart.
+    """
+    centers = [float(c) for c in sorted(centers)]
+    if len(centers) < 2:
+        raise ValueError(f"A partition needs at least 2 centers, got {len(centers)}")
+    labels = labels or default_labels(len(centers))
+    if len(labels) != len(centers):
+        raise ValueError(f"Got {len(labels)} labels for {len(centers)} centers")
+    low = round(math.floor(round(float(value_range[0]) * 100, 6)) / 100, 2)
+    high = round(math.ceil(round(float(value_range[1]) * 100, 6)) / 100, 2)
+    if round((high - low) * 100) < len(centers) - 1:
+        raise ValueError(f"Range [{low}, {high}] is too narrow for {len(centers)} centers on a 0.01 grid")
+    snapped = []
+    for i, center in enumerate(centers):
+        # Leave room on the grid for the centers still to come
+        ceiling = round(high - 0.01 * (len(centers) - 1 - i), 2)
+        floor = round(snapped[-1] + 0.01, 2) if snapped else low
+        snapped.append(min(max(round(center, 2), floor), ceiling))
+    centers = snapped
+
+    variable = LinguisticVariable(name, [low, high])
+    last = len(centers) - 1
+    for i, (label, center) in enumerate(zip(labels, centers)):
+        if i == 0:
+            mem_fn = MembershipFunctionFactory.create_trapezoidal(label, [low, low, center, centers[1]])
+        elif i == last:
+            mem_fn = MembershipFunctionFactory.create_trapezoidal(label, [centers[i - 1], center, high, high])
+        else:
+            mem_fn = MembershipFunctionFactory.create_triangular(label, [centers[i - 1], center, centers[i + 1]])
+        variable.add_membership_function(mem_fn)
+    return variable
+
+
+def fcm_partition(name: str, values, clusters: int = 5, labels: Optional[List[str]] = None,
+                  value_range: Optional[Sequence[float]] = None, **options) -> LinguisticVariable:
+    """
+    Linguistic variable partitioned at the fuzzy c-means centers of `values`, over
+    `value_range` (the data range by default). `options` go to fuzzy_c_means.
+    """
+    if value_range is None:
+        chunk_size = options.get("chunk_size", CHUNK_SIZE)
+        low, high = float("inf"), -float("inf")
+        for start in range(0, len(values), chunk_size):
+            chunk = np.asarray(values[start:start + chunk_size], dtype=float)
+            low, high = min(low, float(chunk.min())), max(high, float(chunk.max()))
+        value_range = (low, high)
+    centers = fuzzy_c_means(values, clusters, **options)
+    return partition_from_centers(name, centers, value_range, labels)
+
+
+@dataclass
+class GeneratedRule:
+    consequents: Tuple[int, ...]  # label index per output variable
+    degree: float  # product of the memberships of the strongest row with this antecedent
+    support: int  # rows whose strongest labels form this antecedent
+
+
+class WangMendelGenerator:
+    def __init__(self, input_variables: List[LinguisticVariable], output_variables: List[LinguisticVariable]):
+        """
+        Wang-Mendel rule generation. Every row votes for the rule made of the label with
+        the highest degree in each variable, with the product of those degrees as its
+        strength. Rules are kept in a hash table keyed on the tuple of antecedent label
+        indices; when rows disagree on the consequent the strongest row wins. Memory
+        grows with the number of distinct antecedents, never with the number of rows.
+        """
+        if not input_variables or not output_variables:
+            raise ValueError("At least one input and one output variable are required")
+        self.input_variables = input_variables
+        self.output_variables = output_variables
+        self._labels = [list(variable.membership_functions) for variable in input_variables + output_variables]
+        for variable, labels in zip(input_variables + output_variables, self._labels):
+            if not labels:
+                raise ValueError(f"Linguistic variable '{variable.name}' has no membership functions")
+        # Antecedent label indices packed into one integer per row, first input most significant
+        self._radices = [len(labels) for labels in self._labels[:len(input_variables)]]
+        if float(np.prod(np.array(self._radices, dtype=float))) >= 2.0 ** 62:
+            raise ValueError("Too many antecedent label combinations to index")
+        self.rules: Dict[Tuple[int, ...], GeneratedRule] = {}
+        self.rows = 0
+
+    def _strongest(self, variable: LinguisticVariable, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Index and degree of the label with the highest degree at each value"""
+        degrees = np.stack([mem_fn.degrees(values) for mem_fn in variable.membership_functions.values()])
+        index = np.argmax(degrees, axis=0)
+        return index, degrees[index, np.arange(values.size)]
+
+    def update(self, inputs: Dict[str, np.ndarray], outputs: Dict[str, np.ndarray]):
+        """Fold one chunk of rows, equally sized arrays keyed by variable name, into the rule table"""
+        columns = []
+        for variable in self.input_variables + self.output_variables:
+            source = inputs if len(columns) < len(self.input_variables) else outputs
+            if variable.name not in source:
+                raise ValueError(f"Values for '{variable.name}' not provided")
+            columns.append(np.asarray(source[variable.name], dtype=float).ravel())
+        if len({column.size for column in columns}) > 1:
+            raise ValueError("Input and output arrays must have the same length")
+        size = columns[0].size
+        self.rows += size
+
+        strength = np.ones(size)
+        indices = []
+        for variable, values in zip(self.input_variables + self.output_variables, columns):
+            index, degree = self._strongest(variable, values)
+            indices.append(index)
+            strength *= degree
+
+        code = np.zeros(size, dtype=np.int64)
+        for index, radix in zip(indices, self._radices):
+            code = code * radix + index
+
+        # Strongest row per antecedent within the chunk: sort by code, strongest first
+        fired = np.flatnonzero(strength > 0)
+        order = fired[np.lexsort((-strength[fired], code[fired]))]
+        codes, first, support = np.unique(code[order], return_index=True, return_counts=True)
+        best = order[first]
+
+        consequents = np.stack(indices[len(self.input_variables):], axis=1)[best]
+        antecedents = np.stack(indices[:len(self.input_variables)], axis=1)[best]
+        # One dictionary operation per distinct antecedent in the chunk
+        for key, consequent, degree, count in zip(map(tuple, antecedents.tolist()), map(tuple, consequents.tolist()),
+                                                  strength[best].tolist(), support.tolist()):
+            current = self.rules.get(key)
+            if current is None:
+                self.rules[key] = GeneratedRule(consequent, degree, count)
+            else:
+                current.support += count
+                if degree > current.degree:
+                    current.consequents, current.degree = consequent, degree
+
+    def fit(self, inputs: Dict[str, np.ndarray], outputs: Dict[str, np.ndarray],
+            chunk_size: int = CHUNK_SIZE) -> "WangMendelGenerator":
+        """One streaming pass over equally sized arrays or memory maps, `chunk_size` rows at a time"""
+        sizes = {len(values) for values in {**inputs, **outputs}.values()}
+        if len(sizes) > 1:
+            raise ValueError("Input and output arrays must have the same length")
+        size = sizes.pop() if sizes else 0
+        for start in range(0, size, chunk_size):
+            stop = min(start + chunk_size, size)
+            self.update({name: values[start:stop] for name, values in inputs.items()},
+                        {name: values[start:stop] for name, values in outputs.items()})
+        return self
+
+    def build(self, min_support: int = 1, weighted: bool = False, **operators) -> FuzzyInferenceSystem:
+        """
+        FuzzyInferenceSystem with the partitions and one rule per antecedent seen in at
+        least `min_support` rows, weighted by its strength when `weighted` is set.
+        `operators` (t_norm, implication, ...) go to FuzzyInferenceSystem.
+        """
+        fis = FuzzyInferenceSystem(**operators)
+        for variable in self.input_variables:
+            fis.add_input_variable(variable)
+        for variable in self.output_variables:
+            fis.add_output_variable(variable)
+
+        input_labels = self._labels[:len(self.input_variables)]
+        output_labels = self._labels[len(self.input_variables):]
+        last = len(self.input_variables) - 1
+        for key in sorted(self.rules):
+            rule = self.rules[key]
+            if rule.support < min_support:
+                continue
+            antecedents = [
+                (variable.name, labels[index], "is", None if position == last else "AND")
+                for position, (variable, labels, index) in enumerate(zip(self.input_variables, input_labels, key))
+            ]
+            consequents = [
+                (variable.name, labels[index], "is")
+                for variable, labels, index in zip(self.output_variables, output_labels, rule.consequents)
+            ]
+            fis.add_rule(FuzzyRule(antecedents, consequents, rule.degree if weighted else 1.0))
+        return fis
+
+
+def generate_fis(inputs: Dict[str, np.ndarray], outputs: Dict[str, np.ndarray],
+                 clusters: Union[int, Dict[str, int]] = 5, chunk_size: int = CHUNK_SIZE,
+                 min_support: int = 1, weighted: bool = False, **operators) -> FuzzyInferenceSystem:
+    """
+    Fuzzy c-means partition of every input and output column followed by one
+    Wang-Mendel pass over the rows, all streamed `chunk_size` rows at a time
+    """
+    def partition(name, values):
+        count = clusters.get(name, 5) if isinstance(clusters, dict) else clusters
+        return fcm_partition(name, values, count, chunk_size=chunk_size)
+
+    generator = WangMendelGenerator(
+        [partition(name, values) for name, values in inputs.items()],
+        [partition(name, values) for name, values in outputs.items()],
+    )
+    generator.fit(inputs, outputs, chunk_size)
+    return generator.build(min_support, weighted, **operators)
@@ -0,0 +1,430 @@
+"""
+src/jit.py
+
+Whole-system inference kernel over flat breakpoint and rule tables, compiled with Numba when installed
+"""
+from __future__ import annotations
+import importlib.util
+import math
+from typing import Dict, List, Optional
+from src.batch import BatchInferenceEngine
+from src.gaussianMemFn import GaussianMemFn
+from src.bellMemFn import BellMemFn
+from src.piecewiseLinearMemFn import PiecewiseLinearMemFn
+from src.sigmoidMemFn import SigmoidMemFn
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Membership function kinds in the clause table
+PIECEWISE, GAUSSIAN, BELL, SIGMOID = 0, 1, 2, 3
+
+# Operator codes, position in each list is the code passed to the kernel
+T_NORM_CODES = ["min", "product", "lukasiewicz"]
+S_NORM_CODES = ["max", "probabilistic_sum", "lukasiewicz"]
+IMPLICATION_CODES = ["min", "product"]
+AGGREGATION_CODES = ["max", "sum"]
+
+# Positions of the float64 tables in the kernel's table arguments, the others are int64
+FLOAT_TABLES = frozenset({5, 6, 7, 8, 9, 10, 18, 23, 24, 25, 26})
+
+
+def numba_available() -> bool:
+    return importlib.util.find_spec("numba") is not None
+
+
+def _infer_kernel(inputs, n_samples, n_inputs, outputs, n_outputs, operators,
+                  clause_input, clause_kind, clause_start, clause_count, clause_params,
+                  breakpoints, segment_x0, segment_y0, segment_rise, segment_run,
+                  condition_clause, condition_negate,
+                  antecedent_start, antecedent_count, antecedent_condition, antecedent_connector,
+                  rule_antecedent, rule_weight, rule_start, rule_count, consequent_set,
+                  set_output, set_degrees, set_area, set_moment, grids, resolution,
+                  memberships, degrees, activations, label_activations, envelope):
+    """
+    Infer `n_samples` rows of `inputs` (flat, row-major) into `outputs`. Written with
+    scalar loops and 1-D indexing only, so the same function runs under Numba and as
+    plain Python over lists. The last six arguments are scratch buffers.
+    """
+    t_norm, s_norm, implication, aggregation = operators[0], operators[1], operators[2], operators[3]
+    closed_form = implication == 1 and aggregation == 1
+    n_clauses = len(clause_kind)
+    n_conditions = len(condition_clause)
+    n_antecedents = len(antecedent_count)
+    n_rules = len(rule_antecedent)
+    n_sets = len(set_output)
+
+    for sample in range(n_samples):
+        row = sample * n_inputs
+
+        # Distinct (variable, label) lookups
+        for c in range(n_clauses):
+            kind = clause_kind[c]
+            if kind < 0:
+                continue
+            x = inputs[row + clause_input[c]]
+            degree = 0.0
+            if kind == 0:
+                first = clause_start[c]
+                last = first + clause_count[c] - 1
+                if breakpoints[first] <= x <= breakpoints[last]:
+                    # Later segment at shared breakpoints, as searchsorted(side="right") - 1
+                    i = first
+                    while i < last - 1 and breakpoints[i + 1] <= x:
+                        i += 1
+                    degree = round(((x - segment_x0[i]) * segment_rise[i] / segment_run[i]) + segment_y0[i], 2)
+            else:
+                p = c * 5
+                if clause_params[p + 3] <= x <= clause_params[p + 4]:
+                    if kind == 1:
+                        z = (x - clause_params[p]) / clause_params[p + 1]
+                        degree = math.exp(-0.5 * z * z)
+                    elif kind == 2:
+                        degree = 1 / (1 + abs((x - clause_params[p]) / clause_params[p + 1]) ** (2 * clause_params[p + 2]))
+                    else:
+                        z = min(-clause_params[p + 1] * (x - clause_params[p]), 700.0)
+                        degree = 1 / (1 + math.exp(z))
+            memberships[c] = degree
+
+        for c in range(n_conditions):
+            clause = condition_clause[c]
+            if clause >= 0:
+                degrees[c] = 1.0 - memberships[clause] if condition_negate[c] else memberships[clause]
+
+        # Antecedents folded left to right with their connectors
+        for a in range(n_antecedents):
+            count = antecedent_count[a]
+            if count < 0:
+                continue
+            if count == 0:
+                activations[a] = 1.0
+                continue
+            start = antecedent_start[a]
+            current = degrees[antecedent_condition[start]]
+            for k in range(start + 1, start + count):
+                degree = degrees[antecedent_condition[k]]
+                if antecedent_connector[k - 1] == 0:
+                    if t_norm == 0:
+                        current = min(current, degree)
+                    elif t_norm == 1:
+                        current = current * degree
+                    else:
+                        current = max(0.0, current + degree - 1.0)
+                else:
+                    if s_norm == 0:
+                        current = max(current, degree)
+                    elif s_norm == 1:
+                        current = current + degree - current * degree
+                    else:
+                        current = min(1.0, current + degree)
+            activations[a] = current
+
+        for o in range(n_outputs):
+            for g in range(o * resolution, (o + 1) * resolution):
+                envelope[g] = 0.0
+        for s in range(n_sets):
+            label_activations[s] = 0.0
+
+        for r in range(n_rules):
+            activation = activations[rule_antecedent[r]] * rule_weight[r]
+            for k in range(rule_start[r], rule_start[r] + rule_count[r]):
+                s = consequent_set[k]
+                if aggregation == 0:
+                    # Max over rules of the implied sets equals implying the largest activation
+                    if activation > label_activations[s]:
+                        label_activations[s] = activation
+                elif closed_form:
+                    label_activations[s] += activation
+                elif activation > 0:
+                    base = set_output[s] * resolution
+                    for g in range(resolution):
+                        degree = set_degrees[s * resolution + g]
+                        envelope[base + g] += min(activation, degree) if implication == 0 else activation * degree
+
+        for o in range(n_outputs):
+            out = sample * n_outputs + o
+            if closed_form:
+                total_area = 0.0
+                total_moment = 0.0
+                for s in range(n_sets):
+                    if set_output[s] == o:
+                        total_area += label_activations[s] * set_area[s]
+                        total_moment += label_activations[s] * set_moment[s]
+                outputs[out] = total_moment / total_area if total_area > 0 else 0.0
+                continue
+
+            base = o * resolution
+            if aggregation == 0:
+                for s in range(n_sets):
+                    activation = label_activations[s]
+                    if set_output[s] != o or activation <= 0:
+                        continue
+                    for g in range(resolution):
+                        degree = set_degrees[s * resolution + g]
+                        implied = min(activation, degree) if implication == 0 else activation * degree
+                        if implied > envelope[base + g]:
+                            envelope[base + g] = implied
+            total_area = 0.0
+            total_moment = 0.0
+            for g in range(resolution):
+                total_area += envelope[base + g]
+                total_moment += envelope[base + g] * grids[base + g]
+            outputs[out] = total_moment / total_area if total_area > 0 else 0.0
+
+
+# Compiled kernel, shared by every engine in the process
+_compiled_kernel = None
+
+
+def _numba_kernel():
+    global _compiled_kernel
+    if _compiled_kernel is None:
+        import numba
+        # cache=True stores the machine code under __pycache__ so later processes skip compilation
+        _compiled_kernel = numba.njit(cache=True, nogil=True)(_infer_kernel)
+    return _compiled_kernel
+
+
+def _table_arrays(tables: list) -> list:
+    """Tables as arrays with a fixed dtype per argument, so the disk cache holds a single specialization"""
+    return [
+        np.asarray(values, dtype=np.float64 if i in FLOAT_TABLES else np.int64) if len(values)
+        else np.zeros(0, dtype=np.float64 if i in FLOAT_TABLES else np.int64)
+        for i, values in enumerate(tables)
+    ]
+
+
+def _scratch_buffers(sizes: List[int], backend: str) -> list:
+    if backend == "numba":
+        return [np.zeros(max(size, 1)) for size in sizes]
+    return [[0.0] * size for size in sizes]
+
+
+class TableKernelRunner:
+    """
+    Single-sample and batched calls of the inference kernel over flat tables. Subclasses
+    set input_names, output_names, resolution, backend, _required, _tables, _scratch
+    and _kernel.
+    """
+
+    def _run(self, flat_inputs, size: int):
+        n_outputs = len(self.output_names)
+        outputs = np.zeros(size * n_outputs) if self.backend == "numba" else [0.0] * (size * n_outputs)
+        self._kernel(flat_inputs, size, len(self.input_names), outputs, n_outputs,
+                     *self._tables, self.resolution, *self._scratch)
+        return outputs
+
+    def _check_inputs(self, names):
+        for var_name in names:
+            if var_name not in self.input_names:
+                raise ValueError(f"Input variable '{var_name}' not defined")
+        for var_name in self._required:
+            if var_name not in names:
+                raise ValueError(f"Input value for '{var_name}' not provided")
+
+    def _infer_row(self, inputs: Dict[str, float]) -> Dict[str, float]:
+        self._check_inputs(inputs)
+        row = [float(inputs.get(name, 0.0)) for name in self.input_names]
+        if self.backend == "numba":
+            row = np.asarray(row, dtype=np.float64)
+        outputs = self._run(row, 1)
+        return {name: float(outputs[o]) for o, name in enumerate(self.output_names)}
+
+    def _infer_arrays(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        self._check_inputs(inputs)
+        arrays = {name: np.asarray(values, dtype=float).ravel() for name, values in inputs.items()}
+        sizes = {array.size for array in arrays.values()}
+        if len(sizes) > 1:
+            raise ValueError("Input arrays must have the same length")
+        size = sizes.pop() if sizes else 0
+
+        matrix = np.zeros((size, len(self.input_names)))
+        for i, name in enumerate(self.input_names):
+            if name in arrays:
+                matrix[:, i] = arrays[name]
+        flat = matrix.ravel() if self.backend == "numba" else matrix.ravel().tolist()
+        outputs = np.asarray(self._run(flat, size), dtype=float).reshape(size, len(self.output_names))
+        return {name: outputs[:, o].copy() for o, name in enumerate(self.output_names)}
+
+
+class JitInferenceEngine(TableKernelRunner):
+    def __init__(self, fis, resolution: int = 201, backend: str = "auto"):
+        """
+        Flatten `fis` into breakpoint, condition, antecedent and rule tables evaluated by
+        one kernel per call. backend "numba" compiles the kernel (cached on disk),
+        "python" runs the same kernel interpreted, "auto" picks Numba when installed.
+        Results follow BatchInferenceEngine with the same `resolution`.
+        """
+        if backend == "auto":
+            backend = "numba" if numba_available() else "python"
+        if backend not in ("numba", "python"):
+            raise ValueError(f"Unknown backend '{backend}', expected one of: auto, numba, python")
+        if backend == "numba" and not numba_available():
+            raise ImportError("The numba backend requires Numba to be installed")
+
+        self.fis = fis
+        self.backend = backend
+        self.resolution = resolution
+        # Reference engine, also the source of validated conditions and sampled output sets
+        self.reference = BatchInferenceEngine(fis, resolution)
+        self.version = None
+        self._build()
+
+    def _build(self):
+        reference = self.reference
+        reference.sync()
+        fis = self.fis
+        compiled = reference._compiled
+        operators = fis.operators
+        self.version = fis.version
+
+        self.input_names: List[str] = list(fis.input_variables)
+        self.output_names: List[str] = list(fis.output_variables)
+        input_index = {name: i for i, name in enumerate(self.input_names)}
+
+        # Clauses: membership function kind, parameters and breakpoint segments
+        clause_input, clause_kind, clause_start, clause_count = [], [], [], []
+        clause_params: List[float] = []
+        breakpoints, segment_x0, segment_y0, segment_rise, segment_run = [], [], [], [], []
+        self._required = set()
+        for (var_name, label), mem_fn, live in zip(reference._clauses, reference._clause_functions,
+                                                   reference._live_clauses):
+            params = [0.0] * 5
+            kind = -1
+            start, count = len(breakpoints), 0
+            if live:
+                self._required.add(var_name)
+                if isinstance(mem_fn, PiecewiseLinearMemFn):
+                    kind = PIECEWISE
+                    if mem_fn._segments is None:
+                        mem_fn._compileSegments()
+                    points, x0, y0, rise, run = (array.tolist() for array in mem_fn._segments)
+                    count = len(points)
+                    breakpoints.extend(points)
+                    # One segment fewer than breakpoints, the slot is padding
+                    segment_x0.extend(x0 + [0.0]); segment_y0.extend(y0 + [0.0])
+                    segment_rise.extend(rise + [0.0]); segment_run.extend(run + [1.0])
+                elif isinstance(mem_fn, GaussianMemFn):
+                    kind, params[:2] = GAUSSIAN, [mem_fn.mean, mem_fn.sigma]
+                elif isinstance(mem_fn, BellMemFn):
+                    kind, params[:3] = BELL, [mem_fn.center, mem_fn.width, mem_fn.slope]
+                elif isinstance(mem_fn, SigmoidMemFn):
+                    kind, params[:2] = SIGMOID, [mem_fn.center, mem_fn.slope]
+                else:
+                    raise ValueError(f"Membership function '{label}' of '{var_name}' is not supported by JitInferenceEngine")
+                params[3], params[4] = mem_fn.support
+            clause_input.append(input_index.get(var_name, 0))
+            clause_kind.append(kind)
+            clause_start.append(start)
+            clause_count.append(count)
+            clause_params.extend(params)
+
+        condition_clause, condition_negate = [], []
+        for (clause, negate), refs in zip(reference._conditions, compiled.condition_refs):
+            condition_clause.append(clause if refs else -1)
+            condition_negate.append(1 if negate else 0)
+
+        antecedent_start, antecedent_count, antecedent_condition, antecedent_connector = [], [], [], []
+        for antecedent, refs in zip(compiled.antecedents, compiled.antecedent_refs):
+            antecedent_start.append(len(antecedent_condition))
+            antecedent_count.append(len(antecedent) if refs else -1)
+            for condition, connector in antecedent:
+                if connector not in (None, "AND", "OR"):
+                    raise ValueError(f"Unsupported connector: {connector}")
+                antecedent_condition.append(condition)
+                antecedent_connector.append(1 if connector == "OR" else 0)
+
+        # Output sets sampled on the reference engine's grids
+        set_index: Dict[tuple, int] = {}
+        set_output, set_degrees, set_area, set_moment, grids = [], [], [], [], []
+        closed_form = reference._closed_form
+        for o, var_name in enumerate(self.output_names):
+            variable = fis.output_variables[var_name]
+            grids.extend(reference._grids[var_name].tolist() if not closed_form else [0.0] * self.resolution)
+            for label in variable.membership_functions:
+                set_index[(var_name, label)] = len(set_output)
+                set_output.append(o)
+                if closed_form:
+                    area, moment = reference._set_moments[var_name][label]
+                    set_area.append(area); set_moment.append(moment)
+                    set_degrees.extend([0.0] * self.resolution)
+                else:
+                    set_area.append(0.0); set_moment.append(0.0)
+                    set_degrees.extend(reference._output_sets[var_name][label].tolist())
+
+        rule_antecedent, rule_weight, rule_start, rule_count, consequent_set = [], [], [], [], []
+        for antecedent, weight, consequents in compiled.rules:
+            rule_antecedent.append(antecedent)
+            rule_weight.append(float(weight))
+            rule_start.append(len(consequent_set))
+            rule_count.append(len(consequents))
+            consequent_set.extend(set_index[(var_name, label)] for var_name, label, _ in consequents)
+
+        codes = [
+            T_NORM_CODES.index(operators.t_norm), S_NORM_CODES.index(operators.s_norm),
+            IMPLICATION_CODES.index(operators.implication), AGGREGATION_CODES.index(operators.aggregation),
+        ]
+
+        ints = [codes, clause_input, clause_kind, clause_start, clause_count]
+        floats = [clause_params, breakpoints, segment_x0, segment_y0, segment_rise, segment_run]
+        conditions = [condition_clause, condition_negate,
+                      antecedent_start, antecedent_count, antecedent_condition, antecedent_connector]
+        rules = [rule_antecedent, rule_weight, rule_start, rule_count, consequent_set,
+                 set_output, set_degrees, set_area, set_moment, grids]
+        self._scratch_sizes = [len(clause_kind), len(condition_clause), len(antecedent_count),
+                               len(set_output), len(self.output_names) * self.resolution]
+
+        if self.backend == "numba":
+            self._tables = _table_arrays(ints + floats + conditions + rules)
+            self._kernel = _numba_kernel()
+        else:
+            self._tables = ints + floats + conditions + rules
+            self._kernel = _infer_kernel
+        self._scratch = _scratch_buffers(self._scratch_sizes, self.backend)
+
+    def sync(self):
+        """Rebuild the tables after changes made through the FuzzyInferenceSystem change methods"""
+        if self.fis.version != self.version or self.fis.compiled_rules() is not self.reference._compiled:
+            self._build()
+
+    def infer(self, inputs: Dict[str, float]) -> Dict[str, float]:
+        """Defuzzified outputs for a single sample, the low-latency path"""
+        self.sync()
+        return self._infer_row(inputs)
+
+    def infer_batch(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Defuzzified outputs for equally sized input arrays, one kernel call for all samples"""
+        self.sync()
+        return self._infer_arrays(inputs)
+
+    def table_arrays(self) -> list:
+        """The kernel's tables as int64 / float64 arrays, in argument order"""
+        self.sync()
+        return self._tables if self.backend == "numba" else _table_arrays(self._tables)
+
+    def verify(self, samples: int = 1000, seed: Optional[int] = 0, reference: str = "infer") -> float:
+        """
+        Largest absolute difference from fis.infer over `samples` random inputs drawn
+        uniformly from the input ranges. The kernel follows BatchInferenceEngine, so for
+        the default min/max/min operators this includes that engine's deviation from
+        infer. `reference="batch"` compares with the BatchInferenceEngine instead, which
+        isolates the kernel itself.
+        """
+        if reference not in ("infer", "batch"):
+            raise ValueError(f"Unknown reference '{reference}', expected 'infer' or 'batch'")
+        self.sync()
+        rng = np.random.default_rng(seed)
+        inputs = {
+            name: rng.uniform(variable.range[0], variable.range[1], samples)
+            for name, variable in self.fis.input_variables.items()
+        }
+        actual = self.infer_batch(inputs)
+        if reference == "batch":
+            expected = self.reference.infer(inputs)
+        else:
+            expected = {name: np.empty(samples) for name in actual}
+            for i in range(samples):
+                outputs = self.fis.infer({name: float(values[i]) for name, values in inputs.items()})
+                for name in expected:
+                    expected[name][i] = outputs[name]
+        return max((float(np.max(np.abs(actual[name] - expected[name]))) for name in expected if samples), default=0.0)
@@ -6,6 +6,10 @@ Factory for creating membership functions
 from typing import List
 from src.trapMemFn import TrapMemFn
 from src.triMemFn import TriMemFn
+from src.piecewiseLinearMemFn import PiecewiseLinearMemFn
+from src.gaussianMemFn import GaussianMemFn
+from src.bellMemFn import BellMemFn
+from src.sigmoidMemFn import SigmoidMemFn
 
 class MembershipFunctionFactory:
     @staticmethod
@@ -20,4 +24,36 @@ class MembershipFunctionFactory:
         """Create a trapezoidal membership function"""
         if len(points) != 4:
             raise ValueError("Trapezoidal membership function requires 4 points")
-        return TrapMemFn(label, points)
\ No newline at end of file
+        return TrapMemFn(label, points)
+
+    @staticmethod
+    def create_piecewise_linear(label: str, points: List[float], degrees: List[float]) -> PiecewiseLinearMemFn:
+        """Create a piecewise-linear membership function through (points[i], degrees[i])"""
+        if len(points) != len(degrees) or len(points) < 2:
+            raise ValueError("Piecewise-linear membership function requires matching points and degrees, at least 2")
+        if any(points[i] > points[i+1] for i in range(len(points)-1)):
+            raise ValueError("Piecewise-linear membership function points must be in ascending order")
+        if any(not 0 <= degree <= 1 for degree in degrees):
+            raise ValueError("Membership degrees must be within [0, 1]")
+        return PiecewiseLinearMemFn(label, points, degrees)
+
+    @staticmethod
+    def create_gaussian(label: str, mean: float, sigma: float) -> GaussianMemFn:
+        """Create a Gaussian membership function"""
+        if sigma <= 0:
+            raise ValueError("Gaussian membership function requires sigma > 0")
+        return GaussianMemFn(label, mean, sigma)
+
+    @staticmethod
+    def create_bell(label: str, center: float, width: float, slope: float) -> BellMemFn:
+        """Create a generalized bell membership function"""
+        if width <= 0 or slope <= 0:
+            raise ValueError("Bell membership function requires width > 0 and slope > 0")
+        return BellMemFn(label, center, width, slope)
+
+    @staticmethod
+    def create_sigmoid(label: str, center: float, slope: float) -> SigmoidMemFn:
+        """Create a sigmoid membership function"""
+        if slope == 0:
+            raise ValueError("Sigmoid membership function requires a non-zero slope")
+        return SigmoidMemFn(label, center, slope)
@@ -0,0 +1,131 @@
+"""
+src/operators.py
+
+T-norms, S-norms, implication and aggregation operators in scalar and array form
+"""
+import operator
+from typing import Callable, Dict, Tuple
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+def _minimum_array(a, b):
+    return np.minimum(a, b)
+
+def _maximum_array(a, b):
+    return np.maximum(a, b)
+
+def _product(a, b):
+    return a * b
+
+def _probabilistic_sum(a, b):
+    return a + b - a * b
+
+def _lukasiewicz_and(a: float, b: float) -> float:
+    return max(0.0, a + b - 1.0)
+
+def _lukasiewicz_or(a: float, b: float) -> float:
+    return min(1.0, a + b)
+
+def _lukasiewicz_and_array(a, b):
+    return np.maximum(a + b - 1.0, 0.0)
+
+def _lukasiewicz_or_array(a, b):
+    return np.minimum(a + b, 1.0)
+
+
+# Forward-mode derivatives: (a, da, b, db) -> (value, dvalue) with da, db of shape (inputs, samples).
+# min and max follow the operand they select, the Lukasiewicz forms are flat where they saturate.
+def _minimum_gradient(a, da, b, db):
+    take = a <= b
+    return np.where(take, a, b), np.where(take, da, db)
+
+def _maximum_gradient(a, da, b, db):
+    take = a >= b
+    return np.where(take, a, b), np.where(take, da, db)
+
+def _product_gradient(a, da, b, db):
+    return a * b, da * b + a * db
+
+def _probabilistic_sum_gradient(a, da, b, db):
+    return a + b - a * b, da * (1 - b) + db * (1 - a)
+
+def _lukasiewicz_and_gradient(a, da, b, db):
+    total = a + b - 1.0
+    return np.maximum(total, 0.0), np.where(total > 0, da + db, 0.0)
+
+def _lukasiewicz_or_gradient(a, da, b, db):
+    total = a + b
+    return np.minimum(total, 1.0), np.where(total < 1, da + db, 0.0)
+
+
+# Name -> (scalar function, array function)
+T_NORMS: Dict[str, Tuple[Callable, Callable]] = {
+    "min": (min, _minimum_array),
+    "product": (_product, _product),
+    "lukasiewicz": (_lukasiewicz_and, _lukasiewicz_and_array),
+}
+S_NORMS: Dict[str, Tuple[Callable, Callable]] = {
+    "max": (max, _maximum_array),
+    "probabilistic_sum": (_probabilistic_sum, _probabilistic_sum),
+    "lukasiewicz": (_lukasiewicz_or, _lukasiewicz_or_array),
+}
+# Clipping (Mamdani) or scaling (Larsen) of the consequent set by the rule activation
+IMPLICATIONS: Dict[str, Tuple[Callable, Callable]] = {
+    "min": (min, _minimum_array),
+    "product": (_product, _product),
+}
+AGGREGATIONS: Dict[str, Tuple[Callable, Callable]] = {
+    "max": (max, _maximum_array),
+    "sum": (operator.add, operator.add),
+}
+
+T_NORM_GRADIENTS: Dict[str, Callable] = {
+    "min": _minimum_gradient,
+    "product": _product_gradient,
+    "lukasiewicz": _lukasiewicz_and_gradient,
+}
+S_NORM_GRADIENTS: Dict[str, Callable] = {
+    "max": _maximum_gradient,
+    "probabilistic_sum": _probabilistic_sum_gradient,
+    "lukasiewicz": _lukasiewicz_or_gradient,
+}
+
+# S-norm used when only the T-norm is given
+DUAL_S_NORMS = {"min": "max", "product": "probabilistic_sum", "lukasiewicz": "lukasiewicz"}
+
+
+class FuzzyOperators:
+    def __init__(self, t_norm: str = "min", s_norm: str = None, implication: str = "min",
+                 aggregation: str = "max"):
+        """
+        Operator family of a fuzzy inference system, resolved to callables once.
+        `s_norm` defaults to the dual of `t_norm`.
+        """
+        if s_norm is None:
+            s_norm = DUAL_S_NORMS.get(t_norm)
+        self.t_norm = t_norm
+        self.s_norm = s_norm
+        self.implication = implication
+        self.aggregation = aggregation
+
+        self.and_scalar, self.and_array = _resolve(T_NORMS, "T-norm", t_norm)
+        self.or_scalar, self.or_array = _resolve(S_NORMS, "S-norm", s_norm)
+        self.implication_scalar, self.implication_array = _resolve(IMPLICATIONS, "implication", implication)
+        self.aggregation_scalar, self.aggregation_array = _resolve(AGGREGATIONS, "aggregation", aggregation)
+        self.and_gradient = T_NORM_GRADIENTS[t_norm]
+        self.or_gradient = S_NORM_GRADIENTS[s_norm]
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"t_norm": self.t_norm, "s_norm": self.s_norm,
+                "implication": self.implication, "aggregation": self.aggregation}
+
+    def __repr__(self) -> str:
+        return (f"FuzzyOperators(t_norm={self.t_norm!r}, s_norm={self.s_norm!r}, "
+                f"implication={self.implication!r}, aggregation={self.aggregation!r})")
+
+
+def _resolve(table: Dict[str, Tuple[Callable, Callable]], kind: str, name: str) -> Tuple[Callable, Callable]:
+    if name not in table:
+        raise ValueError(f"Unknown {kind} '{name}', expected one of: {', '.join(table)}")
+    return table[name]
@@ -0,0 +1,113 @@
+"""
+src/parametricMemFn.py
+
+Base class for smooth membership functions defined by a formula
+"""
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+from utils.line import Point
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Degrees below this are treated as 0 so every shape has a support usable for rule indexing
+SUPPORT_EPSILON = 1e-4
+
+# Samples of the precomputed quadrature and of polygons handed to the polygon path
+QUADRATURE_POINTS = 2049
+POLYGON_POINTS = 65
+
+class ParametricMemFn(ABC):
+    def __init__(self, label: str, parameters: List[float], support: Tuple[float, float]):
+        """
+        Subclasses implement _scalar(x) with math, and _evaluate(x) and _derivative(x)
+        with NumPy; a subclass missing any of them cannot be instantiated.
+        Degrees are exactly 0 outside `support`.
+        """
+        self.label = label
+        self.parameters = parameters
+        self.support = support
+        self._quadrature: Dict[Tuple[float, float], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @abstractmethod
+    def _scalar(self, x: float) -> float:
+        """Degree at a point of the support"""
+
+    @abstractmethod
+    def _evaluate(self, x: np.ndarray) -> np.ndarray:
+        """Degrees at a 1-D array of points, as a new array"""
+
+    def calculateMembershipDegree(self, x: float) -> float:
+        if (x<self.support[0]) or (x>self.support[1]):
+            return 0
+        return self._scalar(x)
+
+    def degrees(self, x: np.ndarray) -> np.ndarray:
+        """Vectorized calculateMembershipDegree"""
+        x = np.asarray(x, dtype=float)
+        # Scalars and 0-d arrays are evaluated as one element and given their shape back
+        flat = np.atleast_1d(x)
+        degrees = self._evaluate(flat)
+        degrees[(flat < self.support[0]) | (flat > self.support[1])] = 0.0
+        return degrees.reshape(x.shape)
+
+    @abstractmethod
+    def _derivative(self, x: np.ndarray) -> np.ndarray:
+        """d degree / dx at a 1-D array of points, as a new array"""
+
+    def degreesAndSlopes(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Degrees and their derivative with respect to x, both 0 outside `support`"""
+        x = np.asarray(x, dtype=float)
+        flat = np.atleast_1d(x)
+        degrees = self._evaluate(flat)
+        slopes = self._derivative(flat)
+        outside = (flat < self.support[0]) | (flat > self.support[1])
+        degrees[outside] = 0.0
+        slopes[outside] = 0.0
+        return degrees.reshape(x.shape), slopes.reshape(x.shape)
+
+    def _window(self, lower: Optional[float], upper: Optional[float]) -> Tuple[float, float]:
+        lower = self.support[0] if lower is None else max(lower, self.support[0])
+        upper = self.support[1] if upper is None else min(upper, self.support[1])
+        if lower == -float("inf") or upper == float("inf"):
+            raise ValueError(f"Membership function '{self.label}' has unbounded support, pass lower and upper bounds")
+        return lower, upper
+
+    def _quadratureFor(self, lower: float, upper: float):
+        """Sample points, degrees and trapezoid weights over [lower, upper], cached per window"""
+        key = (lower, upper)
+        if key not in self._quadrature:
+            x = np.linspace(lower, upper, QUADRATURE_POINTS)
+            weights = np.full(QUADRATURE_POINTS, (upper - lower) / (QUADRATURE_POINTS - 1))
+            weights[0] /= 2
+            weights[-1] /= 2
+            self._quadrature[key] = (x, self.degrees(x), weights)
+        return self._quadrature[key]
+
+    def clippedMoments(self, height: float, lower: Optional[float] = None,
+                       upper: Optional[float] = None) -> Tuple[float, float]:
+        """Area and first moment of min(height, degree(x)) over [lower, upper] by precomputed quadrature"""
+        lower, upper = self._window(lower, upper)
+        if lower >= upper:
+            return 0.0, 0.0
+        x, degrees, weights = self._quadratureFor(lower, upper)
+        clipped = np.minimum(degrees, height) * weights
+        return float(clipped.sum()), float(clipped @ x)
+
+    def clippedCentroid(self, height: float, lower: Optional[float] = None,
+                        upper: Optional[float] = None) -> Optional[float]:
+        """x of the centroid of the clipped shape, None if it has no area"""
+        area, moment = self.clippedMoments(height, lower, upper)
+        return moment / area if area > 0 else None
+
+    def generatePortionPoints(self, fraction: float, lower: Optional[float] = None,
+                              upper: Optional[float] = None) -> List[Point]:
+        """Sampled outline capped at `fraction`, closed on the x-axis"""
+        lower, upper = self._window(lower, upper)
+        portionPoints = [Point(lower, 0)]
+        for i in range(POLYGON_POINTS):
+            x = lower + (upper - lower) * i / (POLYGON_POINTS - 1)
+            portionPoints.append(Point(x, round(min(self.calculateMembershipDegree(x), fraction), 2)))
+        portionPoints.append(Point(upper, 0))
+        return portionPoints
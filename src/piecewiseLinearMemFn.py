@@ -0,0 +1,206 @@
+"""
+src/piecewiseLinearMemFn.py
+
+N-point piecewise-linear membership function, base of the triangular and trapezoidal shapes
+"""
+from __future__ import annotations
+import copy
+from typing import List, Optional, Tuple
+from utils.line import Point, Line, roundArray
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+class PiecewiseLinearMemFn:
+    def __init__(self, label: str, x_coordinates: List[float], y_coordinates: List[float]):
+        assert len(x_coordinates) == len(y_coordinates)
+        assert len(x_coordinates) >= 2
+
+        # Ensure points are given from left to right with degrees in [0, 1]
+        for i in range(len(x_coordinates)-1):
+            assert x_coordinates[i] <= x_coordinates[i+1]
+        for y in y_coordinates:
+            assert 0 <= y <= 1
+
+        self.label = label
+        self.x_coordinates = x_coordinates
+        self.y_coordinates = y_coordinates
+        self.points_length = len(self.x_coordinates)
+        self.points: List[Point] = []
+        self.lines: List[Line] = []
+        self._createBoundary()
+        self._segments = None
+
+        # Degree is 0 outside this interval
+        self.support: Tuple[float, float] = (x_coordinates[0], x_coordinates[-1])
+
+    def _createBoundary(self):
+        for x, y in zip(self.x_coordinates, self.y_coordinates):
+            self.points.append(Point(x, y))
+
+        for i in range(self.points_length-1):
+            self.lines.append(Line(self.points[i], self.points[i+1]))
+
+    def calculateMembershipDegree(self, x: float) -> float:
+        if (x<self.x_coordinates[0]) or (x>self.x_coordinates[self.points_length-1]):
+            return 0
+        if self.x_coordinates[0] == self.x_coordinates[-1]:
+            return self._collapsedDegree()
+
+        target_line: Line
+
+        for i in range(self.points_length-1):
+            # Vertical edges have no y for a given x, the neighbouring segment decides
+            if self.lines[i].isVertical:
+                continue
+            if (x>=self.x_coordinates[i]) and (x<=self.x_coordinates[i+1]):
+                target_line = self.lines[i]
+
+        return target_line.calculateY(x)
+
+    def _collapsedDegree(self) -> float:
+        """
+        Degree at the single x of a shape whose segments are all vertical: its highest
+        point, rounded like Line.calculateY
+        """
+        return round(max(self.y_coordinates), 2)
+
+    def _compileSegments(self):
+        """
+        Precompute per-segment start point, rise and run. A vertical segment can only be
+        selected at its own x, where calculateMembershipDegree uses the closest
+        non-vertical segment before it, so it borrows that segment's coefficients.
+        """
+        x0, y0, rise, run = [], [], [], []
+        for line in self.lines:
+            if line.isVertical:
+                if x0:
+                    x0.append(x0[-1]); y0.append(y0[-1]); rise.append(rise[-1]); run.append(run[-1])
+                else:
+                    # Leading vertical edges only matter when every segment is vertical
+                    x0.append(line.start.x); y0.append(self._collapsedDegree()); rise.append(0.0); run.append(1.0)
+            else:
+                x0.append(line.start.x); y0.append(line.start.y)
+                rise.append(line.end.y - line.start.y); run.append(line.end.x - line.start.x)
+
+        self._segments = (
+            np.asarray(self.x_coordinates, dtype=float),
+            np.asarray(x0, dtype=float),
+            np.asarray(y0, dtype=float),
+            np.asarray(rise, dtype=float),
+            np.asarray(run, dtype=float),
+        )
+
+    def degrees(self, x: np.ndarray) -> np.ndarray:
+        """
+        Vectorized calculateMembershipDegree with identical results, including the
+        choice of the later segment at shared breakpoints and the 2-decimal rounding
+        """
+        if self._segments is None:
+            self._compileSegments()
+        breakpoints, x0, y0, rise, run = self._segments
+
+        x = np.asarray(x, dtype=float)
+        # Scalars and 0-d arrays are evaluated as one element and given their shape back
+        flat = np.atleast_1d(x)
+        index = np.searchsorted(breakpoints, flat, side="right") - 1
+        np.clip(index, 0, len(run) - 1, out=index)
+
+        # Same expression as Line.calculateY so rounding agrees bit for bit
+        degrees = ((flat - x0[index]) * rise[index] / run[index]) + y0[index]
+        degrees = roundArray(degrees)
+        degrees[(flat < breakpoints[0]) | (flat > breakpoints[-1])] = 0.0
+        return degrees.reshape(x.shape)
+
+    def degreesAndSlopes(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Unrounded degrees and their derivative on the segment degrees() selects, both 0
+        outside the support
+        """
+        if self._segments is None:
+            self._compileSegments()
+        breakpoints, x0, y0, rise, run = self._segments
+
+        x = np.asarray(x, dtype=float)
+        flat = np.atleast_1d(x)
+        index = np.searchsorted(breakpoints, flat, side="right") - 1
+        np.clip(index, 0, len(run) - 1, out=index)
+        slopes = rise[index] / run[index]
+        degrees = ((flat - x0[index]) * slopes) + y0[index]
+        outside = (flat < breakpoints[0]) | (flat > breakpoints[-1])
+        degrees[outside] = 0.0
+        slopes[outside] = 0.0
+        return degrees.reshape(x.shape), slopes.reshape(x.shape)
+
+    def generatePortionPoints(self, fraction: float) -> List[Point]:
+        if all(y in (0, 1) for y in self.y_coordinates):
+            # Triangles and trapezoids start and end on the x-axis and cross each
+            # sloped edge exactly once
+            if fraction == 1.0:
+                return self.points
+
+            portionPoints: List[Point] = []
+            portionPoints.append(self.points[0])
+
+            for i in range(self.points_length-1):
+                x = self.lines[i].calculateX(fraction)
+                if x is not None:
+                    portionPoints.append(Point(x, fraction))
+
+            portionPoints.append(self.points[self.points_length-1])
+            return portionPoints
+
+        # General shapes: follow the outline capped at the fraction, closed on the x-axis
+        portionPoints = [Point(self.points[0].x, 0)]
+        for i in range(self.points_length):
+            point = self.points[i]
+            if i > 0:
+                previous = self.points[i-1]
+                if (previous.y - fraction) * (point.y - fraction) < 0:
+                    portionPoints.append(Point(self.lines[i-1].calculateX(fraction), fraction))
+            portionPoints.append(Point(point.x, min(point.y, fraction)))
+        portionPoints.append(Point(self.points[-1].x, 0))
+        return portionPoints
+
+    def clippedMoments(self, height: float, lower: Optional[float] = None,
+                       upper: Optional[float] = None) -> Tuple[float, float]:
+        """
+        Closed-form area and first moment of min(height, degree(x)) over [lower, upper]
+        (the whole support by default), computed on the unrounded outline
+        """
+        lower = self.support[0] if lower is None else max(lower, self.support[0])
+        upper = self.support[1] if upper is None else min(upper, self.support[1])
+
+        area = 0.0
+        moment = 0.0
+        for start, end in zip(self.points[:-1], self.points[1:]):
+            a, b = max(start.x, lower), min(end.x, upper)
+            if a >= b:
+                continue
+            slope = (end.y - start.y) / (end.x - start.x)
+            fa = min(start.y + slope * (a - start.x), 1.0)
+            fb = min(start.y + slope * (b - start.x), 1.0)
+
+            # Split where the outline crosses the clipping height
+            pieces = [(a, fa, b, fb)]
+            if (fa - height) * (fb - height) < 0:
+                c = a + (height - fa) * (b - a) / (fb - fa)
+                pieces = [(a, fa, c, height), (c, height, b, fb)]
+
+            for xa, ya, xb, yb in pieces:
+                ya, yb = min(ya, height), min(yb, height)
+                area += (xb - xa) * (ya + yb) / 2
+                moment += (xb - xa) * (ya * (2*xa + xb) + yb * (xa + 2*xb)) / 6
+        return area, moment
+
+    def clippedCentroid(self, height: float, lower: Optional[float] = None,
+                        upper: Optional[float] = None) -> Optional[float]:
+        """x of the centroid of the clipped shape, None if it has no area"""
+        area, moment = self.clippedMoments(height, lower, upper)
+        return moment / area if area > 0 else None
+
+    def withXCoordinates(self, x_coordinates: List[float]) -> PiecewiseLinearMemFn:
+        """Same shape and heights over new breakpoints"""
+        clone = copy.copy(self)
+        PiecewiseLinearMemFn.__init__(clone, self.label, list(x_coordinates), list(self.y_coordinates))
+        return clone
@@ -0,0 +1,176 @@
+"""
+src/pipeline.py
+
+Fuzzy inference systems chained output-to-input and evaluated in batch as a DAG
+"""
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+from src.batch import BatchInferenceEngine
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+class FuzzyPipeline:
+    def __init__(self, resolution: int = 201, chunk_size: int = 8192):
+        """
+        Stages are fuzzy inference systems whose inputs read either pipeline inputs or
+        outputs of other stages. Each distinct system is compiled into one
+        BatchInferenceEngine with `resolution` and `chunk_size`.
+        """
+        self.resolution = resolution
+        self.chunk_size = chunk_size
+        # Stage name -> (fis, {input variable: source})
+        self.stages: Dict[str, Tuple[object, Dict[str, str]]] = {}
+        # id(fis) -> (fis, engine), shared by stages running the same system
+        self._engines: Dict[int, Tuple[object, BatchInferenceEngine]] = {}
+        self._order: Optional[List[str]] = None
+        self._dependencies_of: Dict[str, Set[str]] = {}
+        # Stage name -> earlier stage with the same system and sources, whose outputs it reuses
+        self._canonical: Dict[str, str] = {}
+
+    def add_stage(self, name: str, fis, inputs: Optional[Dict[str, str]] = None):
+        """
+        Add `fis` as stage `name`. `inputs` maps input variables of `fis` to sources,
+        "stage.output" for an output of another stage or a plain name for a pipeline
+        input. Input variables left out read the pipeline input of the same name.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' already defined")
+        if "." in name:
+            raise ValueError(f"Stage name '{name}' must not contain '.'")
+        inputs = inputs or {}
+        for var_name in inputs:
+            if var_name not in fis.input_variables:
+                raise ValueError(f"Input variable '{var_name}' not defined in stage '{name}'")
+
+        sources = {var_name: inputs.get(var_name, var_name) for var_name in fis.input_variables}
+        self.stages[name] = (fis, sources)
+        self._order = None
+
+    @property
+    def external_inputs(self) -> List[str]:
+        """Pipeline inputs read by any stage"""
+        names = []
+        for _, sources in self.stages.values():
+            for source in sources.values():
+                if "." not in source and source not in names:
+                    names.append(source)
+        return names
+
+    def _dependencies(self, name: str) -> Set[str]:
+        dependencies = set()
+        for var_name, source in self.stages[name][1].items():
+            if "." not in source:
+                continue
+            stage, output = source.split(".", 1)
+            if stage not in self.stages:
+                raise ValueError(f"Stage '{name}' reads '{source}' but stage '{stage}' is not defined")
+            if output not in self.stages[stage][0].output_variables:
+                raise ValueError(f"Stage '{name}' reads '{source}' but '{stage}' has no output '{output}'")
+            dependencies.add(stage)
+        return dependencies
+
+    def topological_order(self) -> List[str]:
+        """Stages ordered so every stage follows the stages it reads, cycles are an error"""
+        if self._order is not None:
+            return self._order
+
+        dependencies = {name: self._dependencies(name) for name in self.stages}
+        remaining = {name: len(deps) for name, deps in dependencies.items()}
+        dependents: Dict[str, List[str]] = {name: [] for name in self.stages}
+        for name, deps in dependencies.items():
+            for dependency in deps:
+                dependents[dependency].append(name)
+
+        # Kahn's algorithm, keeping insertion order among ready stages
+        order = []
+        ready = [name for name in self.stages if remaining[name] == 0]
+        while ready:
+            name = ready.pop(0)
+            order.append(name)
+            for dependent in dependents[name]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) < len(self.stages):
+            cycle = [name for name in self.stages if remaining[name] > 0]
+            raise ValueError(f"Pipeline stages form a cycle: {', '.join(cycle)}")
+
+        # Stages running the same system on the same sources are evaluated once
+        self._canonical = {}
+        signatures: Dict[Tuple, str] = {}
+        for name in order:
+            fis, sources = self.stages[name]
+            resolved = []
+            for var_name, source in sorted(sources.items()):
+                if "." in source:
+                    stage, output = source.split(".", 1)
+                    source = f"{self._canonical.get(stage, stage)}.{output}"
+                resolved.append((var_name, source))
+            signature = (id(fis), tuple(resolved))
+            if signature in signatures:
+                self._canonical[name] = signatures[signature]
+            else:
+                signatures[signature] = name
+
+        self._dependencies_of = dependencies
+        self._order = order
+        return order
+
+    def _engine(self, fis) -> BatchInferenceEngine:
+        entry = self._engines.get(id(fis))
+        if entry is None or entry[0] is not fis:
+            entry = (fis, BatchInferenceEngine(fis, self.resolution, self.chunk_size))
+            self._engines[id(fis)] = entry
+        return entry[1]
+
+    def _run_stage(self, name: str, inputs: Dict[str, np.ndarray],
+                   results: Dict[str, Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        fis, sources = self.stages[name]
+        stage_inputs = {}
+        for var_name, source in sources.items():
+            if "." in source:
+                stage, output = source.split(".", 1)
+                # The upstream array itself, not a copy
+                stage_inputs[var_name] = results[self._canonical.get(stage, stage)][output]
+            else:
+                stage_inputs[var_name] = inputs[source]
+        return self._engine(fis).infer(stage_inputs)
+
+    def infer(self, inputs: Dict[str, np.ndarray], workers: int = 1) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Evaluate every stage on equally sized input arrays and return the outputs of
+        each stage keyed by stage name. With `workers` > 1, stages whose inputs are
+        ready run concurrently on threads, which share the intermediate arrays.
+        """
+        order = self.topological_order()
+        missing = [name for name in self.external_inputs if name not in inputs]
+        if missing:
+            raise ValueError(f"Pipeline inputs not provided: {', '.join(missing)}")
+        inputs = {name: np.asarray(values, dtype=float).ravel() for name, values in inputs.items()}
+
+        results: Dict[str, Dict[str, np.ndarray]] = {}
+        pending = [name for name in order if name not in self._canonical]
+
+        if workers <= 1:
+            for name in pending:
+                results[name] = self._run_stage(name, inputs, results)
+        else:
+            with ThreadPoolExecutor(workers) as executor:
+                running = {}
+                while pending or running:
+                    # Submit every stage whose upstream stages have finished
+                    for name in list(pending):
+                        dependencies = {self._canonical.get(d, d) for d in self._dependencies_of[name]}
+                        if all(dependency in results for dependency in dependencies):
+                            pending.remove(name)
+                            running[executor.submit(self._run_stage, name, inputs, results)] = name
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)] = future.result()
+
+        for name, canonical in self._canonical.items():
+            results[name] = results[canonical]
+        return {name: results[name] for name in order}
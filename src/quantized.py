@@ -0,0 +1,273 @@
+"""
+src/quantized.py
+
+Fixed-point inference: integer membership tables, integer min/max rules and precomputed centroid tables
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+from src.batch import BatchInferenceEngine
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Largest centroid table built per output variable when activation_levels is not given
+MAX_TABLE_SIZE = 1 << 20
+# Default error bound as a fraction of the output range. Most of the deviation comes from
+# small activations of distant output sets, where one activation step (or the float
+# engine's own rounding of degrees to 0.01) moves the centroid by a few percent. The
+# edge detection system stays within 3.2% over 3M random inputs and 1.2% on pictures/.
+ERROR_BOUND_FRACTION = 0.04
+
+
+@dataclass
+class QuantizationReport:
+    max_deviation: float  # largest |quantized - float| over the checked samples, output units
+    mean_deviation: float
+    error_bound: float
+    samples: int
+
+    @property
+    def within_bound(self) -> bool:
+        return self.max_deviation <= self.error_bound
+
+
+class QuantizedInferenceEngine:
+    def __init__(self, fis, input_levels: Union[int, Dict[str, int]] = 4096, degree_bits: int = 8,
+                 activation_levels: Optional[int] = None, output_bits: int = 8,
+                 resolution: int = 201, error_bound: Optional[float] = None):
+        """
+        Fixed-point version of BatchInferenceEngine for the min/max operator family.
+        Inputs are quantized to `input_levels` codes across each range, membership
+        degrees are stored as unsigned `degree_bits` integers and rules are evaluated
+        with integer min/max. The centroid of every combination of per-label
+        activations, reduced to `activation_levels` steps, is looked up in a
+        precomputed table of `output_bits` codes.
+
+        `error_bound` (output units) defaults to ERROR_BOUND_FRACTION of the output
+        range and is what compare() checks the measured deviation against.
+        """
+        operators = fis.operators
+        if (operators.t_norm, operators.s_norm, operators.implication, operators.aggregation) != ("min", "max", "min", "max"):
+            raise ValueError(f"QuantizedInferenceEngine supports the min/max operator family, got {operators!r}")
+        if degree_bits not in (8, 16):
+            raise ValueError(f"degree_bits must be 8 or 16, got {degree_bits}")
+        if output_bits not in (8, 16):
+            raise ValueError(f"output_bits must be 8 or 16, got {output_bits}")
+
+        self.fis = fis
+        self.resolution = resolution
+        self.degree_bits = degree_bits
+        self.output_bits = output_bits
+        self._degree_max = (1 << degree_bits) - 1
+        self._degree_dtype = np.uint8 if degree_bits == 8 else np.uint16
+        self._output_max = (1 << output_bits) - 1
+        self._output_dtype = np.uint8 if output_bits == 8 else np.uint16
+
+        self.reference = BatchInferenceEngine(fis, resolution)
+        compiled = self.reference._compiled
+
+        # Input codes: 0 below the range, 1..levels across it, levels + 1 above it
+        self.input_levels: Dict[str, int] = {}
+        self._input_steps: Dict[str, Tuple[float, float]] = {}
+        self._input_tables: Dict[Tuple[str, str], np.ndarray] = {}
+        for var_name, variable in fis.input_variables.items():
+            levels = input_levels.get(var_name, 4096) if isinstance(input_levels, dict) else input_levels
+            if not 2 <= levels <= 65534:
+                raise ValueError(f"Input levels for '{var_name}' must be between 2 and 65534, got {levels}")
+            low, high = variable.range
+            self.input_levels[var_name] = levels
+            self._input_steps[var_name] = (low, (levels - 1) / (high - low))
+            span = high - low
+            # Inputs outside the range take the degrees one range-width beyond it
+            x = np.concatenate(([low - span], np.linspace(low, high, levels), [high + span]))
+            for label, mem_fn in variable.membership_functions.items():
+                self._input_tables[(var_name, label)] = self._to_degrees(mem_fn.degrees(x))
+
+        # Conditions and antecedents as in the compiled rule base, skipping dead entries
+        self._conditions: List[Optional[Tuple[str, str, bool]]] = [
+            (var_name, label, operator == "is not") if refs else None
+            for (var_name, label, operator), refs in zip(compiled.conditions, compiled.condition_refs)
+        ]
+        self._antecedents = [
+            antecedent if refs else None
+            for antecedent, refs in zip(compiled.antecedents, compiled.antecedent_refs)
+        ]
+        for antecedent in self._antecedents:
+            for _, connector in antecedent or ():
+                if connector not in (None, "AND", "OR"):
+                    raise ValueError(f"Unsupported connector: {connector}")
+        # (antecedent, integer weight or None for 1.0, [(output, label)])
+        self._rules = [
+            (antecedent, None if weight == 1.0 else int(round(weight * self._degree_max)),
+             [(var_name, label) for var_name, label, _ in consequents])
+            for antecedent, weight, consequents in compiled.rules
+        ]
+
+        # Per output: labels in table order, activation levels, code map and centroid table
+        self.activation_levels: Dict[str, int] = {}
+        self._labels: Dict[str, List[str]] = {}
+        self._activation_codes: Dict[str, np.ndarray] = {}
+        self._centroid_tables: Dict[str, np.ndarray] = {}
+        self._output_steps: Dict[str, Tuple[float, float]] = {}
+        for var_name, variable in fis.output_variables.items():
+            labels = list(variable.membership_functions)
+            levels = activation_levels or self._default_activation_levels(len(labels))
+            if levels ** len(labels) > 1 << 28:
+                raise ValueError(f"Centroid table for '{var_name}' would have {levels ** len(labels)} entries, "
+                                 f"lower activation_levels")
+            self._labels[var_name] = labels
+            self.activation_levels[var_name] = levels
+            # Degree code -> nearest activation step
+            self._activation_codes[var_name] = np.rint(
+                np.arange(self._degree_max + 1) * (levels - 1) / self._degree_max).astype(np.uint16)
+
+            low, high = variable.range
+            self._output_steps[var_name] = (low, (high - low) / self._output_max)
+            centroids = self._centroids(var_name, labels, levels)
+            codes = np.rint((centroids - low) / self._output_steps[var_name][1])
+            self._centroid_tables[var_name] = np.clip(codes, 0, self._output_max).astype(self._output_dtype)
+
+        if error_bound is None:
+            error_bound = max((ERROR_BOUND_FRACTION * (variable.range[1] - variable.range[0])
+                               for variable in fis.output_variables.values()), default=0.0)
+        self.error_bound = error_bound
+
+    @staticmethod
+    def _default_activation_levels(labels: int) -> int:
+        """Largest power of two up to 256 whose table fits in MAX_TABLE_SIZE entries"""
+        levels = 256
+        while levels > 2 and levels ** labels > MAX_TABLE_SIZE:
+            levels //= 2
+        return levels
+
+    def _to_degrees(self, degrees: np.ndarray) -> np.ndarray:
+        return np.rint(np.clip(degrees, 0.0, 1.0) * self._degree_max).astype(self._degree_dtype)
+
+    def _centroids(self, var_name: str, labels: List[str], levels: int) -> np.ndarray:
+        """Sampled centroid of the max of clipped sets for every activation combination"""
+        grid = self.reference._grids[var_name]
+        sets = [self.reference._output_sets[var_name][label] for label in labels]
+        steps = np.arange(levels) / (levels - 1)
+        size = levels ** len(labels)
+        centroids = np.empty(size)
+        chunk = max(1, (1 << 22) // max(grid.size, 1))
+        for start in range(0, size, chunk):
+            index = np.arange(start, min(start + chunk, size))
+            envelope = np.zeros((index.size, grid.size))
+            for position, degrees in enumerate(sets):
+                # Label 0 is the most significant digit of the table index
+                digit = (index // levels ** (len(labels) - 1 - position)) % levels
+                np.maximum(envelope, np.minimum(steps[digit][:, None], degrees[None, :]), out=envelope)
+            area = envelope.sum(axis=1)
+            centroids[index] = np.divide(envelope @ grid, area, out=np.zeros(index.size), where=area > 0)
+        return centroids
+
+    def quantize(self, var_name: str, values: np.ndarray) -> np.ndarray:
+        """Input values to uint16 codes, with sentinels for values outside the range"""
+        levels = self.input_levels[var_name]
+        low, scale = self._input_steps[var_name]
+        scaled = (np.asarray(values, dtype=np.float32) - np.float32(low)) * np.float32(scale)
+        codes = np.rint(scaled)
+        codes = np.where(scaled < 0, -1, np.where(scaled > levels - 1, levels, codes))
+        return (codes + 1).astype(np.uint16)
+
+    def dequantize(self, var_name: str, codes: np.ndarray) -> np.ndarray:
+        """Output codes to values in output units"""
+        low, step = self._output_steps[var_name]
+        return low + np.asarray(codes, dtype=float) * step
+
+    def threshold_code(self, var_name: str, threshold: float) -> int:
+        """Largest output code whose value does not exceed `threshold`"""
+        low, step = self._output_steps[var_name]
+        return int(np.floor((threshold - low) / step + 1e-9))
+
+    def infer_codes(self, codes: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Output codes for arrays of input codes, integer arithmetic only"""
+        for var_name in codes:
+            if var_name not in self.fis.input_variables:
+                raise ValueError(f"Input variable '{var_name}' not defined")
+        shapes = {np.shape(values) for values in codes.values()}
+        if len(shapes) > 1:
+            raise ValueError("Input arrays must have the same length")
+        shape = shapes.pop() if shapes else (0,)
+
+        degrees = []
+        for condition in self._conditions:
+            if condition is None:
+                degrees.append(None)
+                continue
+            var_name, label, negate = condition
+            if var_name not in codes:
+                raise ValueError(f"Input value for '{var_name}' not provided")
+            degree = self._input_tables[(var_name, label)][codes[var_name]]
+            degrees.append(self._degree_max - degree if negate else degree)
+
+        full = np.full(shape, self._degree_max, dtype=self._degree_dtype)
+        activations = []
+        for antecedent in self._antecedents:
+            if antecedent is None:
+                activations.append(None)
+                continue
+            current, connector = full, None
+            for index, (condition, next_connector) in enumerate(antecedent):
+                if index == 0:
+                    current = degrees[condition]
+                elif connector == "AND":
+                    current = np.minimum(current, degrees[condition])
+                else:
+                    current = np.maximum(current, degrees[condition])
+                connector = next_connector
+            activations.append(current)
+
+        # Largest activation per output label
+        label_activations: Dict[Tuple[str, str], np.ndarray] = {}
+        for antecedent, weight, consequents in self._rules:
+            activation = activations[antecedent]
+            if weight is not None:
+                activation = ((activation.astype(np.uint32) * weight + self._degree_max // 2)
+                              // self._degree_max).astype(self._degree_dtype)
+            for key in consequents:
+                current = label_activations.get(key)
+                label_activations[key] = activation if current is None else np.maximum(current, activation)
+
+        outputs = {}
+        for var_name, labels in self._labels.items():
+            levels = self.activation_levels[var_name]
+            steps = self._activation_codes[var_name]
+            index = np.zeros(shape, dtype=np.uint32)
+            for label in labels:
+                index *= levels
+                activation = label_activations.get((var_name, label))
+                if activation is not None:
+                    index += steps[activation]
+            outputs[var_name] = self._centroid_tables[var_name][index]
+        return outputs
+
+    def infer(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Quantize float inputs, infer and return outputs in output units"""
+        codes = {name: self.quantize(name, values) for name, values in inputs.items()}
+        return {name: self.dequantize(name, values) for name, values in self.infer_codes(codes).items()}
+
+    def compare(self, inputs: Optional[Dict[str, np.ndarray]] = None, samples: int = 100000,
+                seed: Optional[int] = 0) -> QuantizationReport:
+        """
+        Deviation from the float BatchInferenceEngine on `inputs`, or on `samples`
+        random inputs drawn uniformly from the input ranges
+        """
+        if inputs is None:
+            rng = np.random.default_rng(seed)
+            inputs = {
+                name: rng.uniform(variable.range[0], variable.range[1], samples)
+                for name, variable in self.fis.input_variables.items()
+            }
+        expected = self.reference.infer(inputs)
+        actual = self.infer(inputs)
+        deviations = np.concatenate([np.abs(actual[name] - expected[name]).ravel() for name in expected])
+        count = deviations.size
+        return QuantizationReport(
+            max_deviation=float(deviations.max()) if count else 0.0,
+            mean_deviation=float(deviations.mean()) if count else 0.0,
+            error_bound=self.error_bound,
+            samples=count,
+        )
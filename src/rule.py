@@ -3,27 +3,46 @@ src/rule.py
 
 Enhanced Rule representation and parsing with support for both AND and OR operations
 """
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple, Union
 import re
 
 class FuzzyRule:
-    def __init__(self, antecedents: List[Tuple[str, str, str, str]], consequent: Tuple[str, str, str]):
+    def __init__(self, antecedents: List[Tuple[str, str, str, str]],
+                 consequent: Union[Tuple[str, str, str], List[Tuple[str, str, str]]],
+                 weight: float = 1.0):
         """
         Initialize rule with antecedents and consequent
         Each antecedent is a tuple of (variable_name, label, operator, connector)
         where connector is either "AND", "OR", or None for the last antecedent
         Operator can be "is", "is not", etc.
+        `consequent` is one (variable_name, label, operator) tuple or a list of them,
+        all implied with the same activation. `weight` in [0, 1] scales the activation.
         """
+        if not 0.0 <= weight <= 1.0:
+            raise ValueError(f"Rule weight must be in [0, 1], got {weight}")
         self.antecedents = antecedents
-        self.consequent = consequent
+        self.consequents: List[Tuple[str, str, str]] = (
+            [tuple(consequent)] if isinstance(consequent, tuple) else [tuple(c) for c in consequent]
+        )
+        if not self.consequents:
+            raise ValueError("Rule must have at least one consequent")
+        self.weight = weight
+
+    @property
+    def consequent(self) -> Tuple[str, str, str]:
+        """First consequent, the only one for single-output rules"""
+        return self.consequents[0]
     
-    def evaluate(self, input_values: Dict[str, float], linguistic_variables: Dict[str, object]) -> float:
+    def evaluate(self, input_values: Dict[str, float], linguistic_variables: Dict[str, object],
+                 t_norm: Callable[[float, float], float] = min,
+                 s_norm: Callable[[float, float], float] = max) -> float:
         """
         Evaluate the rule for given input values and return activation degree
-        Supports both AND and OR operations between antecedents
+        Supports both AND and OR operations between antecedents, combined with
+        `t_norm` and `s_norm` respectively, and scales the result by the rule weight
         """
         if not self.antecedents:
-            return 1.0  # Empty rule always fires at maximum activation
+            return self.weight  # Empty rule always fires at maximum activation
         
         current_activation = None
         current_connector = None
@@ -50,27 +69,125 @@ class FuzzyRule:
             if current_activation is None:
                 current_activation = condition_activation
             elif current_connector == "AND":
-                current_activation = min(current_activation, condition_activation)
+                current_activation = t_norm(current_activation, condition_activation)
             elif current_connector == "OR":
-                current_activation = max(current_activation, condition_activation)
+                current_activation = s_norm(current_activation, condition_activation)
             else:
                 raise ValueError(f"Unsupported connector: {current_connector}")
             
             # Update connector for next iteration
             current_connector = connector
         
+        return current_activation * self.weight
+
+
+class CompiledRuleBase:
+    def __init__(self, rules: List[FuzzyRule]):
+        """
+        Rule base with shared work factored out. Every distinct (variable, label, operator)
+        condition and every distinct antecedent is stored once and rules refer to them by
+        index, so evaluators compute each of them once per inference.
+        Rules can be added, removed and replaced in place. Conditions and antecedents no
+        rule uses any more keep their index with a reference count of 0 and are skipped.
+        """
+        self.source: List[FuzzyRule] = []
+        self.conditions: List[Tuple[str, str, str]] = []
+        # Each antecedent is a tuple of (condition index, connector)
+        self.antecedents: List[Tuple[Tuple[int, str], ...]] = []
+        # (antecedent index, weight, consequents) per rule
+        self.rules: List[Tuple[int, float, List[Tuple[str, str, str]]]] = []
+
+        # Antecedents using each condition and rules using each antecedent
+        self.condition_refs: List[int] = []
+        self.antecedent_refs: List[int] = []
+        self.unused_antecedents = 0
+        self._condition_index: Dict[Tuple[str, str, str], int] = {}
+        self._antecedent_index: Dict[Tuple[Tuple[int, str], ...], int] = {}
+
+        for rule in rules:
+            self.add(rule)
+
+    def _entry(self, rule: FuzzyRule) -> Tuple[int, float, List[Tuple[str, str, str]]]:
+        antecedent = []
+        for var_name, label, operator, connector in rule.antecedents:
+            key = (var_name, label, operator)
+            if key not in self._condition_index:
+                self._condition_index[key] = len(self.conditions)
+                self.conditions.append(key)
+                self.condition_refs.append(0)
+            antecedent.append((self._condition_index[key], connector))
+
+        antecedent = tuple(antecedent)
+        index = self._antecedent_index.get(antecedent)
+        if index is None:
+            index = self._antecedent_index[antecedent] = len(self.antecedents)
+            self.antecedents.append(antecedent)
+            self.antecedent_refs.append(0)
+        elif self.antecedent_refs[index] == 0:
+            self.unused_antecedents -= 1
+
+        if self.antecedent_refs[index] == 0:
+            for condition, _ in antecedent:
+                self.condition_refs[condition] += 1
+        self.antecedent_refs[index] += 1
+        return index, rule.weight, list(rule.consequents)
+
+    def _release(self, entry: Tuple[int, float, List[Tuple[str, str, str]]]):
+        index = entry[0]
+        self.antecedent_refs[index] -= 1
+        if self.antecedent_refs[index] == 0:
+            self.unused_antecedents += 1
+            for condition, _ in self.antecedents[index]:
+                self.condition_refs[condition] -= 1
+
+    def add(self, rule: FuzzyRule):
+        self.source.append(rule)
+        self.rules.append(self._entry(rule))
+
+    def remove(self, index: int) -> FuzzyRule:
+        self._release(self.rules.pop(index))
+        return self.source.pop(index)
+
+    def replace(self, index: int, rule: FuzzyRule) -> FuzzyRule:
+        # Take the new references first so a shared antecedent is never released
+        entry = self._entry(rule)
+        self._release(self.rules[index])
+        self.rules[index] = entry
+        previous, self.source[index] = self.source[index], rule
+        return previous
+
+    @staticmethod
+    def combine(antecedent: Tuple[Tuple[int, str], ...], degrees: List, t_norm: Callable, s_norm: Callable):
+        """Fold condition degrees left to right with the connectors, 1.0 for an empty antecedent"""
+        if not antecedent:
+            return 1.0
+
+        current_activation = None
+        current_connector = None
+        for condition, connector in antecedent:
+            if current_activation is None:
+                current_activation = degrees[condition]
+            elif current_connector == "AND":
+                current_activation = t_norm(current_activation, degrees[condition])
+            elif current_connector == "OR":
+                current_activation = s_norm(current_activation, degrees[condition])
+            else:
+                raise ValueError(f"Unsupported connector: {current_connector}")
+            current_connector = connector
         return current_activation
 
 
 class RuleParser:
     def __init__(self):
         # Define regex patterns for rule components
-        self.antecedent_pattern = r'([\w_]+)\s+(is|is not)\s+([\w_]+)'
+        self.antecedent_pattern = r'([\w_]+)\s+(is not|is)\s+([\w_]+)'
     
     def parse_rule(self, rule_str: str) -> FuzzyRule:
         """
         Parse a rule string like "IF temperature IS hot AND humidity IS high THEN fan_speed IS fast"
         Also supports OR operator: "IF temperature IS hot OR humidity IS high THEN fan_speed IS fast"
+        Several consequents are joined with AND and a trailing "WITH 0.5" sets the weight:
+        "IF temperature IS hot THEN fan_speed IS fast AND vent IS open WITH 0.5"
         """
         # Split into antecedent and consequent parts
         parts = rule_str.split("THEN")
@@ -120,15 +237,27 @@ class RuleParser:
                 var_name, operator, label = match.groups()
                 antecedent_clauses.append((var_name, label, operator, "OR"))
         
-        # Parse consequent
-        match = re.match(self.antecedent_pattern, consequent_str)
-        if not match:
-            raise ValueError(f"Invalid consequent: {consequent_str}")
+        # Optional weight after the consequents
+        weight = 1.0
+        weight_match = re.search(r'\s+WITH\s+([0-9.eE+-]+)\s*$', consequent_str)
+        if weight_match:
+            try:
+                weight = float(weight_match.group(1))
+            except ValueError:
+                raise ValueError(f"Invalid rule weight: {weight_match.group(1)}")
+            consequent_str = consequent_str[:weight_match.start()]
         
-        var_name, operator, label = match.groups()
-        consequent = (var_name, label, operator)
+        # Parse consequents
+        consequents = []
+        for clause in consequent_str.split(" AND "):
+            match = re.fullmatch(self.antecedent_pattern, clause.strip())
+            if not match:
+                raise ValueError(f"Invalid consequent: {clause.strip()}")
+            var_name, operator, label = match.groups()
+            consequents.append((var_name, label, operator))
         
-        return FuzzyRule(antecedent_clauses, consequent)
+        consequent = consequents[0] if len(consequents) == 1 else consequents
+        return FuzzyRule(antecedent_clauses, consequent, weight)
     
     def parse_rules(self, rules_str: str) -> List[FuzzyRule]:
         """Parse multiple rules separated by semicolons or newlines"""
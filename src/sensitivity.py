@@ -0,0 +1,186 @@
+"""
+src/sensitivity.py
+
+Defuzzified outputs together with their derivatives with respect to every input, in one forward pass
+"""
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from src.batch import BatchInferenceEngine
+from src.operators import S_NORM_GRADIENTS
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+_maximum_gradient = S_NORM_GRADIENTS["max"]
+
+
+class SensitivityEngine(BatchInferenceEngine):
+    def __init__(self, fis, resolution: int = 201, chunk_size: int = 8192):
+        """
+        BatchInferenceEngine that also returns d output / d input for every output and
+        input. Gradients are carried forward from the membership slopes through the
+        T-norm and S-norm (min and max follow the operand they select), the rule
+        weights, implication, aggregation and the centroid of the sampled output sets.
+
+        Input memberships are evaluated without the 0.01 rounding of degrees(), which
+        makes outputs step-shaped and finite differences meaningless, so outputs agree
+        with BatchInferenceEngine.infer up to that rounding and the derivatives are
+        exact for them. At breakpoints and where min or max switch operands the
+        derivative is one-sided.
+        """
+        super().__init__(fis, resolution, chunk_size)
+        operators = fis.operators
+        self._and_gradient = operators.and_gradient
+        self._or_gradient = operators.or_gradient
+        self._clipping = operators.implication == "min"
+        self._max_aggregation = operators.aggregation == "max"
+
+    def _rule_gradients(self, inputs: Dict[str, np.ndarray], names: List[str],
+                        size: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(activation, gradient of shape (inputs, samples)) of every compiled rule"""
+        compiled = self._compiled
+        position = {name: i for i, name in enumerate(names)}
+
+        memberships = []
+        for (var_name, _), mem_fn, live in zip(self._clauses, self._clause_functions, self._live_clauses):
+            if not live:
+                memberships.append(None)
+                continue
+            values = inputs[var_name]
+            # A membership depends on its own input only
+            degrees, slopes = mem_fn.degreesAndSlopes(values)
+            gradient = np.zeros((len(names), size))
+            gradient[position[var_name]] = slopes
+            memberships.append((degrees, gradient))
+        degrees = [
+            None if not refs else
+            (1.0 - memberships[clause][0], -memberships[clause][1]) if negate else memberships[clause]
+            for (clause, negate), refs in zip(self._conditions, compiled.condition_refs)
+        ]
+
+        antecedent_activations = []
+        for antecedent, refs in zip(compiled.antecedents, compiled.antecedent_refs):
+            if not refs:
+                antecedent_activations.append(None)
+                continue
+            current = (np.ones(size), np.zeros((len(names), size)))
+            connector = None
+            for index, (condition, next_connector) in enumerate(antecedent):
+                if index == 0:
+                    current = degrees[condition]
+                elif connector == "AND":
+                    current = self._and_gradient(*current, *degrees[condition])
+                elif connector == "OR":
+                    current = self._or_gradient(*current, *degrees[condition])
+                else:
+                    raise ValueError(f"Unsupported connector: {connector}")
+                connector = next_connector
+            antecedent_activations.append(current)
+
+        rules = []
+        for antecedent, weight, _ in compiled.rules:
+            activation, gradient = antecedent_activations[antecedent]
+            rules.append((activation, gradient) if weight == 1.0 else (activation * weight, gradient * weight))
+        return rules
+
+    def _centroid_gradient(self, var_name: str, terms: List[Tuple[str, np.ndarray, np.ndarray]],
+                           inputs: int, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Centroid of the aggregated (label, activation, gradient) terms and its gradient"""
+        grid = self._grids[var_name]
+        sets = self._output_sets[var_name]
+
+        envelope = np.zeros((size, grid.size))
+        # Term whose implied set is the envelope at each grid point, for max aggregation
+        winner = np.full((size, grid.size), -1)
+        for k, (label, activation, _) in enumerate(terms):
+            implied = self._implication(activation[:, None], sets[label][None, :])
+            if self._max_aggregation:
+                above = implied > envelope
+                envelope[above] = implied[above]
+                winner[above] = k
+            else:
+                envelope += implied
+
+        area = envelope.sum(axis=1)
+        centroid = np.divide(envelope @ grid, area, out=np.zeros(size), where=area > 0)
+        # d centroid / d envelope at each grid point
+        pull = np.divide(grid[None, :] - centroid[:, None], area[:, None],
+                         out=np.zeros((size, grid.size)), where=area[:, None] > 0)
+
+        gradient = np.zeros((inputs, size))
+        for k, (label, activation, activation_gradient) in enumerate(terms):
+            degrees = sets[label][None, :]
+            # d implied / d activation: 1 where the activation clips the set, the set itself when scaling
+            slope = (activation[:, None] < degrees) if self._clipping else np.broadcast_to(degrees, pull.shape)
+            if self._max_aggregation:
+                slope = slope & (winner == k) if self._clipping else np.where(winner == k, slope, 0.0)
+            gradient += activation_gradient * np.einsum("ij,ij->i", slope, pull)
+        return centroid, gradient
+
+    def _jacobian_chunk(self, inputs: Dict[str, np.ndarray], names: List[str],
+                        size: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        rules = self._rule_gradients(inputs, names, size)
+
+        if self._closed_form:
+            # Centroid of scaled sets is sum(a * moment) / sum(a * area)
+            results = {}
+            for var_name in self.output_variables:
+                terms = [(activation, gradient, self._set_moments[var_name][label])
+                         for (_, _, consequents), (activation, gradient) in zip(self._compiled.rules, rules)
+                         for name, label, _ in consequents if name == var_name]
+                area = sum((activation * set_area for activation, _, (set_area, _) in terms), np.zeros(size))
+                moment = sum((activation * set_moment for activation, _, (_, set_moment) in terms), np.zeros(size))
+                centroid = np.divide(moment, area, out=np.zeros(size), where=area > 0)
+                gradient = np.zeros((len(names), size))
+                for _, activation_gradient, (set_area, set_moment) in terms:
+                    gradient += activation_gradient * np.divide(set_moment - centroid * set_area, area,
+                                                                out=np.zeros(size), where=area > 0)
+                results[var_name] = (centroid, gradient)
+            return results
+
+        terms: Dict[str, list] = {name: [] for name in self.output_variables}
+        if self._max_aggregation:
+            # Max over rules of the implied sets equals implying the largest activation per label
+            label_activations: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+            for (_, _, consequents), rule in zip(self._compiled.rules, rules):
+                for var_name, label, _ in consequents:
+                    current = label_activations.get((var_name, label))
+                    label_activations[(var_name, label)] = rule if current is None else _maximum_gradient(*current, *rule)
+            for (var_name, label), (activation, gradient) in label_activations.items():
+                terms[var_name].append((label, activation, gradient))
+        else:
+            for (_, _, consequents), (activation, gradient) in zip(self._compiled.rules, rules):
+                for var_name, label, _ in consequents:
+                    terms[var_name].append((label, activation, gradient))
+
+        return {name: self._centroid_gradient(name, terms[name], len(names), size) for name in self.output_variables}
+
+    def jacobian(self, inputs: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], Dict[str, Dict[str, np.ndarray]]]:
+        """
+        Outputs for equally sized input arrays, and jacobian[output][input], the array of
+        d output / d input at every sample, for every input given
+        """
+        arrays, size = self._prepare(inputs)
+        names = list(arrays)
+
+        outputs = {name: np.empty(size) for name in self.output_variables}
+        gradients = {name: np.empty((len(names), size)) for name in self.output_variables}
+        for start in range(0, size, self.chunk_size):
+            stop = min(start + self.chunk_size, size)
+            chunk = {name: array[start:stop] for name, array in arrays.items()}
+            for name, (values, gradient) in self._jacobian_chunk(chunk, names, stop - start).items():
+                outputs[name][start:stop] = values
+                gradients[name][:, start:stop] = gradient
+        jacobian = {
+            output: {name: gradients[output][i] for i, name in enumerate(names)}
+            for output in self.output_variables
+        }
+        return outputs, jacobian
+
+    def linearize(self, point: Dict[str, float]) -> Tuple[Dict[str, float], Dict[str, Dict[str, float]]]:
+        """Outputs and jacobian[output][input] at a single operating point"""
+        outputs, jacobian = self.jacobian({name: [value] for name, value in point.items()})
+        return (
+            {name: float(values[0]) for name, values in outputs.items()},
+            {output: {name: float(values[0]) for name, values in row.items()} for output, row in jacobian.items()},
+        )
@@ -0,0 +1,120 @@
+"""
+src/serialization.py
+
+Save and load fuzzy inference systems as JSON
+"""
+import json
+from typing import Dict
+from src.fis import FuzzyInferenceSystem
+from src.linguisticVariable import LinguisticVariable
+from src.membershipFunction import MembershipFunctionFactory
+from src.rule import FuzzyRule
+from src.trapMemFn import TrapMemFn
+from src.triMemFn import TriMemFn
+from src.piecewiseLinearMemFn import PiecewiseLinearMemFn
+from src.gaussianMemFn import GaussianMemFn
+from src.bellMemFn import BellMemFn
+from src.sigmoidMemFn import SigmoidMemFn
+
+FORMAT_VERSION = 1
+
+def _membership_function_to_dict(mem_fn) -> Dict:
+    # Subclasses of PiecewiseLinearMemFn are checked before the general shape
+    if isinstance(mem_fn, TriMemFn):
+        return {"type": "triangular", "label": mem_fn.label, "points": list(mem_fn.x_coordinates)}
+    if isinstance(mem_fn, TrapMemFn):
+        return {"type": "trapezoidal", "label": mem_fn.label, "points": list(mem_fn.x_coordinates)}
+    if isinstance(mem_fn, PiecewiseLinearMemFn):
+        return {"type": "piecewise_linear", "label": mem_fn.label,
+                "points": list(mem_fn.x_coordinates), "degrees": list(mem_fn.y_coordinates)}
+    if isinstance(mem_fn, GaussianMemFn):
+        return {"type": "gaussian", "label": mem_fn.label, "mean": mem_fn.mean, "sigma": mem_fn.sigma}
+    if isinstance(mem_fn, BellMemFn):
+        return {"type": "bell", "label": mem_fn.label, "center": mem_fn.center,
+                "width": mem_fn.width, "slope": mem_fn.slope}
+    if isinstance(mem_fn, SigmoidMemFn):
+        return {"type": "sigmoid", "label": mem_fn.label, "center": mem_fn.center, "slope": mem_fn.slope}
+    raise ValueError(f"Cannot serialize membership function of type {type(mem_fn).__name__}")
+
+
+def _membership_function_from_dict(data: Dict):
+    kind, label = data["type"], data["label"]
+    if kind == "triangular":
+        return MembershipFunctionFactory.create_triangular(label, data["points"])
+    if kind == "trapezoidal":
+        return MembershipFunctionFactory.create_trapezoidal(label, data["points"])
+    if kind == "piecewise_linear":
+        return MembershipFunctionFactory.create_piecewise_linear(label, data["points"], data["degrees"])
+    if kind == "gaussian":
+        return MembershipFunctionFactory.create_gaussian(label, data["mean"], data["sigma"])
+    if kind == "bell":
+        return MembershipFunctionFactory.create_bell(label, data["center"], data["width"], data["slope"])
+    if kind == "sigmoid":
+        return MembershipFunctionFactory.create_sigmoid(label, data["center"], data["slope"])
+    raise ValueError(f"Unknown membership function type: {kind}")
+
+
+def _variable_to_dict(variable: LinguisticVariable) -> Dict:
+    return {
+        "name": variable.name,
+        "range": list(variable.range),
+        "membership_functions": [
+            _membership_function_to_dict(mem_fn) for mem_fn in variable.membership_functions.values()
+        ],
+    }
+
+
+def _variable_from_dict(data: Dict) -> LinguisticVariable:
+    variable = LinguisticVariable(data["name"], list(data["range"]))
+    for mem_fn in data["membership_functions"]:
+        variable.add_membership_function(_membership_function_from_dict(mem_fn))
+    return variable
+
+
+def fis_to_dict(fis: FuzzyInferenceSystem) -> Dict:
+    """Describe variables, membership functions and rules as plain JSON types"""
+    return {
+        "version": FORMAT_VERSION,
+        "operators": fis.operators.to_dict(),
+        "inputs": [_variable_to_dict(variable) for variable in fis.input_variables.values()],
+        "outputs": [_variable_to_dict(variable) for variable in fis.output_variables.values()],
+        "rules": [
+            {
+                "antecedents": [list(antecedent) for antecedent in rule.antecedents],
+                "consequents": [list(consequent) for consequent in rule.consequents],
+                "weight": rule.weight,
+            }
+            for rule in fis.rules
+        ],
+    }
+
+
+def fis_from_dict(data: Dict) -> FuzzyInferenceSystem:
+    """Rebuild a FuzzyInferenceSystem from fis_to_dict output"""
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version: {data.get('version')}")
+
+    # Files written before operator families existed use the defaults
+    fis = FuzzyInferenceSystem(**data.get("operators", {}))
+    for variable in data["inputs"]:
+        fis.add_input_variable(_variable_from_dict(variable))
+    for variable in data["outputs"]:
+        fis.add_output_variable(_variable_from_dict(variable))
+    for rule in data["rules"]:
+        antecedents = [tuple(antecedent) for antecedent in rule["antecedents"]]
+        # Single "consequent" entries come from files written before multi-consequent rules
+        consequents = [tuple(consequent) for consequent in rule.get("consequents", [rule.get("consequent")])]
+        fis.add_rule(FuzzyRule(antecedents, consequents, rule.get("weight", 1.0)))
+    return fis
+
+
+def save_fis(fis: FuzzyInferenceSystem, path: str):
+    """Write `fis` to a JSON model file"""
+    with open(path, "w") as f:
+        json.dump(fis_to_dict(fis), f, indent=2)
+
+
+def load_fis(path: str) -> FuzzyInferenceSystem:
+    """Read a FuzzyInferenceSystem from a JSON model file"""
+    with open(path) as f:
+        return fis_from_dict(json.load(f))
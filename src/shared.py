@@ -0,0 +1,205 @@
+"""
+src/shared.py
+
+Compiled model tables published once in shared memory and attached read-only by worker processes
+"""
+from __future__ import annotations
+import atexit
+import os
+import sys
+import weakref
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.jit import FLOAT_TABLES, JitInferenceEngine, TableKernelRunner, _infer_kernel, _numba_kernel, \
+    _scratch_buffers, numba_available
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Table offsets are multiples of this, so every view is aligned for its dtype
+ALIGNMENT = 64
+
+# Models published by this process, by segment name
+_published: Dict[str, "SharedModel"] = {}
+# Engines attached in this process, by segment name
+_attached: Dict[str, "SharedInferenceEngine"] = {}
+
+
+@dataclass(frozen=True)
+class SharedModelHandle:
+    """Picklable description of a published model: where each table lives in the segment"""
+    name: str
+    size: int
+    layout: Tuple[Tuple[int, int], ...]  # (byte offset, length) per table, in kernel argument order
+    input_names: Tuple[str, ...]
+    output_names: Tuple[str, ...]
+    required: Tuple[str, ...]
+    resolution: int
+    scratch_sizes: Tuple[int, ...]
+
+    def engine(self, backend: str = "auto") -> "SharedInferenceEngine":
+        """Engine over this model, attached on the first call in each process and reused after"""
+        engine = _attached.get(self.name)
+        if engine is None:
+            engine = _attached[self.name] = SharedInferenceEngine(self, backend)
+        return engine
+
+
+def _open_segment(name: str, size: int = 0, create: bool = False):
+    from multiprocessing import shared_memory
+    if create:
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    segment = shared_memory.SharedMemory(name=name)
+    import multiprocessing
+    if multiprocessing.parent_process() is None:
+        # A process started outside multiprocessing has its own resource tracker, which
+        # would unlink the segment when this process exits. Pool workers share the
+        # publisher's tracker, where the name is already registered.
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _release(segment, name: str, owner: int):
+    """Unmap and unlink a published segment, at close(), garbage collection or exit"""
+    if os.getpid() != owner:
+        return  # forked child that inherited the publisher's objects
+    _published.pop(name, None)
+    engine = _attached.pop(name, None)
+    if engine is not None:
+        engine._tables = None
+    try:
+        segment.close()
+    except BufferError:
+        pass  # views still referenced in this process, the mapping goes with the process
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedModel:
+    def __init__(self, model, resolution: int = 201, name: Optional[str] = None):
+        """
+        Publish the flat tables of `model` (a FuzzyInferenceSystem or JitInferenceEngine)
+        in one shared memory segment. Pass `handle` to the workers, e.g. as a Pool
+        initializer argument or with each task; `handle.engine()` maps the tables
+        read-only without copying them and without building the system again.
+
+        The segment is unlinked by close(), on leaving a `with` block, when this object
+        is garbage collected or when the interpreter exits. If the publishing process is
+        killed, the multiprocessing resource tracker unlinks it. The published tables are
+        a snapshot: publish again after changing the system.
+        """
+        engine = model if isinstance(model, JitInferenceEngine) else JitInferenceEngine(model, resolution, "python")
+        tables = engine.table_arrays()
+
+        layout = []
+        offset = 0
+        for table in tables:
+            layout.append((offset, table.size))
+            offset += -(-table.nbytes // ALIGNMENT) * ALIGNMENT
+        size = max(offset, 1)
+
+        self._segment = _open_segment(name, size, create=True)
+        self.name = self._segment.name
+        for table, (start, length) in zip(tables, layout):
+            np.ndarray(length, dtype=table.dtype, buffer=self._segment.buf, offset=start)[:] = table
+
+        self.handle = SharedModelHandle(
+            name=self.name,
+            size=size,
+            layout=tuple(layout),
+            input_names=tuple(engine.input_names),
+            output_names=tuple(engine.output_names),
+            required=tuple(sorted(engine._required)),
+            resolution=engine.resolution,
+            scratch_sizes=tuple(engine._scratch_sizes),
+        )
+        _published[self.name] = self
+        self._finalizer = weakref.finalize(self, _release, self._segment, self.name, os.getpid())
+
+    @property
+    def nbytes(self) -> int:
+        return self.handle.size
+
+    def close(self):
+        """Unlink the segment. Workers that already attached keep their mapping until they exit"""
+        self._finalizer()
+
+    def __enter__(self) -> "SharedModel":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedInferenceEngine(TableKernelRunner):
+    def __init__(self, handle: SharedModelHandle, backend: str = "auto"):
+        """
+        JitInferenceEngine over tables in a published segment. The kernel reads the
+        shared pages directly through read-only views (NumPy arrays for Numba,
+        memoryviews for the Python kernel); only the scratch buffers are private to the
+        process. Use handle.engine() to attach once per process.
+        """
+        if backend == "auto":
+            backend = "numba" if numba_available() else "python"
+        if backend not in ("numba", "python"):
+            raise ValueError(f"Unknown backend '{backend}', expected one of: auto, numba, python")
+        if backend == "numba" and not numba_available():
+            raise ImportError("The numba backend requires Numba to be installed")
+
+        self.handle = handle
+        self.backend = backend
+        self.resolution = handle.resolution
+        self.input_names: List[str] = list(handle.input_names)
+        self.output_names: List[str] = list(handle.output_names)
+        self._required = set(handle.required)
+
+        publisher = _published.get(handle.name)
+        # The publishing process reads its own mapping
+        self._segment = publisher._segment if publisher is not None else _open_segment(handle.name)
+        self._tables = []
+        for position, (offset, length) in enumerate(handle.layout):
+            if backend == "numba":
+                dtype = np.float64 if position in FLOAT_TABLES else np.int64
+                view = np.ndarray(length, dtype=dtype, buffer=self._segment.buf, offset=offset)
+                view.flags.writeable = False
+            else:
+                # Memoryviews index to Python floats and ints, as the lists of JitInferenceEngine do
+                view = self._segment.buf[offset:offset + 8 * length].toreadonly().cast(
+                    "d" if position in FLOAT_TABLES else "q")
+            self._tables.append(view)
+        self._scratch = _scratch_buffers(list(handle.scratch_sizes), backend)
+        self._kernel = _numba_kernel() if backend == "numba" else _infer_kernel
+        if publisher is None:
+            # Unmap before interpreter teardown, which would try with the views still alive
+            atexit.register(self.detach)
+
+    def infer(self, inputs: Dict[str, float]) -> Dict[str, float]:
+        """Defuzzified outputs for a single sample"""
+        self._check_attached()
+        return self._infer_row(inputs)
+
+    def infer_batch(self, inputs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Defuzzified outputs for equally sized input arrays, one kernel call for all samples"""
+        self._check_attached()
+        return self._infer_arrays(inputs)
+
+    def _check_attached(self):
+        if self._tables is None:
+            raise ValueError(f"Shared model '{self.handle.name}' was closed")
+
+    def detach(self):
+        """Drop the views and unmap the segment in this process"""
+        if _attached.get(self.handle.name) is self:
+            del _attached[self.handle.name]
+        self._tables = None
+        if self.handle.name not in _published:
+            try:
+                self._segment.close()
+            except BufferError:
+                pass  # arrays still referenced by the caller, unmapped at exit
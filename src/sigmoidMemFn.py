@@ -0,0 +1,37 @@
+"""
+src/sigmoidMemFn.py
+
+Sigmoid Membership Function: 1 / (1 + exp(-slope * (x - center)))
+Opens to the right for a positive slope and to the left for a negative one.
+"""
+from __future__ import annotations
+import math
+from src.parametricMemFn import ParametricMemFn, SUPPORT_EPSILON
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+class SigmoidMemFn(ParametricMemFn):
+    def __init__(self, label: str, center: float, slope: float):
+        assert slope != 0
+
+        self.center = center
+        self.slope = slope
+        edge = center - math.log(1 / SUPPORT_EPSILON - 1) / slope
+        support = (edge, float("inf")) if slope > 0 else (-float("inf"), edge)
+        super().__init__(label, [center, slope], support)
+
+    def _scalar(self, x: float) -> float:
+        z = -self.slope * (x - self.center)
+        # Avoid overflow in exp for points far on the closed side
+        if z > 700:
+            return 0.0
+        return 1 / (1 + math.exp(z))
+
+    def _evaluate(self, x: np.ndarray) -> np.ndarray:
+        z = np.minimum(-self.slope * (x - self.center), 700)
+        return 1 / (1 + np.exp(z))
+
+    def _derivative(self, x: np.ndarray) -> np.ndarray:
+        degrees = self._evaluate(x)
+        return self.slope * degrees * (1 - degrees)
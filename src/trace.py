@@ -0,0 +1,65 @@
+"""
+src/trace.py
+
+Record of one inference pass: memberships, rule activations, implied sets and centroids
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from utils.line import Point
+
+@dataclass
+class RuleTrace:
+    index: int  # position in fis.rules
+    activation: float  # after the rule weight
+    consequents: List[Tuple[str, str, str]]
+
+
+@dataclass
+class ImpliedSet:
+    rule: int
+    label: str
+    activation: float
+    points: List[Point]  # consequent set clipped or scaled by the activation
+
+
+@dataclass
+class OutputTrace:
+    variable: str
+    implied: List[ImpliedSet] = field(default_factory=list)
+    envelope: List[Point] = field(default_factory=list)  # aggregated set the centroid is taken of
+    centroid: float = 0.0
+
+
+@dataclass
+class InferenceTrace:
+    inputs: Dict[str, float]
+    # (variable, label, operator) -> degree of every condition used by a rule
+    memberships: Dict[Tuple[str, str, str], float] = field(default_factory=dict)
+    rules: List[RuleTrace] = field(default_factory=list)
+    outputs: Dict[str, OutputTrace] = field(default_factory=dict)
+
+    @property
+    def result(self) -> Dict[str, float]:
+        return {name: output.centroid for name, output in self.outputs.items()}
+
+    def to_dict(self) -> Dict:
+        """Plain JSON types for audit logs"""
+        return {
+            "inputs": dict(self.inputs),
+            "memberships": [
+                {"variable": var_name, "label": label, "operator": operator, "degree": degree}
+                for (var_name, label, operator), degree in self.memberships.items()
+            ],
+            "rules": [{"index": rule.index, "activation": rule.activation} for rule in self.rules],
+            "outputs": {
+                name: {
+                    "centroid": output.centroid,
+                    "implied": [
+                        {"rule": implied.rule, "label": implied.label, "activation": implied.activation}
+                        for implied in output.implied
+                    ],
+                    "envelope": [[point.x, point.y] for point in output.envelope],
+                }
+                for name, output in self.outputs.items()
+            },
+        }
@@ -0,0 +1,236 @@
+"""
+src/tuning.py
+
+Membership function breakpoint tuning with differential evolution
+"""
+from __future__ import annotations
+import copy
+import math
+import time
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+from src.batch import BatchInferenceEngine
+from src.piecewiseLinearMemFn import PiecewiseLinearMemFn
+from utils.lazy import lazy_import
+from utils.line import roundArray
+
+np = lazy_import("numpy")
+
+class MembershipParameters:
+    def __init__(self, fis, variables: Optional[List[str]] = None):
+        """
+        Flatten the x-coordinates of every piecewise-linear membership function of the
+        selected variables (all inputs and outputs by default) into one bounded vector.
+        Bounds are the range of the owning linguistic variable, narrowed to the 0.01
+        grid that repair() snaps to. Functions whose points all coincide have no shape
+        to tune and are left out.
+        """
+        all_variables = {**fis.input_variables, **fis.output_variables}
+        if variables is None:
+            variables = list(all_variables)
+
+        # (variable name, label, start, stop) for each membership function in the vector
+        self.groups: List[Tuple[str, str, int, int]] = []
+        lower, upper, values = [], [], []
+        for var_name in variables:
+            if var_name not in all_variables:
+                raise ValueError(f"Linguistic variable '{var_name}' not found")
+            variable = all_variables[var_name]
+            for label, mem_fn in variable.membership_functions.items():
+                if not isinstance(mem_fn, PiecewiseLinearMemFn):
+                    continue
+                if mem_fn.x_coordinates[0] == mem_fn.x_coordinates[-1]:
+                    continue
+                start = len(values)
+                values.extend(mem_fn.x_coordinates)
+                low = math.ceil(round(variable.range[0] * 100, 6)) / 100
+                high = math.floor(round(variable.range[1] * 100, 6)) / 100
+                lower.extend([round(low, 2)] * len(mem_fn.x_coordinates))
+                upper.extend([round(high, 2)] * len(mem_fn.x_coordinates))
+                self.groups.append((var_name, label, start, len(values)))
+
+        self.initial = np.array(values, dtype=float)
+        self.lower = np.array(lower, dtype=float)
+        self.upper = np.array(upper, dtype=float)
+
+    def __len__(self) -> int:
+        return self.initial.size
+
+    def repair(self, vector: np.ndarray, grid: bool = True) -> np.ndarray:
+        """
+        Snap to the 0.01 grid of utils/line.py, which the polygon path of infer needs
+        for its point ordering, clip to the bounds and sort each function's points.
+        Gradient steps pass `grid=False` so small updates are not rounded away.
+        """
+        vector = np.asarray(vector, dtype=float)
+        vector = np.clip(roundArray(vector) if grid else vector, self.lower, self.upper)
+        for _, _, start, stop in self.groups:
+            vector[start:stop] = np.sort(vector[start:stop])
+        return vector
+
+    def degenerate(self, vector: np.ndarray) -> bool:
+        """Whether some function collapsed to a single point, which infer cannot integrate"""
+        return any(vector[start] >= vector[stop - 1] for _, _, start, stop in self.groups)
+
+    def apply(self, fis, vector: np.ndarray):
+        """Return a copy of `fis` with its membership functions rebuilt from `vector`"""
+        tuned = copy.deepcopy(fis)
+        all_variables = {**tuned.input_variables, **tuned.output_variables}
+        for var_name, label, start, stop in self.groups:
+            variable = all_variables[var_name]
+            mem_fn = variable.membership_functions[label]
+            points = [float(x) for x in vector[start:stop]]
+            variable.add_membership_function(mem_fn.withXCoordinates(points))
+        return tuned
+
+
+@dataclass
+class TuningResult:
+    fis: object
+    parameters: np.ndarray
+    loss: float
+    initial_loss: float
+    batch_loss: float = 0.0  # loss of the batch engine the search minimised, see fit()
+    history: List[float] = field(default_factory=list)  # best batch loss after each generation
+    evaluations: int = 0
+    wall_time: float = 0.0
+
+
+# Per-process state so the dataset is shipped to each worker once, not per candidate
+_worker_state = None
+
+
+def _init_worker(fis, parameters, inputs, targets, resolution):
+    global _worker_state
+    _worker_state = (fis, parameters, inputs, targets, resolution)
+
+
+def _evaluate_candidate(vector: np.ndarray) -> float:
+    fis, parameters, inputs, targets, resolution = _worker_state
+    if parameters.degenerate(vector):
+        return float("inf")
+    engine = BatchInferenceEngine(parameters.apply(fis, vector), resolution)
+    outputs = engine.infer(inputs)
+    return float(np.mean([np.mean((outputs[name] - target) ** 2) for name, target in targets.items()]))
+
+
+class MembershipTuner:
+    def __init__(self, fis, inputs: Dict[str, np.ndarray], targets: Dict[str, np.ndarray],
+                 variables: Optional[List[str]] = None, resolution: int = 101,
+                 processes: Optional[int] = None):
+        """
+        Fit membership breakpoints of `fis` to (inputs, targets) by minimising the mean
+        squared error of the batched inference outputs. `processes=1` evaluates in this process.
+        The batch engine only approximates infer for the default min/max operators (see
+        BatchInferenceEngine), so the result is scored again with infer.
+        """
+        for var_name in targets:
+            if var_name not in fis.output_variables:
+                raise ValueError(f"Output variable '{var_name}' not defined")
+
+        self.fis = fis
+        self.inputs = {name: np.asarray(values, dtype=float) for name, values in inputs.items()}
+        self.targets = {name: np.asarray(values, dtype=float) for name, values in targets.items()}
+        self.parameters = MembershipParameters(fis, variables)
+        self.resolution = resolution
+        self.processes = processes
+
+    def _infer_loss(self, fis, samples: Optional[int]) -> float:
+        """Mean squared error of fis.infer, on every `size // samples`-th row when limited"""
+        size = len(next(iter(self.inputs.values())))
+        step = 1 if samples is None else max(1, size // samples)
+        errors = {name: [] for name in self.targets}
+        for i in range(0, size, step):
+            outputs = fis.infer({name: float(values[i]) for name, values in self.inputs.items()})
+            for name, target in self.targets.items():
+                errors[name].append((outputs[name] - target[i]) ** 2)
+        return float(np.mean([np.mean(values) for values in errors.values()]))
+
+    def fit(self, generations: int = 50, population_size: Optional[int] = None,
+            mutation: float = 0.7, crossover: float = 0.9, tol: float = 1e-8,
+            seed: Optional[int] = None, infer_samples: Optional[int] = None) -> TuningResult:
+        """
+        Run DE/rand/1/bin on the batch loss, then score the best candidate and the
+        initial system with fis.infer on the data (every row, or about `infer_samples`
+        evenly spaced rows). `loss` and `initial_loss` are those infer losses, and the
+        initial system is returned unchanged if the candidate does worse under infer.
+        """
+        start_time = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        params = self.parameters
+        dimensions = len(params)
+        if population_size is None:
+            population_size = max(10, 5 * dimensions)
+
+        # Seed the population with the current breakpoints, kept exactly as they are
+        population = rng.uniform(params.lower, params.upper, (population_size, dimensions))
+        population = np.array([params.repair(candidate) for candidate in population])
+        population[0] = params.initial
+
+        state = (self.fis, params, self.inputs, self.targets, self.resolution)
+        pool = None
+        if self.processes != 1:
+            pool = Pool(self.processes, initializer=_init_worker, initargs=state)
+        else:
+            _init_worker(*state)
+
+        def evaluate(candidates):
+            if pool is None:
+                return np.array([_evaluate_candidate(candidate) for candidate in candidates])
+            return np.array(pool.map(_evaluate_candidate, list(candidates)))
+
+        try:
+            losses = evaluate(population)
+            evaluations = population_size
+            initial_batch_loss = float(losses[0])
+            history = []
+
+            for _ in range(generations):
+                # Mutation from three distinct members other than the target
+                indices = np.array([
+                    rng.choice(np.delete(np.arange(population_size), i), 3, replace=False)
+                    for i in range(population_size)
+                ])
+                a, b, c = population[indices[:, 0]], population[indices[:, 1]], population[indices[:, 2]]
+                mutants = a + mutation * (b - c)
+
+                # Binomial crossover with at least one gene from the mutant
+                cross = rng.random((population_size, dimensions)) < crossover
+                cross[np.arange(population_size), rng.integers(0, dimensions, population_size)] = True
+                trials = np.where(cross, mutants, population)
+                trials = np.array([params.repair(trial) for trial in trials])
+
+                trial_losses = evaluate(trials)
+                evaluations += population_size
+
+                improved = trial_losses <= losses
+                population[improved] = trials[improved]
+                losses[improved] = trial_losses[improved]
+                history.append(float(losses.min()))
+
+                if losses.max() - losses.min() <= tol * max(abs(losses.min()), 1.0):
+                    break
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        best = int(np.argmin(losses))
+        fis, parameters = params.apply(self.fis, population[best]), population[best]
+        batch_loss = float(losses[best])
+        loss = self._infer_loss(fis, infer_samples)
+        initial_loss = self._infer_loss(self.fis, infer_samples)
+        if loss > initial_loss:
+            fis, parameters = copy.deepcopy(self.fis), params.initial.copy()
+            batch_loss, loss = initial_batch_loss, initial_loss
+        return TuningResult(
+            fis=fis,
+            parameters=parameters,
+            loss=loss,
+            initial_loss=initial_loss,
+            batch_loss=batch_loss,
+            history=history,
+            evaluations=evaluations,
+            wall_time=time.perf_counter() - start_time,
+        )
@@ -0,0 +1,32 @@
+"""
+utils/lazy.py
+
+Deferred imports for heavy optional dependencies (NumPy, OpenCV, matplotlib)
+"""
+import importlib
+
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+
+    def _load(self):
+        return importlib.import_module(self._name)
+
+    def __getattr__(self, attr: str):
+        if attr == "_name":
+            raise AttributeError(attr)
+        # Only reached for attributes not cached yet, the import happens on first use
+        value = getattr(self._load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a stand-in for module `name` that imports it on first attribute access"""
+    return LazyModule(name)
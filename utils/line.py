@@ -5,6 +5,9 @@ Line class
 """
 from dataclasses import dataclass
 from typing import Optional
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
 
 @dataclass
 class Point:
@@ -83,4 +86,17 @@ def calculateIntersection_unextended(line1: Line, line2: Line) -> Optional[Point
                 (max(line2.end.y, line2.start.y) >= intersection.y >= min(line2.end.y, line2.start.y))\
                 ):
             intersection = None
-    return intersection
\ No newline at end of file
+    return intersection
+
+def roundArray(values, ndigits: int = 2):
+    """
+    Round a NumPy array exactly like the builtin round() used by Line.
+    np.round scales by 10**ndigits first, which disagrees on values sitting near a
+    half, so those few elements are rounded by the builtin instead.
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * 10**ndigits
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(value, ndigits) for value in values[ties].tolist()]
+    return rounded
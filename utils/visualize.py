@@ -1,12 +1,12 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from .line import Point
-from .polygon import Polygon, combinePolygons
-import numpy as np
-from matplotlib.patches import Polygon as MplPolygon
-from matplotlib.collections import PatchCollection
-import matplotlib.cm as cm
-from matplotlib.gridspec import GridSpec
+from .polygon import Polygon
+from .lazy import lazy_import
+
+plt = lazy_import("matplotlib.pyplot")
+patches = lazy_import("matplotlib.patches")
+collections = lazy_import("matplotlib.collections")
+cm = lazy_import("matplotlib.cm")
+np = lazy_import("numpy")
 
 
 def plot_polygon_with_centroid(poly:Polygon, centroid: Point ):
@@ -37,7 +37,7 @@ def visualize_membership_functions(linguistic_variable, input_value=None):
     
     # Plot each membership function
     for label, mem_fn in linguistic_variable.membership_functions.items():
-        y = [mem_fn.calculateMembershipDegree(val) for val in x]
+        y = mem_fn.degrees(x)
         plt.plot(x, y, label=label)
         
         # If an input value is provided, plot the membership degree
@@ -62,10 +62,14 @@ def visualize_membership_functions(linguistic_variable, input_value=None):
     
     return plt
 
-def visualize_rule_activation(fis, inputs):
+def visualize_rule_activation(fis, inputs, trace=None):
     """
     Visualize the rule activation and the resulting output fuzzy sets
+    Pass the InferenceTrace of an earlier infer(inputs, trace=True) to reuse it
     """
+    if trace is None:
+        _, trace = fis.infer(inputs, trace=True)
+
     plt.figure(figsize=(12, 8))
     
     # Number of rules
@@ -73,6 +77,7 @@ def visualize_rule_activation(fis, inputs):
     
     # Create a color map for the rules
     colors = cm.rainbow(np.linspace(0, 1, num_rules))
+    rule_activations = [rule.activation for rule in trace.rules]
     
     # For each output variable
     for var_name, output_var in fis.output_variables.items():
@@ -80,49 +85,26 @@ def visualize_rule_activation(fis, inputs):
         x_min, x_max = output_var.range
         x = np.linspace(x_min, x_max, 1000)
         
-        # Dictionary to store the activated output membership functions
-        activated_mem_fns = {}
-        rule_activations = []
-        
-        # For each rule, calculate the activation and plot the activated membership function
-        for i, rule in enumerate(fis.rules):
-            # Calculate rule activation
-            activation = rule.evaluate(inputs, fis.input_variables)
-            rule_activations.append(activation)
-            
-            # Get the consequent membership function
-            consequent_var_name, consequent_label, _ = rule.consequent
-            if consequent_var_name == var_name:
-                mem_fn = output_var.membership_functions[consequent_label]
-                
-                # Generate the activated membership function (clipped or scaled)
-                if activation > 0:
-                    portion_points = mem_fn.generatePortionPoints(activation)
-                    
-                    # Store the activated membership function
-                    if consequent_label not in activated_mem_fns:
-                        activated_mem_fns[consequent_label] = []
-                    activated_mem_fns[consequent_label].append((portion_points, activation, i))
-        
         # Plot the original membership functions
         for label, mem_fn in output_var.membership_functions.items():
-            y = [mem_fn.calculateMembershipDegree(val) for val in x]
+            y = mem_fn.degrees(x)
             plt.plot(x, y, '--', label=f'{label} (original)', alpha=0.5)
         
-        # Plot the activated membership functions
+        # Plot the implied (clipped or scaled) sets of the rules that fired
         activated_polygons = []
-        for label, activations in activated_mem_fns.items():
-            for portion_points, activation, rule_idx in activations:
-                # Convert to numpy array for plotting
-                xy = np.array([(p.x, p.y) for p in portion_points])
-                poly = MplPolygon(xy, closed=True, alpha=0.5, facecolor=colors[rule_idx])
-                activated_polygons.append(poly)
-                plt.text(np.mean(xy[:, 0]), 0.1 + rule_idx * 0.1, 
-                         f'Rule {rule_idx+1}: {activation:.2f}', 
-                         ha='center', color=colors[rule_idx])
+        for implied in trace.outputs[var_name].implied:
+            if implied.activation <= 0 or not implied.points:
+                continue
+            rule_idx = implied.rule
+            xy = np.array([(p.x, p.y) for p in implied.points])
+            poly = patches.Polygon(xy, closed=True, alpha=0.5, facecolor=colors[rule_idx])
+            activated_polygons.append(poly)
+            plt.text(np.mean(xy[:, 0]), 0.1 + rule_idx * 0.1, 
+                     f'Rule {rule_idx+1}: {implied.activation:.2f}', 
+                     ha='center', color=colors[rule_idx])
         
         # Add the activated polygons to the plot
-        p = PatchCollection(activated_polygons, match_original=True)
+        p = collections.PatchCollection(activated_polygons, match_original=True)
         plt.gca().add_collection(p)
     
     plt.grid(True)
@@ -134,55 +116,24 @@ def visualize_rule_activation(fis, inputs):
     
     return plt, rule_activations
 
-def visualize_defuzzification(fis, inputs):
+def visualize_defuzzification(fis, inputs, trace=None):
     """
     Visualize the defuzzification process with the aggregated output
+    Pass the InferenceTrace of an earlier infer(inputs, trace=True) to reuse it
     """
+    if trace is None:
+        _, trace = fis.infer(inputs, trace=True)
+
     plt.figure(figsize=(12, 8))
     
-    # Initialize output aggregation
-    output_aggregations = {}
-    for var_name, variable in fis.output_variables.items():
-        output_aggregations[var_name] = {}
-    
-    # Evaluate rules
-    for rule in fis.rules:
-        # Calculate rule activation
-        activation = rule.evaluate(inputs, fis.input_variables)
-        
-        # Apply activation to consequent
-        var_name, label, operator = rule.consequent
-        
-        if operator == "is":
-            mem_fn = fis.output_variables[var_name].membership_functions[label]
-            portion_points = mem_fn.generatePortionPoints(activation)
-            
-            # Store points for aggregation
-            if label not in output_aggregations[var_name]:
-                output_aggregations[var_name][label] = portion_points
-            else:
-                # Aggregate using max
-                current_polygon = Polygon(output_aggregations[var_name][label])
-                new_polygon = Polygon(portion_points)
-                combined = combinePolygons(current_polygon, new_polygon)
-                output_aggregations[var_name][label] = combined.points
-    
-    # Plot the aggregated output and defuzzified value
-    for var_name, aggregation in output_aggregations.items():
-        # Get the range of the output variable
-        x_min, x_max = fis.output_variables[var_name].range
-        x = np.linspace(x_min, x_max, 1000)
-        
-        # For each aggregated label
-        for label, points in aggregation.items():
-            # Convert to numpy array for plotting
-            xy = np.array([(p.x, p.y) for p in points])
-            plt.fill(xy[:, 0], xy[:, 1], alpha=0.3, label=f'{label} (activated)')
-        
-        # Calculate the defuzzified value
-        defuzzified_value = fis.infer(inputs)[var_name]
+    for var_name, output in trace.outputs.items():
+        # Aggregated set the centroid was taken of
+        if output.envelope:
+            xy = np.array([(p.x, p.y) for p in output.envelope])
+            plt.fill(xy[:, 0], xy[:, 1], alpha=0.3, label=f'{var_name} (aggregated)')
         
         # Plot the defuzzified value
+        defuzzified_value = output.centroid
         plt.axvline(x=defuzzified_value, color='r', linestyle='-', label='Defuzzified value')
         plt.text(defuzzified_value, 0.5, f'{defuzzified_value:.2f}', 
                  ha='center', va='center', color='red',
@@ -197,31 +148,35 @@ def visualize_defuzzification(fis, inputs):
     
     return plt
 
-def visualize_detailed_rule_activation(fis, inputs):
+def visualize_detailed_rule_activation(fis, inputs, trace=None):
     """
     Visualize the detailed rule activation process, showing AND/OR operations
+    Pass the InferenceTrace of an earlier infer(inputs, trace=True) to reuse it
     """
-    # Import required libraries if not already imported
-    import numpy as np
     from matplotlib.gridspec import GridSpec
-    import matplotlib.pyplot as plt
+
+    if trace is None:
+        _, trace = fis.infer(inputs, trace=True)
     
     # Count number of rules
     num_rules = len(fis.rules)
     
     # Create a figure with multiple subplots - one row per rule
+    columns = max([len(rule.antecedents) for rule in fis.rules] + [2]) + 2
     fig = plt.figure(figsize=(15, 4 * num_rules))
-    gs = GridSpec(num_rules, 4, figure=fig)
+    gs = GridSpec(num_rules, columns, figure=fig)
     
     # For each rule
     for rule_idx, rule in enumerate(fis.rules):
+        rule_trace = trace.rules[rule_idx]
         # Create a title for the rule
         rule_text = "IF "
         for i, (var_name, label, operator, connector) in enumerate(rule.antecedents):
             rule_text += f"{var_name} {operator} {label}"
             if connector is not None:
                 rule_text += f" {connector} "
-        rule_text += f" THEN {rule.consequent[0]} {rule.consequent[2]} {rule.consequent[1]}"
+        rule_text += " THEN " + " AND ".join(
+            f"{var_name} {operator} {label}" for var_name, label, operator in rule.consequents)
         
         fig.text(0.5, 1 - rule_idx * (1/num_rules) - 0.02, f"Rule {rule_idx+1}: {rule_text}", 
                  ha='center', va='center', fontsize=12, fontweight='bold')
@@ -240,22 +195,16 @@ def visualize_detailed_rule_activation(fis, inputs):
             # Plot the membership function
             x_min, x_max = var.range
             x = np.linspace(x_min, x_max, 1000)
-            y = np.array([mem_fn.calculateMembershipDegree(val) for val in x], dtype=float)
+            y = mem_fn.degrees(x)
             ax.plot(x, y, label=label)
             
-            # Plot the input value and its membership degree
+            # Degree of the condition as computed by the inference pass
             input_value = float(inputs[var_name])
-            membership_degree = mem_fn.calculateMembershipDegree(input_value)
-            
-            # Apply operator
-            if operator == "is":
-                final_degree = membership_degree
-            elif operator == "is not":
-                final_degree = 1.0 - membership_degree
+            final_degree = trace.memberships[(var_name, label, operator)]
+            membership_degree = 1.0 - final_degree if operator == "is not" else final_degree
+            if operator == "is not":
                 ax.text(input_value, membership_degree + 0.1, f"1 - {membership_degree:.2f} = {final_degree:.2f}", 
                        ha='center', va='bottom')
-            else:
-                final_degree = membership_degree  # Default case
             
             antecedent_values.append(final_degree)
             
@@ -265,11 +214,11 @@ def visualize_detailed_rule_activation(fis, inputs):
             # Fill the area under the curve up to the membership degree
             if membership_degree > 0:
                 # Avoid using where parameter - split the data manually
-                x_before = np.array([x_val for x_val in x if x_val <= input_value], dtype=float)
-                y_before = np.array([mem_fn.calculateMembershipDegree(x_val) for x_val in x_before], dtype=float)
+                x_before = x[x <= input_value]
+                y_before = y[x <= input_value]
                 
-                x_after = np.array([x_val for x_val in x if x_val > input_value], dtype=float)
-                y_after = np.array([mem_fn.calculateMembershipDegree(x_val) for x_val in x_after], dtype=float)
+                x_after = x[x > input_value]
+                y_after = y[x > input_value]
                 
                 if len(x_before) > 0:
                     ax.fill_between(x_before, 0, y_before, alpha=0.3, color='green')
@@ -287,43 +236,24 @@ def visualize_detailed_rule_activation(fis, inputs):
                 ax.text(input_value, membership_degree + 0.05, f'{membership_degree:.2f}', 
                        ha='center', va='bottom')
             
-            ax.set_title(f"{var_name} is {label}")
+            ax.set_title(f"{var_name} {operator} {label}")
             ax.set_ylim(0, 1.1)
             ax.grid(True)
         
         # Create a subplot for the AND/OR operation
-        ax = fig.add_subplot(gs[rule_idx, len(rule.antecedents)])
+        ax = fig.add_subplot(gs[rule_idx, columns - 2])
         
-        # Calculate the final activation by applying AND/OR operators
-        current_activation = antecedent_values[0]
-        current_connector = rule.antecedents[0][3] if len(rule.antecedents) > 1 else None
+        # Activation after the T-norm/S-norm chain and the rule weight
+        current_activation = rule_trace.activation
         
         # Create a visual representation of the AND/OR operation
         bar_width = 0.3
-        bars = ax.bar([0], [antecedent_values[0]], width=bar_width, label=f"Ant. 1: {antecedent_values[0]:.2f}")
-        
-        for i in range(1, len(antecedent_values)):
-            prev_activation = current_activation
-            
-            if current_connector == "AND":
-                current_activation = min(current_activation, antecedent_values[i])
-                operation = "min"
-            elif current_connector == "OR":
-                current_activation = max(current_activation, antecedent_values[i])
-                operation = "max"
-            else:
-                current_activation = antecedent_values[i]
-                operation = "="
-            
-            bars = ax.bar([i], [antecedent_values[i]], width=bar_width, 
-                         label=f"Ant. {i+1}: {antecedent_values[i]:.2f}")
-            
-            # Update connector for next iteration
-            current_connector = rule.antecedents[i][3] if i < len(rule.antecedents) - 1 else None
+        for i, value in enumerate(antecedent_values):
+            ax.bar([i], [value], width=bar_width, label=f"Ant. {i+1}: {value:.2f}")
         
         # Add the final activation bar
-        bars = ax.bar([len(antecedent_values)], [current_activation], width=bar_width, color='red',
-                     label=f"Final: {current_activation:.2f}")
+        ax.bar([len(antecedent_values)], [current_activation], width=bar_width, color='red',
+               label=f"Final: {current_activation:.2f}")
         
         # Add operation labels
         for i in range(len(rule.antecedents)-1):
@@ -337,7 +267,7 @@ def visualize_detailed_rule_activation(fis, inputs):
         ax.grid(True)
         
         # Create a subplot for the consequent
-        ax = fig.add_subplot(gs[rule_idx, len(rule.antecedents) + 1])
+        ax = fig.add_subplot(gs[rule_idx, columns - 1])
         
         # Get the consequent variable, label, and operator
         var_name, label, operator = rule.consequent
@@ -347,19 +277,16 @@ def visualize_detailed_rule_activation(fis, inputs):
         # Plot the original membership function
         x_min, x_max = var.range
         x = np.linspace(x_min, x_max, 1000)
-        y = np.array([mem_fn.calculateMembershipDegree(val) for val in x], dtype=float)
+        y = mem_fn.degrees(x)
         ax.plot(x, y, '--', label=f'{label} (original)', alpha=0.5)
         
-        # Plot the activated membership function
+        # Plot the implied set recorded for this rule
         if current_activation > 0:
-            try:
-                portion_points = mem_fn.generatePortionPoints(current_activation)
-                if portion_points:
-                    xy = np.array([(float(p.x), float(p.y)) for p in portion_points], dtype=float)
+            for implied in trace.outputs[var_name].implied:
+                if implied.rule == rule_idx and implied.label == label and implied.points:
+                    xy = np.array([(float(p.x), float(p.y)) for p in implied.points], dtype=float)
                     ax.fill(xy[:, 0], xy[:, 1], alpha=0.5, color='red', label=f'{label} (activated)')
-            except:
-                # If there's an error with the portion points, skip this part
-                pass
+                    break
             
             # Draw a horizontal line at the activation level
             ax.axhline(y=current_activation, color='r', linestyle='--', alpha=0.8)